@@ -0,0 +1,240 @@
+"""
+Access control for operational and diagnostic endpoints.
+
+These endpoints expose internals (and, even redacted, metadata about patient
+submissions), so they require the ADMIN_TOKEN secret and are disabled when it
+is not configured.
+"""
+import hmac
+import os
+import re
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+
+from admission import limiters as admission_limiters
+from config import ADMIN_TOKEN
+from export import MEDIA_TYPES, export_orders
+from loop_monitor import loop_monitor
+from memory import KEY_TYPES, OtherWorkerSnapshot, app_object_counts, memory_diagnostics, thread_summary
+from orders import order_index
+from profiling import profile_store
+from sampler import stack_sampler
+
+
+def require_admin_token(
+    x_admin_token: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+) -> None:
+    """
+    FastAPI dependency that checks the admin token.
+
+    The token may be sent as an X-Admin-Token header or as a Bearer token.
+
+    Raises:
+        HTTPException: 404 if admin endpoints are disabled, 401 if the token is wrong
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    supplied = x_admin_token
+    if supplied is None and authorization and authorization.lower().startswith("bearer "):
+        supplied = authorization[7:].strip()
+
+    if supplied is None or not hmac.compare_digest(supplied.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid or missing admin token")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_token)])
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{12}$")
+
+
+@router.get("/profiles")
+async def list_profiles():
+    """List saved per-request CPU profiles, newest first."""
+    return {"profiles": profile_store.list()}
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "collapsed"):
+    """
+    Download a saved profile.
+
+    Formats: "collapsed" (flamegraph input), "pstats" (binary, for snakeviz or
+    pstats), or "text" (top functions by cumulative time).
+    """
+    if not _PROFILE_ID.match(profile_id) or not os.path.exists(profile_store.path(profile_id, "prof")):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return FileResponse(profile_store.path(profile_id, "collapsed"), media_type="text/plain")
+    if format == "pstats":
+        return FileResponse(
+            profile_store.path(profile_id, "prof"),
+            media_type="application/octet-stream",
+            filename=f"{profile_id}.prof"
+        )
+    if format == "text":
+        return PlainTextResponse(profile_store.summary(profile_id))
+    raise HTTPException(status_code=400, detail="format must be collapsed, pstats or text")
+
+
+@router.get("/sampler")
+async def sampler_stats():
+    """Settings and self-measured overhead of this worker's stack sampler."""
+    return stack_sampler.stats()
+
+
+@router.get("/sampler/stacks")
+async def sampler_stacks(minutes: float = 60, include_idle: bool = False):
+    """
+    Collapsed stacks sampled by this worker over the last `minutes` minutes.
+
+    The output feeds flamegraph.pl or speedscope directly. Threads blocked in
+    waits, selects and queue gets are left out unless include_idle is set.
+    """
+    if minutes <= 0:
+        raise HTTPException(status_code=400, detail="minutes must be positive")
+    lines = stack_sampler.collapsed(minutes=minutes, include_idle=include_idle)
+    return PlainTextResponse("\n".join(lines) + "\n" if lines else "")
+
+
+def _check_key_type(key_type: str) -> None:
+    if key_type not in KEY_TYPES:
+        raise HTTPException(status_code=400, detail=f"key_type must be one of {', '.join(KEY_TYPES)}")
+
+
+@router.get("/memory")
+async def memory_status():
+    """RSS, tracemalloc state, held snapshots and live threads of this worker."""
+    status = memory_diagnostics.status()
+    status["threads"] = thread_summary()
+    return status
+
+
+@router.post("/memory/tracemalloc/start")
+async def start_tracemalloc(frames: int = 1):
+    """Start tracing allocations (restarts it if already running)."""
+    if not 1 <= frames <= 50:
+        raise HTTPException(status_code=400, detail="frames must be between 1 and 50")
+    memory_diagnostics.start(frames)
+    return memory_diagnostics.status()
+
+
+@router.post("/memory/tracemalloc/stop")
+async def stop_tracemalloc():
+    """Stop tracing allocations; snapshots already taken are kept."""
+    memory_diagnostics.stop()
+    return memory_diagnostics.status()
+
+
+@router.post("/memory/snapshots")
+def take_memory_snapshot():
+    """Take a tracemalloc snapshot and return its ID, which only this worker can use."""
+    try:
+        snapshot_id = memory_diagnostics.take_snapshot()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"pid": os.getpid(), "snapshot_id": snapshot_id}
+
+
+@router.delete("/memory/snapshots/{snapshot_id}")
+async def delete_memory_snapshot(snapshot_id: str):
+    """Drop a snapshot to free its memory."""
+    try:
+        deleted = memory_diagnostics.discard(snapshot_id)
+    except OtherWorkerSnapshot as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return {"pid": os.getpid(), "deleted": snapshot_id}
+
+
+@router.get("/memory/snapshots/{snapshot_id}/top")
+def memory_top(snapshot_id: str, key_type: str = "lineno", limit: int = 25, app_only: bool = False):
+    """Largest allocation sites in a snapshot."""
+    _check_key_type(key_type)
+    try:
+        statistics = memory_diagnostics.top(snapshot_id, key_type, limit, app_only)
+    except OtherWorkerSnapshot as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return {"pid": os.getpid(), "snapshot_id": snapshot_id, "statistics": statistics}
+
+
+@router.get("/memory/diff")
+def memory_diff(base: str, compare: str, key_type: str = "lineno", limit: int = 25, app_only: bool = False):
+    """Growth between two snapshots of this worker grouped by key_type, largest first."""
+    _check_key_type(key_type)
+    try:
+        statistics = memory_diagnostics.diff(base, compare, key_type, limit, app_only)
+    except OtherWorkerSnapshot as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return {"pid": os.getpid(), "base": base, "compare": compare, "statistics": statistics}
+
+
+@router.get("/memory/objects")
+def memory_objects(limit: int = 50):
+    """Live instance counts of classes defined in this application, in this worker."""
+    return {"pid": os.getpid(), "objects": app_object_counts(limit)}
+
+
+@router.get("/event-loop")
+async def event_loop_blocks():
+    """Recent times this worker's event loop was blocked, with the blocking stack."""
+    return loop_monitor.snapshot()
+
+
+@router.get("/admission")
+async def admission_stats():
+    """In-flight and queued submissions and drain rate per endpoint in this worker."""
+    return {path: limiter.stats() for path, limiter in admission_limiters.items()}
+
+
+@router.get("/orders/search")
+async def search_orders(q: str, form: Optional[str] = None, status: Optional[str] = None, limit: int = 20):
+    """
+    Find submitted orders by patient name, phone, medication, fax ID or status, newest first.
+
+    Args:
+        q: Search text, e.g. "jane doe", "555-0100" or "metformin"
+        form: Only "refill" or "signup" orders
+        status: Only orders with this outcome ("success", "error", "duplicate" or "pending")
+        limit: Maximum number of orders returned
+    """
+    return {"query": q, "orders": order_index.search(q, form=form, status=status, limit=limit)}
+
+
+@router.get("/orders")
+async def order_stats():
+    """Number of indexed orders per form and outcome."""
+    return order_index.stats()
+
+
+@router.get("/orders/export")
+async def export_order_history(format: str = "csv", since: Optional[str] = None, until: Optional[str] = None,
+                               form: Optional[str] = None, status: Optional[str] = None):
+    """
+    Download orders and their fax outcomes as CSV or JSONL, oldest first.
+
+    Args:
+        format: "csv" or "jsonl"
+        since: Orders submitted at or after this date or ISO time (UTC), e.g. 2026-09-01
+        until: Orders submitted before this date or ISO time (UTC), e.g. 2026-10-01
+        form: Only "refill" or "signup" orders
+        status: Only orders with this outcome
+    """
+    try:
+        chunks = export_orders(format, since, until, form, status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = f"orders_{(since or 'all')[:10]}_{(until or 'now')[:10]}.{format}"
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
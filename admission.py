@@ -0,0 +1,196 @@
+"""
+Admission control for the submission endpoints.
+
+Each endpoint lets ADMISSION_MAX_IN_FLIGHT requests run at once per worker.
+Up to ADMISSION_MAX_QUEUE more wait for a slot, for at most
+ADMISSION_QUEUE_TIMEOUT_SECONDS. Anything beyond that is answered right
+away with 503 and a Retry-After estimated from how fast the endpoint has
+been completing requests. When Sinch slows down, the service then sheds
+load predictably instead of piling up parsed bodies, rendered PDFs and
+threads until it runs out of memory.
+"""
+import asyncio
+import collections
+import math
+import time
+from typing import Deque, Dict, Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT_SECONDS, BATCH_MAX_CONCURRENT
+from metrics import ADMISSION_REJECTIONS, registry
+
+ADMITTED_PATHS = ("/send-fax", "/send-signup-fax", "/send_signup_fax", "/generate-pdf", "/send-fax-from-file")
+
+# Completions remembered for the drain-rate estimate
+DRAIN_WINDOW_SECONDS = 30.0
+
+RETRY_AFTER_MIN_SECONDS = 1
+RETRY_AFTER_MAX_SECONDS = 60
+
+
+class Overloaded(Exception):
+    """No slot could be obtained; carries the reason and the suggested Retry-After."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """Bounded concurrency with a short FIFO wait queue for one endpoint."""
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        """
+        Args:
+            max_in_flight: Requests handled at once
+            max_queue: Requests allowed to wait for a slot
+            queue_timeout: Longest a request waits before it is rejected
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+        self._completions: Deque[float] = collections.deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def drain_rate(self, now: Optional[float] = None) -> float:
+        """Requests completed per second over the last DRAIN_WINDOW_SECONDS."""
+        now = time.monotonic() if now is None else now
+        while self._completions and self._completions[0] < now - DRAIN_WINDOW_SECONDS:
+            self._completions.popleft()
+        return len(self._completions) / DRAIN_WINDOW_SECONDS
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog (plus the caller) should have drained."""
+        rate = self.drain_rate()
+        if rate <= 0:
+            return RETRY_AFTER_MAX_SECONDS
+        seconds = math.ceil((self.in_flight + self.queued + 1) / rate)
+        return max(RETRY_AFTER_MIN_SECONDS, min(RETRY_AFTER_MAX_SECONDS, seconds))
+
+    async def acquire(self) -> None:
+        """
+        Take a slot, waiting in the queue if needed.
+
+        Raises:
+            Overloaded: If the queue is full or the wait timed out
+        """
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise Overloaded("queue_full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot straight to the waiter, so in_flight is already counted
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            raise Overloaded("queue_timeout", self.retry_after())
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as we gave up; pass it on
+            self.release(completed=False)
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, completed: bool = True) -> None:
+        """Free a slot, handing it to the oldest waiter if there is one."""
+        if completed:
+            self._completions.append(time.monotonic())
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "drain_rate_per_second": round(self.drain_rate(), 3),
+        }
+
+
+# One limiter per endpoint (per worker process)
+limiters: Dict[str, AdmissionLimiter] = {path: AdmissionLimiter() for path in ADMITTED_PATHS}
+# A batch holds its slot for the whole upload and bounds its own render/send concurrency
+limiters["/send-fax/batch"] = AdmissionLimiter(max_in_flight=BATCH_MAX_CONCURRENT, max_queue=0)
+
+registry.gauge_func(
+    "webflow_admission_in_flight",
+    "Submission requests being handled, summed over endpoints and workers.",
+    lambda: sum(limiter.in_flight for limiter in limiters.values()),
+)
+registry.gauge_func(
+    "webflow_admission_queued",
+    "Submission requests waiting for a slot, summed over endpoints and workers.",
+    lambda: sum(limiter.queued for limiter in limiters.values()),
+)
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying a separate AdmissionLimiter to each submission endpoint."""
+
+    def __init__(self, app: ASGIApp, endpoint_limiters: Dict[str, AdmissionLimiter] = limiters):
+        self.app = app
+        self.limiters = endpoint_limiters
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = self.limiters.get(scope["path"]) if scope["type"] == "http" else None
+        if limiter is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            ADMISSION_REJECTIONS.labels(scope["path"], e.reason).inc()
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry shortly"},
+                status_code=503,
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+async def wait_until_idle(timeout: float, poll_interval: float = 0.1) -> int:
+    """
+    Wait until no submission is in flight or queued in this worker, or until the timeout.
+
+    Returns:
+        Number of submissions still in flight or queued when it returned
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        busy = sum(limiter.in_flight + limiter.queued for limiter in limiters.values())
+        if busy == 0 or time.monotonic() >= deadline:
+            return busy
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,248 @@
+"""
+End-to-end benchmark of the app, run in process with a fake fax backend.
+
+Unlike test_api.py and friends this needs neither a running server nor
+Sinch credentials: the FastAPI app is driven through httpx's ASGI transport
+and FaxSender is replaced by fakes.FakeFaxSender with a fixed latency.
+Each scenario runs for a fixed time at each concurrency level (closed loop:
+every worker sends its next request as soon as the previous one finishes),
+and requests/sec and p99 latency are recorded.
+
+Results are compared against a stored baseline; a scenario regresses when
+its throughput drops or its p99 grows by more than the tolerance. Baselines
+are machine-specific, so record one on the machine the comparison runs on.
+
+Usage:
+    python benchmark.py                          # run and compare with benchmark_baseline.json
+    python benchmark.py --save-baseline          # run and store the results as the new baseline
+    python benchmark.py --scenarios send_fax,pdf --concurrency 1,8 --duration 10
+
+Exits with status 1 if any scenario regressed. Requires httpx.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+from fakes import load_app
+from replay import percentile
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# Allowed relative change before a scenario counts as regressed
+DEFAULT_TOLERANCE = 0.2
+
+_ids = itertools.count()
+
+
+def _refill(n: int) -> Dict[str, Any]:
+    # Unique names, so that idempotency replay and duplicate detection do not short-circuit the work
+    return {
+        "json": {
+            "OR-Name": f"Bench{n}",
+            "OR-Last-name": "Patient",
+            "OR-Phone-number": f"705-555-{n % 10000:04d}",
+            "OR-Medication": "Atorvastatin 20mg, Metformin 500mg, Lisinopril 10mg",
+            "OR-note": "Benchmark order",
+            "delivery_option": "Delivery",
+            "address": "1 Sample St",
+            "time_slot": "9:00 AM - 11:00 AM",
+        }
+    }
+
+
+def _signup(n: int) -> Dict[str, Any]:
+    return {
+        "data": {
+            "Form-first-name": f"Bench{n}",
+            "Form-last-name": "Patient",
+            "Form-phone-number": f"705-555-{n % 10000:04d}",
+            "Form-date-of-brith": "1980-01-01",
+            "Form-transfer": "1 Sample St",
+            "Form-area": "Sampletown",
+        }
+    }
+
+
+# name -> (method, path, request kwargs for the n-th request)
+SCENARIOS: Dict[str, Tuple[str, Callable[[int], str], Callable[[int], Dict[str, Any]]]] = {
+    "send_fax": ("POST", lambda n: "/send-fax", _refill),
+    "send_signup_fax": ("POST", lambda n: "/send-signup-fax", _signup),
+    "generate_pdf": ("POST", lambda n: "/generate-pdf", _refill),
+    "pdf": ("GET", lambda n: "/pdf/bench", lambda n: {}),
+}
+
+
+def _prepare_pdf() -> None:
+    """Store a refill PDF under the ID the "pdf" scenario fetches."""
+    import main
+    path = main.generate_pdf(_refill(0)["json"], main.pdf_store.staging_path("bench"))
+    main.pdf_store.put("bench", path)
+
+
+async def run_level(client, scenario: str, concurrency: int, duration: float) -> Dict[str, Any]:
+    """
+    Run one scenario with a fixed number of concurrent workers.
+
+    Returns:
+        Dict with requests, errors, rps and p50/p99 in milliseconds
+    """
+    method, path_for, kwargs_for = SCENARIOS[scenario]
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            n = next(_ids)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path_for(n), **kwargs_for(n))
+                ok = response.is_success
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / elapsed, 2),
+        "p50_ms": round(percentile(ordered, 50) * 1000.0, 1),
+        "p99_ms": round(percentile(ordered, 99) * 1000.0, 1),
+    }
+
+
+async def run(scenarios: List[str], levels: List[int], duration: float,
+              fax_latency: float) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Run every scenario at every concurrency level.
+
+    Returns:
+        results[scenario][str(concurrency)] as returned by run_level()
+    """
+    import httpx
+
+    app = load_app(fax_latency)
+    _prepare_pdf()
+    results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60.0) as client:
+        for scenario in scenarios:
+            # One untimed request so first-render costs do not land in the first level
+            method, path_for, kwargs_for = SCENARIOS[scenario]
+            n = next(_ids)
+            await client.request(method, path_for(n), **kwargs_for(n))
+            results[scenario] = {}
+            for level in levels:
+                results[scenario][str(level)] = await run_level(client, scenario, level, duration)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Dict[str, Any]]], baseline: Dict[str, Dict[str, Dict[str, Any]]],
+            tolerance: float) -> List[str]:
+    """
+    List regressions of results against a baseline.
+
+    Returns:
+        One message per scenario and level whose rps fell or p99 rose by more than the tolerance
+    """
+    regressions = []
+    for scenario, levels in results.items():
+        for level, current in levels.items():
+            previous = baseline.get(scenario, {}).get(level)
+            if not previous:
+                continue
+            if current["rps"] < previous["rps"] * (1 - tolerance):
+                regressions.append(f"{scenario} @ {level}: {current['rps']} req/s vs {previous['rps']} baseline")
+            if current["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+                regressions.append(f"{scenario} @ {level}: p99 {current['p99_ms']}ms vs {previous['p99_ms']}ms baseline")
+    return regressions
+
+
+def print_results(results: Dict[str, Dict[str, Dict[str, Any]]],
+                  baseline: Optional[Dict[str, Dict[str, Dict[str, Any]]]]) -> None:
+    print(f"{'scenario':<18}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'base req/s':>12}{'base p99':>10}")
+    for scenario, levels in results.items():
+        for level, r in levels.items():
+            previous = (baseline or {}).get(scenario, {}).get(level, {})
+            print(f"{scenario:<18}{level:>6}{r['rps']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['errors']:>8}"
+                  f"{previous.get('rps', '-'):>12}{previous.get('p99_ms', '-'):>10}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per scenario and level")
+    parser.add_argument("--fax-latency-ms", type=float, default=300.0, help="Simulated Sinch round trip")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative change allowed before a result counts as a regression")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        print("benchmark.py needs httpx: pip install httpx", file=sys.stderr)
+        return 2
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "rb") as f:
+            baseline = orjson.loads(f.read())
+
+    # /generate-pdf writes its PDFs into the working directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="webflow-bench-") as workdir:
+        os.chdir(workdir)
+        try:
+            results = asyncio.run(run(scenarios, levels, args.duration, args.fax_latency_ms / 1000.0))
+        finally:
+            os.chdir(cwd)
+
+    if args.json:
+        sys.stdout.write(orjson.dumps(results, option=orjson.OPT_INDENT_2).decode() + "\n")
+    else:
+        print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "wb") as f:
+            f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
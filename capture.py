@@ -0,0 +1,92 @@
+"""
+Sampled capture of real form submissions for diagnosing field mapping problems.
+
+A fixed-size ring buffer keeps the most recent sampled submissions to the
+fax endpoints: the raw field names, the redacted mapped result, the content
+type, the outcome and per-stage timings. Nothing is written to logs or disk,
+and each worker process keeps its own buffer.
+"""
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from config import CAPTURE_BUFFER_SIZE, CAPTURE_SAMPLE_RATE
+from logging_setup import redact
+
+
+class CaptureBuffer:
+    """Thread-safe ring buffer of sampled submissions."""
+
+    def __init__(self, size: int = CAPTURE_BUFFER_SIZE, sample_rate: float = CAPTURE_SAMPLE_RATE):
+        """
+        Args:
+            size: Number of captures kept; older ones are overwritten
+            sample_rate: Fraction of submissions captured (0.0 disables, 1.0 captures all)
+        """
+        self.sample_rate = sample_rate
+        self._entries: "deque[Dict[str, Any]]" = deque(maxlen=max(size, 1))
+        self._lock = threading.Lock()
+        self._seen = 0
+
+    def should_sample(self) -> bool:
+        """Decide whether the submission being handled should be captured."""
+        self._seen += 1
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def record(self, endpoint: str, form: str, content_type: str, raw_data: Any,
+               mapped: Optional[Dict[str, Any]], outcome: str, timings: Dict[str, float],
+               request_id: Optional[str] = None, missing_required: Optional[List[str]] = None) -> None:
+        """
+        Store one capture; patient values are redacted before they are kept.
+
+        Args:
+            endpoint: Path the submission was posted to
+            form: Form mapping used ("refill" or "signup")
+            content_type: Content-Type header of the request
+            raw_data: Parsed submission (only its field names are kept)
+            mapped: Mapped fields, or None if mapping did not happen
+            outcome: Short result, e.g. "success", "fax_error" or "http_422"
+            timings: Stage timings in milliseconds
+            request_id: Request ID for correlating with logs
+            missing_required: Required fields that were missing
+        """
+        entry = {
+            "captured_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "request_id": request_id,
+            "endpoint": endpoint,
+            "form": form,
+            "content_type": content_type,
+            "raw_keys": list(raw_data) if isinstance(raw_data, dict) else None,
+            "raw_type": type(raw_data).__name__,
+            "mapped": redact(mapped) if mapped is not None else None,
+            "missing_required": missing_required or [],
+            "outcome": outcome,
+            "timings_ms": {name: round(ms, 3) for name, ms in timings.items()},
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+    def snapshot(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return captures, newest first."""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def stats(self) -> Dict[str, Any]:
+        """Return buffer settings and fill level."""
+        with self._lock:
+            stored = len(self._entries)
+        return {
+            "sample_rate": self.sample_rate,
+            "capacity": self._entries.maxlen,
+            "stored": stored,
+            "submissions_seen": self._seen,
+        }
+
+    def clear(self) -> None:
+        """Drop all captures."""
+        with self._lock:
+            self._entries.clear()
@@ -2,6 +2,7 @@
 Configuration settings for the Webflow form to fax application.
 """
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -13,6 +14,9 @@ SINCH_ACCESS_SECRET = os.getenv("SINCH_ACCESS_SECRET")
 SINCH_PROJECT_ID = os.getenv("SINCH_PROJECT_ID")
 PHARMACY_FAX_NUMBER = os.getenv("PHARMACY_FAX_NUMBER", "17057415595")
 
+# Public URL of this service; Sinch fetches generated PDFs from {PUBLIC_BASE_URL}/pdf/{pdf_id}
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "https://webflow-form.onrender.com").rstrip("/")
+
 # Validate required environment variables
 def validate_config():
     """Validate that all required environment variables are set"""
@@ -42,7 +46,121 @@ PDF_SAVE_DIR = os.getenv("PDF_SAVE_DIR", "generated_pdfs")
 
 # Sinch API URLs
 SINCH_FAX_API_URL = "https://fax.api.sinch.com/v3/projects"
+# Seconds to wait for a connection to Sinch and then for its response
+SINCH_CONNECT_TIMEOUT_SECONDS = float(os.getenv("SINCH_CONNECT_TIMEOUT_SECONDS", "5"))
+SINCH_READ_TIMEOUT_SECONDS = float(os.getenv("SINCH_READ_TIMEOUT_SECONDS", "30"))
 
 # File Upload Configuration
 UPLOAD_ENABLED = os.getenv("UPLOAD_ENABLED", "true").lower() == "true"
 CALLBACK_URL = os.getenv("CALLBACK_URL", "")  # Optional callback URL for fax status
+
+# Largest request body accepted from Webflow forms (bytes)
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", str(64 * 1024)))
+
+# Temporary PDF store (PDFs served to Sinch via /pdf/{pdf_id})
+PDF_TTL_SECONDS = float(os.getenv("PDF_TTL_SECONDS", "300"))  # 5 minutes
+PDF_STORE_MAX_BYTES = int(os.getenv("PDF_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+# "shared" lets every uvicorn worker on the node serve any PDF; "memory" is single-worker only
+PDF_STORE_BACKEND = os.getenv("PDF_STORE_BACKEND", "shared").lower()
+
+# Local state shared by the worker processes on this node
+STATE_DIR = os.getenv("STATE_DIR", os.path.join(tempfile.gettempdir(), "webflow-form"))
+PDF_SPOOL_DIR = os.getenv("PDF_SPOOL_DIR", os.path.join(STATE_DIR, "pdfs"))
+
+# Logging: root level, plus per-module overrides as "fax_sender=DEBUG,uvicorn.access=WARNING"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+
+# Secret for diagnostic/admin endpoints (sent as X-Admin-Token); empty disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Sampled capture of submissions, readable via GET /debug-form-data
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "0.05"))
+CAPTURE_BUFFER_SIZE = int(os.getenv("CAPTURE_BUFFER_SIZE", "200"))
+
+# Metrics: each worker writes a snapshot here every METRICS_FLUSH_SECONDS, merged on /metrics
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(STATE_DIR, "metrics"))
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+# Request tracing: finished traces are appended to rotating JSONL files (one per worker)
+TRACE_DIR = os.getenv("TRACE_DIR", os.path.join(STATE_DIR, "traces"))
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+# Paths (and everything below them) whose traces are never exported: probes, scrapes and Sinch PDF fetches
+TRACE_SKIP_PATHS = [p.strip() for p in os.getenv("TRACE_SKIP_PATHS", "/ready,/health,/metrics,/pdf").split(",") if p.strip()]
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_FILE_BACKUPS = int(os.getenv("TRACE_FILE_BACKUPS", "3"))
+
+# Per-request CPU profiling: send X-Profile-Token with this secret, or sample a fraction of requests
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(STATE_DIR, "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_RETENTION_SECONDS = float(os.getenv("PROFILE_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+# Always-on stack sampler (per worker); 0 Hz disables it. Windows are kept for SAMPLER_WINDOWS * SAMPLER_WINDOW_SECONDS
+SAMPLER_HZ = float(os.getenv("SAMPLER_HZ", "19"))
+SAMPLER_WINDOW_SECONDS = float(os.getenv("SAMPLER_WINDOW_SECONDS", "60"))
+SAMPLER_WINDOWS = int(os.getenv("SAMPLER_WINDOWS", "60"))
+
+# Event-loop lag monitor: probe interval, and blocking time after which the loop thread's stack is captured
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.1"))
+LOOP_BLOCK_THRESHOLD_SECONDS = float(os.getenv("LOOP_BLOCK_THRESHOLD_SECONDS", "0.25"))
+
+# Render throwaway PDFs and connect to Sinch at startup; /ready reports 503 until this is done
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+
+# Idempotency: repeats of a submission (same Idempotency-Key header, or same mapped fields
+# when no header is sent) get the stored response instead of another fax. Header keys are
+# replayed for IDEMPOTENCY_TTL_SECONDS; keys derived from the fields only for the much shorter
+# IDEMPOTENCY_DERIVED_TTL_SECONDS (double-clicks and client retries), so a deliberate re-order
+# later on reaches DUPLICATE_POLICY instead of being silently answered with the old response
+IDEMPOTENCY_DB = os.getenv("IDEMPOTENCY_DB", os.path.join(STATE_DIR, "idempotency.sqlite3"))
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "3600"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+IDEMPOTENCY_DERIVE_KEYS = os.getenv("IDEMPOTENCY_DERIVE_KEYS", "true").lower() == "true"
+IDEMPOTENCY_DERIVED_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_DERIVED_TTL_SECONDS", "60"))
+
+# Near-duplicate submissions (same person, phone and medications within the window):
+# "suppress" (no new fax), "annotate" (fax with a duplicate note) or "allow"
+DUPLICATE_POLICY = os.getenv("DUPLICATE_POLICY", "annotate").lower()
+DUPLICATE_WINDOW_SECONDS = float(os.getenv("DUPLICATE_WINDOW_SECONDS", "1800"))
+DUPLICATE_DB = os.getenv("DUPLICATE_DB", os.path.join(STATE_DIR, "duplicates.sqlite3"))
+
+# Local index of submitted orders (patient details, fax ID, outcome), searchable via
+# GET /admin/orders/search
+ORDER_INDEX_ENABLED = os.getenv("ORDER_INDEX_ENABLED", "true").lower() == "true"
+ORDERS_DB = os.getenv("ORDERS_DB", os.path.join(STATE_DIR, "orders.sqlite3"))
+
+# Medication typeahead (GET /medications/suggest): name list file, different patients (by phone)
+# who must submit a name that is not on the list before it is suggested, and recent orders whose
+# medications seed it at startup
+MEDICATION_LIST_PATH = os.getenv(
+    "MEDICATION_LIST_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "medications.txt")
+)
+MEDICATION_MIN_SUBMITTERS = int(os.getenv("MEDICATION_MIN_SUBMITTERS", "3"))
+MEDICATION_SEED_ORDERS = int(os.getenv("MEDICATION_SEED_ORDERS", "50000"))
+
+# Delivery slot capacity: slots as "label=capacity" separated by ";" (capacity optional; none
+# turns booking off), orders per slot and date otherwise, time zone deciding "tomorrow", and what to do with orders for a full
+# slot: "reject" (409), "flag" (fax with an overbooking note) or "allow" (count only)
+DELIVERY_SLOTS = os.getenv("DELIVERY_SLOTS", "")
+DELIVERY_SLOT_CAPACITY = int(os.getenv("DELIVERY_SLOT_CAPACITY", "10"))
+DELIVERY_SLOT_POLICY = os.getenv("DELIVERY_SLOT_POLICY", "flag").lower()
+DELIVERY_TIMEZONE = os.getenv("DELIVERY_TIMEZONE", "America/Toronto")
+DELIVERY_SLOTS_DB = os.getenv("DELIVERY_SLOTS_DB", os.path.join(STATE_DIR, "delivery_slots.sqlite3"))
+
+# Admission control per submission endpoint and worker: concurrent requests, requests waiting
+# for a slot, and the longest wait before answering 503 with Retry-After
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "8"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+
+# Shutdown: how long to wait for in-flight submissions after uvicorn stops accepting connections
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "20"))
+
+# Batch ingestion (POST /send-fax/batch): lines per batch, parallel renders and Sinch sends
+# within a batch, and batches running at once per worker
+BATCH_MAX_LINES = int(os.getenv("BATCH_MAX_LINES", "1000"))
+BATCH_RENDER_CONCURRENCY = int(os.getenv("BATCH_RENDER_CONCURRENCY", "2"))
+BATCH_SEND_CONCURRENCY = int(os.getenv("BATCH_SEND_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENT = int(os.getenv("BATCH_MAX_CONCURRENT", "1"))
@@ -0,0 +1,54 @@
+"""
+Shared setup for the in-process tests.
+
+config.py reads the environment when it is first imported, so it is set up
+here before any test module imports the app: placeholder Sinch credentials,
+a throwaway STATE_DIR and no startup warm-up. The app itself is loaded
+through fakes.load_app(), which swaps in FakeFaxSender so nothing is faxed.
+
+test_api.py, test_signup.py and test_signup_fields.py are scripts against a
+running server and do not use these fixtures.
+"""
+import os
+import tempfile
+
+import pytest
+
+from fakes import DUMMY_ENV, FakeFaxSender
+
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="webflow-tests-")
+os.environ["STARTUP_WARMUP"] = "false"
+for _key, _value in DUMMY_ENV.items():
+    os.environ.setdefault(_key, _value)
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The FastAPI app, imported once with a fake fax backend."""
+    from fakes import load_app
+    return load_app()
+
+
+@pytest.fixture
+def fax(app) -> FakeFaxSender:
+    """A fresh FakeFaxSender installed for one test; ``fax.sent`` counts the faxes sent."""
+    import main
+    sender = FakeFaxSender()
+    main.fax_sender = sender
+    return sender
+
+
+@pytest.fixture
+def client(app, fax):
+    """TestClient running the app's startup and shutdown events around one test."""
+    from starlette.testclient import TestClient
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    """Headers that pass require_admin_token, with ADMIN_TOKEN set for the test."""
+    import admin
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "test-admin-token")
+    return {"X-Admin-Token": "test-admin-token"}
@@ -0,0 +1,145 @@
+"""
+Near-duplicate submission detection.
+
+Patients often resubmit the same refill a few minutes later with small
+differences: extra whitespace, another phone format, medications in a
+different order. Idempotency keys do not catch these. Each submission is
+reduced to a fingerprint of its normalized identifying fields (digits of
+the phone, case-folded names, the sorted set of medications). Fingerprints
+of sent faxes are kept in a time-windowed SQLite index under STATE_DIR,
+shared by all workers.
+
+DUPLICATE_POLICY decides what happens to a near-duplicate:
+"suppress" answers with the earlier fax instead of sending another,
+"annotate" sends it with a note pointing at the earlier fax, and "allow"
+skips the check.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, Type
+
+from config import DUPLICATE_DB, DUPLICATE_POLICY, DUPLICATE_WINDOW_SECONDS
+from field_mapping import MappedRecord, RefillOrder, SignupRecord
+
+POLICIES = ("suppress", "annotate", "allow")
+
+_WHITESPACE = re.compile(r"\s+")
+_NON_DIGITS = re.compile(r"\D+")
+_MEDICATION_SEPARATORS = re.compile(r"[,;\n]+")
+
+
+def _text(value: Optional[str]) -> str:
+    return _WHITESPACE.sub(" ", str(value or "")).strip().casefold()
+
+
+def _digits(value: Optional[str]) -> str:
+    return _NON_DIGITS.sub("", str(value or ""))
+
+
+def _phone(value: Optional[str]) -> str:
+    digits = _digits(value)
+    # 1-705-555-0100 and 705-555-0100 are the same North American number
+    if len(digits) == 11 and digits.startswith("1"):
+        digits = digits[1:]
+    return digits
+
+
+def _medications(value: Optional[str]) -> str:
+    items = {_text(item) for item in _MEDICATION_SEPARATORS.split(str(value or ""))}
+    items.discard("")
+    return "|".join(sorted(items))
+
+
+# Identifying fields per record type, with the normalizer applied to each
+IDENTITY_FIELDS: Dict[Type[MappedRecord], Tuple[Tuple[str, Callable[[Optional[str]], str]], ...]] = {
+    RefillOrder: (("first_name", _text), ("last_name", _text), ("phone", _phone), ("medication", _medications)),
+    SignupRecord: (("first_name", _text), ("last_name", _text), ("phone", _phone), ("date_of_birth", _digits)),
+}
+
+# Field that carries the duplicate note when the policy is "annotate"
+NOTE_FIELDS: Dict[Type[MappedRecord], str] = {RefillOrder: "note", SignupRecord: "notes"}
+
+
+def fingerprint(form_name: str, record: MappedRecord) -> str:
+    """Hash of a record's normalized identifying fields."""
+    parts = [form_name]
+    for attr, normalize in IDENTITY_FIELDS[type(record)]:
+        parts.append(normalize(getattr(record, attr)))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def note_key(record: MappedRecord) -> str:
+    """Canonical data key of the record's notes field."""
+    attr = NOTE_FIELDS[type(record)]
+    return next(spec.key for spec in record.FIELDS if spec.attr == attr)
+
+
+class DuplicateIndex:
+    """Time-windowed index of fingerprints of submissions that were faxed."""
+
+    def __init__(self, path: str = DUPLICATE_DB, window_seconds: float = DUPLICATE_WINDOW_SECONDS,
+                 policy: str = DUPLICATE_POLICY):
+        """
+        Args:
+            path: SQLite database file, shared by all workers on the node
+            window_seconds: How long after a fax a similar submission counts as a duplicate
+            policy: "suppress", "annotate" or "allow"
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"DUPLICATE_POLICY must be one of {', '.join(POLICIES)}, not {policy!r}")
+        self.window_seconds = window_seconds
+        self.policy = policy
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS recent_submissions ("
+            " fingerprint TEXT PRIMARY KEY,"
+            " fax_id TEXT,"
+            " sent_at REAL NOT NULL,"
+            " repeats INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS recent_submissions_sent_at ON recent_submissions (sent_at)")
+
+    def find(self, key: str) -> Optional[Dict[str, object]]:
+        """
+        Look up an earlier fax with the same fingerprint within the window.
+
+        Looking up does not count a repeat; suppressed() and record() do,
+        once the duplicate has actually been answered or faxed.
+
+        Returns:
+            Dict with fax_id, sent_at and the repeats counted so far, or None
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM recent_submissions WHERE sent_at < ?", (now - self.window_seconds,))
+            row = self._db.execute(
+                "SELECT fax_id, sent_at, repeats FROM recent_submissions WHERE fingerprint = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"fax_id": row[0], "sent_at": row[1], "repeats": row[2]}
+
+    def suppressed(self, key: str) -> None:
+        """Count a repeat that was answered with the earlier fax instead of being sent."""
+        with self._lock:
+            self._db.execute("UPDATE recent_submissions SET repeats = repeats + 1 WHERE fingerprint = ?", (key,))
+
+    def record(self, key: str, fax_id: Optional[str]) -> None:
+        """Remember a faxed submission; a faxed repeat keeps the original's fax and time and is counted."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO recent_submissions (fingerprint, fax_id, sent_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (fingerprint) DO UPDATE SET repeats = repeats + 1",
+                (key, fax_id, time.time()),
+            )
+
+
+duplicate_index = DuplicateIndex()
@@ -0,0 +1,205 @@
+"""
+Delivery time-slot capacity.
+
+The refill form's delivery time ("OR-Tomorrow-delivery-time") used to accept
+any slot, and drivers were overbooked. Each accepted delivery order now
+books its slot for the next day in a per-date, per-slot counter. The
+counters live in SQLite under STATE_DIR and are updated atomically (a
+conditional UPSERT when full slots are rejected), so every worker on the
+node sees the same bookings and two orders never both take the last place.
+
+Only the slots listed in DELIVERY_SLOTS are booked; with none listed the
+feature is off. A label the pharmacy does not offer is never booked or
+listed, so free-form labels cannot grow the table or dodge a full slot.
+
+A booking is released again when the fax is not sent, so the counters only
+count orders the pharmacy received. GET /delivery-slots reads one date's
+counters by primary key for the form to poll.
+
+DELIVERY_SLOT_POLICY decides what happens to an order for a full slot:
+"reject" answers 409 before anything is rendered, "flag" sends it with an
+overbooking note on the fax, and "allow" only counts it.
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from config import (DELIVERY_SLOT_CAPACITY, DELIVERY_SLOT_POLICY, DELIVERY_SLOTS, DELIVERY_SLOTS_DB,
+                    DELIVERY_TIMEZONE)
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python 3.8: dates follow the server's local time
+    ZoneInfo = None
+
+POLICIES = ("reject", "flag", "allow")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class SlotFull(Exception):
+    """The requested delivery slot has no capacity left."""
+
+
+class UnknownSlot(ValueError):
+    """The requested delivery slot is not one of DELIVERY_SLOTS."""
+
+
+class Booking(NamedTuple):
+    """A place taken in a slot; ``over_capacity`` is set when it was taken beyond capacity."""
+    date: str
+    slot_key: str
+    label: str
+    over_capacity: bool
+
+
+def slot_key(label: str) -> str:
+    """Key of a slot label, so "9:00 AM - 11:00 AM" and "9:00am-11:00am" are the same slot."""
+    return _WHITESPACE.sub("", label).casefold()
+
+
+def parse_slots(spec: str, default_capacity: int) -> Dict[str, Tuple[str, int]]:
+    """
+    Parse DELIVERY_SLOTS: slot labels separated by ";", each optionally followed by "=capacity".
+
+    Returns:
+        Mapping of slot key to (label, capacity), in the configured order
+
+    Raises:
+        ValueError: If a capacity is not a number
+    """
+    slots: Dict[str, Tuple[str, int]] = {}
+    for item in spec.split(";"):
+        label, _, capacity = item.partition("=")
+        label = _WHITESPACE.sub(" ", label).strip()
+        if label:
+            slots[slot_key(label)] = (label, int(capacity) if capacity.strip() else default_capacity)
+    return slots
+
+
+def is_delivery(delivery_option: Optional[str]) -> bool:
+    """Whether the order explicitly asks for delivery; a missing or unrecognised option does not."""
+    return "deliver" in (delivery_option or "").casefold()
+
+
+class SlotBookings:
+    """Per-date, per-slot booking counters shared by all workers on the node."""
+
+    def __init__(self, path: str = DELIVERY_SLOTS_DB, slots: str = DELIVERY_SLOTS,
+                 default_capacity: int = DELIVERY_SLOT_CAPACITY, policy: str = DELIVERY_SLOT_POLICY,
+                 timezone: str = DELIVERY_TIMEZONE):
+        """
+        Args:
+            path: SQLite database file
+            slots: Configured slots (see parse_slots); empty turns booking off
+            default_capacity: Orders per slot that has no capacity of its own
+            policy: "reject", "flag" or "allow"
+            timezone: Pharmacy time zone that decides which date "tomorrow" is
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"DELIVERY_SLOT_POLICY must be one of {', '.join(POLICIES)}, not {policy!r}")
+        self.policy = policy
+        self.default_capacity = default_capacity
+        self.slots = parse_slots(slots, default_capacity)
+        self.enabled = bool(self.slots)
+        self.timezone = ZoneInfo(timezone) if ZoneInfo is not None and timezone else None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS slot_bookings ("
+            " date TEXT NOT NULL,"
+            " slot TEXT NOT NULL,"
+            " label TEXT NOT NULL,"
+            " booked INTEGER NOT NULL,"
+            " PRIMARY KEY (date, slot))"
+        )
+
+    def delivery_date(self) -> str:
+        """Date an order placed now is delivered on (tomorrow in the pharmacy's time zone)."""
+        return (datetime.now(self.timezone).date() + timedelta(days=1)).isoformat()
+
+    def book(self, label: str, delivery_date: Optional[str] = None) -> Booking:
+        """
+        Take a place in a configured slot.
+
+        Under the "reject" policy the place is only taken if the slot has
+        capacity left; otherwise it is always taken and the booking says
+        whether it went over capacity.
+
+        Raises:
+            UnknownSlot: If the label is not one of the configured slots
+            SlotFull: Under the "reject" policy, if the slot is full
+        """
+        key = slot_key(label)
+        if key not in self.slots:
+            raise UnknownSlot(f"{label!r} is not an offered delivery time; please choose another time")
+        label, capacity = self.slots[key]
+        day = delivery_date or self.delivery_date()
+        with self._lock:
+            if self.policy == "reject":
+                # Only one statement, so the check and the increment are atomic across workers
+                taken = self._db.execute(
+                    "INSERT INTO slot_bookings (date, slot, label, booked) SELECT ?, ?, ?, 1 WHERE ? > 0"
+                    " ON CONFLICT (date, slot) DO UPDATE SET booked = booked + 1 WHERE booked < ?",
+                    (day, key, label, capacity, capacity),
+                ).rowcount
+                if not taken:
+                    raise SlotFull(f"The {label} delivery slot on {day} is full; please choose another time")
+                return Booking(day, key, label, False)
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT INTO slot_bookings (date, slot, label, booked) VALUES (?, ?, ?, 1)"
+                    " ON CONFLICT (date, slot) DO UPDATE SET booked = booked + 1",
+                    (day, key, label),
+                )
+                booked = self._db.execute(
+                    "SELECT booked FROM slot_bookings WHERE date = ? AND slot = ?", (day, key)
+                ).fetchone()[0]
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+        return Booking(day, key, label, booked > capacity)
+
+    def release(self, booking: Optional[Booking]) -> None:
+        """Give a place back, e.g. because the order's fax failed."""
+        if booking is None:
+            return
+        with self._lock:
+            self._db.execute(
+                "UPDATE slot_bookings SET booked = booked - 1 WHERE date = ? AND slot = ? AND booked > 0",
+                (booking.date, booking.slot_key),
+            )
+
+    def availability(self, delivery_date: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Capacity and bookings of every configured slot for one date.
+
+        Raises:
+            ValueError: If the date is not YYYY-MM-DD
+        """
+        day = date.fromisoformat(delivery_date).isoformat() if delivery_date else self.delivery_date()
+        with self._lock:
+            rows = self._db.execute("SELECT slot, label, booked FROM slot_bookings WHERE date = ?", (day,)).fetchall()
+        booked = {key: count for key, _, count in rows}
+        slots: List[Dict[str, Any]] = []
+        for key, (label, capacity) in self.slots.items():
+            count = booked.get(key, 0)
+            slots.append({
+                "slot": label,
+                "capacity": capacity,
+                "booked": count,
+                "available": max(capacity - count, 0),
+                "full": count >= capacity,
+            })
+        return {"date": day, "policy": self.policy, "enabled": self.enabled, "slots": slots}
+
+
+slot_bookings = SlotBookings()
@@ -0,0 +1,143 @@
+"""
+Export of indexed orders and their fax outcomes as CSV or JSONL.
+
+Used by GET /admin/orders/export and as a command-line tool on the instance
+itself. Orders are read through a server-side cursor and encoded by
+generators, so memory use stays flat however many orders are exported and
+the first bytes go out as soon as the first batch has been read.
+
+CSV has one column per field except "data"; JSONL lines also carry the full
+mapped submission under "data". Staff open the CSV in spreadsheets, so text
+cells that a spreadsheet would evaluate as a formula are prefixed with "'".
+
+Usage:
+    python export.py --since 2026-09-01 --until 2026-10-01 > september.csv
+    python export.py --format jsonl --form refill --status error -o failed.jsonl
+"""
+import argparse
+import csv
+import io
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import orjson
+
+from orders import EXPORT_COLUMNS, order_index
+
+CSV_COLUMNS = tuple(column for column in EXPORT_COLUMNS if column != "data")
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+
+# Encoded output is handed on in chunks of about this size
+CHUNK_BYTES = 64 * 1024
+
+# First characters that make a spreadsheet treat a cell as a formula
+_FORMULA_STARTS = ("=", "+", "-", "@", "\t", "\r")
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a date (YYYY-MM-DD) or ISO 8601 time into epoch seconds; times without a zone are UTC.
+
+    Raises:
+        ValueError: If the value is not a date or time
+    """
+    if not value:
+        return None
+    text = value.strip()
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def csv_cell(value: Any) -> Any:
+    """A value as a CSV cell: None is empty, and text a spreadsheet would evaluate is quoted with "'"."""
+    if value is None:
+        return ""
+    if isinstance(value, str) and value.startswith(_FORMULA_STARTS):
+        return "'" + value
+    return value
+
+
+def iter_csv(orders: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Encode orders as CSV with a header row, yielding chunks of about CHUNK_BYTES."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for order in orders:
+        writer.writerow([csv_cell(order[column]) for column in CSV_COLUMNS])
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def iter_jsonl(orders: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Encode orders as JSON lines, yielding chunks of about CHUNK_BYTES."""
+    chunk = bytearray()
+    for order in orders:
+        chunk += orjson.dumps(order)
+        chunk += b"\n"
+        if len(chunk) >= CHUNK_BYTES:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+ENCODERS = {"csv": iter_csv, "jsonl": iter_jsonl}
+
+
+def export_orders(fmt: str = "csv", since: Optional[str] = None, until: Optional[str] = None,
+                  form: Optional[str] = None, status: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Stream matching orders in the given format.
+
+    Args:
+        fmt: "csv" or "jsonl"
+        since: Only orders submitted at or after this date or time
+        until: Only orders submitted before this date or time
+        form: Only "refill" or "signup" orders
+        status: Only orders with this outcome
+
+    Raises:
+        ValueError: For an unknown format or an unparseable date; raised
+            before anything is read, so callers can report it up front
+    """
+    if fmt not in ENCODERS:
+        raise ValueError(f"format must be one of {', '.join(ENCODERS)}")
+    orders = order_index.export(since=parse_time(since), until=parse_time(until), form=form, status=status)
+    return ENCODERS[fmt](orders)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export indexed orders and fax outcomes as CSV or JSONL.")
+    parser.add_argument("--since", help="Orders submitted at or after this date/time (UTC), e.g. 2026-09-01")
+    parser.add_argument("--until", help="Orders submitted before this date/time (UTC), e.g. 2026-10-01")
+    parser.add_argument("--form", choices=("refill", "signup"), help="Only this form")
+    parser.add_argument("--status", help="Only this outcome: success, error, duplicate or pending")
+    parser.add_argument("--format", choices=tuple(ENCODERS), default="csv", help="Output format")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        chunks = export_orders(args.format, args.since, args.until, args.form, args.status)
+    except ValueError as e:
+        parser.error(str(e))
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
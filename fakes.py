@@ -0,0 +1,83 @@
+"""
+Stand-ins for running the app in process without Sinch: placeholder
+credentials, a fake FaxSender and a loader that installs it.
+
+Shared by the pytest fixtures in conftest.py, replay.py, benchmark.py and
+import_budget.py, so none of them has to import the others.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict
+
+# Placeholder credentials so config.validate_config() passes when the app is imported
+DUMMY_ENV = {"SINCH_ACCESS_KEY": "x", "SINCH_ACCESS_SECRET": "x", "SINCH_PROJECT_ID": "x"}
+
+
+class FakeFaxSender:
+    """Stand-in for FaxSender that accepts every fax after a fixed delay, without calling Sinch."""
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency: Seconds each Sinch call takes, to mimic the real round trip
+        """
+        self.latency = latency
+        self.sent = 0
+        # Sends run in the thread pool, so several may finish at once
+        self._lock = threading.Lock()
+
+    def _accept(self, fax_number: str, filename: str, **extra: Any) -> Dict[str, Any]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.sent += 1
+            fax_id = f"fake-{self.sent}"
+        return {
+            "success": True,
+            "status_code": 200,
+            "fax_id": fax_id,
+            "response_data": {"id": fax_id},
+            "fax_number": fax_number,
+            "filename": filename,
+            **extra,
+        }
+
+    def send_pdf_with_url(self, pdf_url: str, fax_number: str, filename: str = "document.pdf") -> Dict[str, Any]:
+        return self._accept(fax_number, filename, content_url=pdf_url)
+
+    def send_pdf_as_fax(self, pdf_path: str, fax_number: str, filename: str = "document.pdf") -> Dict[str, Any]:
+        return self._accept(fax_number, filename)
+
+    def validate_fax_number(self, fax_number: str) -> bool:
+        digits = "".join(filter(str.isdigit, fax_number or ""))
+        return 7 <= len(digits) <= 15
+
+    def get_fax_status(self, fax_id: str) -> Dict[str, Any]:
+        return {"success": True, "fax_status": {"id": fax_id, "status": "COMPLETED"}}
+
+    def warm_up(self, timeout: float = 5.0) -> None:
+        pass
+
+
+def load_app(fax_latency: float = 0.0, quiet: bool = True):
+    """
+    Import the app in process with a fake FaxSender and, unless STATE_DIR is set, a fresh state directory.
+
+    Args:
+        fax_latency: Seconds each fake Sinch call takes
+        quiet: Only let warnings from the app's logging through, so the report stays readable
+
+    Returns:
+        The FastAPI app
+    """
+    os.environ.setdefault("STATE_DIR", tempfile.mkdtemp(prefix="webflow-replay-"))
+    for key, value in DUMMY_ENV.items():
+        os.environ.setdefault(key, value)
+    import main
+    if quiet:
+        logging.getLogger().setLevel(logging.WARNING)
+    main.fax_sender = FakeFaxSender(fax_latency)
+    return main.app
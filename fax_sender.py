@@ -4,15 +4,21 @@ Fax sending module for transmitting PDFs via Sinch API.
 import requests
 import os
 import base64
+import logging
 from typing import Dict, Any, Optional
 from config import (
     SINCH_ACCESS_KEY, 
     SINCH_ACCESS_SECRET, 
     SINCH_PROJECT_ID,
     SINCH_FAX_API_URL,
+    SINCH_CONNECT_TIMEOUT_SECONDS,
+    SINCH_READ_TIMEOUT_SECONDS,
     CALLBACK_URL
 )
-from file_hosting import SimpleFileHost
+from metrics import SINCH_RESPONSES
+from tracing import span
+
+logger = logging.getLogger(__name__)
 
 
 class FaxSender:
@@ -31,7 +37,27 @@ class FaxSender:
         self.access_secret = access_secret or SINCH_ACCESS_SECRET
         self.project_id = project_id or SINCH_PROJECT_ID
         self.fax_api_url = f"{SINCH_FAX_API_URL}/{self.project_id}/faxes"
-        self.file_host = SimpleFileHost()
+        # One session keeps the TLS connection to Sinch open between faxes
+        self.session = requests.Session()
+        # A slow Sinch response fails the fax instead of holding a worker thread indefinitely
+        self.timeout = (SINCH_CONNECT_TIMEOUT_SECONDS, SINCH_READ_TIMEOUT_SECONDS)
+        self._file_host = None
+
+    @property
+    def file_host(self):
+        """Public file host, only needed by send_pdf_as_fax and imported on first use."""
+        if self._file_host is None:
+            from file_hosting import SimpleFileHost
+            self._file_host = SimpleFileHost()
+        return self._file_host
+
+    def warm_up(self, timeout: float = 5.0) -> None:
+        """
+        Open a pooled connection to the Sinch API so the first fax skips DNS and TLS setup.
+
+        Any HTTP response will do; network errors are raised to the caller.
+        """
+        self.session.head(SINCH_FAX_API_URL, timeout=timeout)
     
     def send_pdf_as_fax(self, pdf_path: str, fax_number: str, filename: str = "document.pdf") -> Dict[str, Any]:
         """
@@ -57,11 +83,13 @@ class FaxSender:
                     "filename": filename
                 }
             
-            print(f"📄 Uploading PDF to public hosting service...")
-            print(f"📁 PDF path: {pdf_path}")
+            logger.info("Uploading PDF to public hosting service", extra={"fields": {"pdf_path": pdf_path}})
             
             # Upload PDF to get a public URL
-            upload_result = self.file_host.upload_pdf(pdf_path)
+            with span("file_host.upload") as upload_span:
+                upload_result = self.file_host.upload_pdf(pdf_path)
+                if upload_span is not None:
+                    upload_span.attributes["service"] = upload_result.get("service")
             
             if not upload_result["success"]:
                 return {
@@ -72,8 +100,10 @@ class FaxSender:
                 }
             
             content_url = upload_result["public_url"]
-            print(f"✅ PDF uploaded successfully!")
-            print(f"🔗 Public URL: {content_url}")
+            logger.info("PDF uploaded", extra={"fields": {
+                "content_url": content_url,
+                "hosting_service": upload_result.get("service"),
+            }})
             
             # Create basic auth header
             credentials = f"{self.access_key}:{self.access_secret}"
@@ -95,19 +125,20 @@ class FaxSender:
                 'Authorization': f'Basic {encoded_credentials}'
             }
             
-            print(f"📤 Sending fax to {fax_number}...")
-            print(f"🔗 Using content URL: {content_url}")
-            print(f"📋 Payload: {payload}")
+            logger.info("Sending fax", extra={"fields": {"fax_number": fax_number, "content_url": content_url}})
             
             # Send fax request
-            response = requests.post(
-                self.fax_api_url,
-                headers=headers,
-                json=payload
-            )
+            with span("sinch.post") as sinch_span:
+                response = self.session.post(
+                    self.fax_api_url,
+                    headers=headers,
+                    json=payload,
+                    timeout=self.timeout
+                )
+                if sinch_span is not None:
+                    sinch_span.attributes["status_code"] = response.status_code
             
-            print(f"📡 Response status: {response.status_code}")
-            print(f"📄 Response text: {response.text}")
+            self._log_response(response)
             
             if response.status_code in [200, 201]:
                 data = response.json()
@@ -129,6 +160,7 @@ class FaxSender:
                 }
             
         except requests.RequestException as e:
+            SINCH_RESPONSES.labels("error").inc()
             return {
                 "success": False,
                 "error": f"Network error: {str(e)}",
@@ -176,19 +208,20 @@ class FaxSender:
                 'Authorization': f'Basic {encoded_credentials}'
             }
             
-            print(f"📤 Sending fax to {fax_number}...")
-            print(f"🔗 Using PDF URL: {pdf_url}")
-            print(f"📋 Payload: {payload}")
+            logger.info("Sending fax", extra={"fields": {"fax_number": fax_number, "content_url": pdf_url}})
             
             # Send fax request
-            response = requests.post(
-                self.fax_api_url,
-                headers=headers,
-                json=payload
-            )
+            with span("sinch.post") as sinch_span:
+                response = self.session.post(
+                    self.fax_api_url,
+                    headers=headers,
+                    json=payload,
+                    timeout=self.timeout
+                )
+                if sinch_span is not None:
+                    sinch_span.attributes["status_code"] = response.status_code
             
-            print(f"📡 Response status: {response.status_code}")
-            print(f"📄 Response text: {response.text}")
+            self._log_response(response)
             
             if response.status_code in [200, 201]:
                 data = response.json()
@@ -210,6 +243,7 @@ class FaxSender:
                 }
             
         except requests.RequestException as e:
+            SINCH_RESPONSES.labels("error").inc()
             return {
                 "success": False,
                 "error": f"Network error: {str(e)}",
@@ -224,6 +258,18 @@ class FaxSender:
                 "filename": filename
             }
     
+    @staticmethod
+    def _log_response(response: requests.Response):
+        """Log and count the outcome of a Sinch request without dumping the full body."""
+        SINCH_RESPONSES.labels(response.status_code).inc()
+        if response.status_code in [200, 201]:
+            logger.info("Sinch accepted fax", extra={"fields": {"status_code": response.status_code}})
+        else:
+            logger.warning("Sinch rejected fax", extra={"fields": {
+                "status_code": response.status_code,
+                "response_text": response.text[:500],
+            }})
+
     def cleanup_temp_file(self, file_path: str):
         """
         Clean up temporary file if it exists.
@@ -235,7 +281,7 @@ class FaxSender:
             if os.path.exists(file_path):
                 os.remove(file_path)
         except Exception as e:
-            print(f"Warning: Could not delete temporary file {file_path}: {e}")
+            logger.warning("Could not delete temporary file %s: %s", file_path, e)
     
     def validate_fax_number(self, fax_number: str) -> bool:
         """
@@ -269,9 +315,10 @@ class FaxSender:
         try:
             url = f"{self.fax_api_url}/{fax_id}"
             
-            response = requests.get(
+            response = self.session.get(
                 url,
-                auth=(self.access_key, self.access_secret)
+                auth=(self.access_key, self.access_secret),
+                timeout=self.timeout
             )
             
             if response.status_code == 200:
@@ -0,0 +1,183 @@
+"""
+Field mapping from Webflow form submissions to the fields our PDFs expect.
+
+Webflow sends the same field under different names depending on how the form
+was built ("OR-Name", "first_name", "firstName", ...). Each form's aliases are
+compiled once into an inverted alias -> field index with an explicit priority,
+so a submission is resolved in a single pass over its own keys.
+
+For each field the first alias in priority order that the submission
+contains wins, even if its value is empty; that is how the refill form has
+always been mapped. The signup form differs on purpose: the old handler was
+meant to keep the first non-empty value, but it stopped at the first alias
+present, so an empty "Form-phone-number-2" hid the date of birth sent as
+"Form-date-of-brith". SIGNUP_FORM therefore sets prefer_non_empty, and an
+empty alias only wins when no alias of the field has a value.
+"""
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Type
+
+
+class FieldSpec:
+    """One canonical field and the names Webflow may send it under."""
+
+    __slots__ = ("attr", "key", "aliases", "required")
+
+    def __init__(self, attr: str, key: str, aliases: Sequence[str], required: bool = False):
+        """
+        Args:
+            attr: Attribute name on the mapped record
+            key: Canonical key used by the PDF generators
+            aliases: Incoming field names, highest priority first
+            required: Whether a submission without this field is rejected
+        """
+        self.attr = attr
+        self.key = key
+        self.aliases = tuple(aliases)
+        self.required = required
+
+
+class MappedRecord:
+    """Base class for typed, slot-based mapped submissions."""
+
+    __slots__ = ()
+    FIELDS: Tuple[FieldSpec, ...] = ()
+
+    def __init__(self, *values: Any):
+        for spec, value in zip(self.FIELDS, values):
+            setattr(self, spec.attr, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the present fields keyed by their canonical names (the shape generate_pdf expects)."""
+        data = {}
+        for spec in self.FIELDS:
+            value = getattr(self, spec.attr)
+            if value is not None:
+                data[spec.key] = value
+        return data
+
+    def missing_required(self) -> List[str]:
+        """Return the canonical names of required fields that are absent or empty."""
+        return [spec.key for spec in self.FIELDS if spec.required and not getattr(self, spec.attr)]
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{spec.attr}={getattr(self, spec.attr)!r}" for spec in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+
+class RefillOrder(MappedRecord):
+    """Mapped refill order submission."""
+
+    __slots__ = ("first_name", "last_name", "phone", "medication", "note",
+                 "delivery_option", "address", "time_slot")
+    FIELDS = (
+        FieldSpec("first_name", "OR-Name", ['OR-Name', 'OR_Name', 'first_name', 'firstName', 'name'], required=True),
+        FieldSpec("last_name", "OR-Last-name", ['OR-Last-name', 'OR_Last_name', 'last_name', 'lastName', 'surname'], required=True),
+        FieldSpec("phone", "OR-Phone-number", ['OR-Phone-number', 'OR_Phone_number', 'phone_number', 'phoneNumber', 'phone', 'telephone'], required=True),
+        FieldSpec("medication", "OR-Medication", ['OR-Medication', 'OR_Medication', 'medication', 'medications', 'drugs'], required=True),
+        FieldSpec("note", "OR-note", ['OR-note', 'OR_note', 'note', 'notes', 'special_instructions', 'comments']),
+        FieldSpec("delivery_option", "delivery_option", ['OR-Delivery-or-Pick-up', 'delivery_option', 'deliveryOption', 'delivery', 'pickup_option']),
+        FieldSpec("address", "address", ['Form-transfer', 'address', 'delivery_address', 'deliveryAddress', 'street_address']),
+        FieldSpec("time_slot", "time_slot", ['OR-Tomorrow-delivery-time', 'time_slot', 'timeSlot', 'preferred_time', 'time_preference']),
+    )
+
+
+class SignupRecord(MappedRecord):
+    """Mapped patient registration submission."""
+
+    __slots__ = ("first_name", "last_name", "phone", "date_of_birth", "address", "area",
+                 "email", "emergency_contact", "emergency_phone", "notes")
+    FIELDS = (
+        FieldSpec("first_name", "first_name", ['Form-first-name', 'Form first name', 'first_name', 'firstName', 'fname', 'first-name'], required=True),
+        FieldSpec("last_name", "last_name", ['Form-last-name', 'Form last name', 'last_name', 'lastName', 'lname', 'last-name', 'surname'], required=True),
+        FieldSpec("phone", "phone", ['Form-phone-number', 'Form phone number', 'phone', 'phone_number', 'phoneNumber', 'telephone', 'mobile'], required=True),
+        FieldSpec("date_of_birth", "date_of_birth", ['Form-phone-number-2', 'Form-date-of-brith', 'Form Phone Number 2', 'date_of_birth', 'dateOfBirth', 'dob', 'birth_date', 'birthdate']),
+        FieldSpec("address", "address", ['Form-transfer', 'address-input', 'Form transfer', 'address', 'street_address', 'streetAddress', 'street']),
+        FieldSpec("area", "area", ['Form-area', 'Form area', 'area', 'city', 'town', 'region']),
+        FieldSpec("email", "email", ['email', 'email_address', 'emailAddress', 'e-mail']),  # Keep as optional
+        FieldSpec("emergency_contact", "emergency_contact", ['emergency_contact', 'emergencyContact', 'emergency_name']),  # Keep as optional
+        FieldSpec("emergency_phone", "emergency_phone", ['emergency_phone', 'emergencyPhone', 'emergency_number']),  # Keep as optional
+        FieldSpec("notes", "notes", ['notes', 'comments', 'additional_info', 'special_instructions']),  # Keep as optional
+    )
+
+
+def _is_blank(value: Any) -> bool:
+    """Check whether a submitted value is empty (None, "", or only whitespace)."""
+    if isinstance(value, str):
+        return not value.strip()
+    return value is None or value == ""
+
+
+class FormMapping:
+    """Compiled alias index for one form."""
+
+    def __init__(self, name: str, record_cls: Type[MappedRecord], strip_values: bool = False,
+                 prefer_non_empty: bool = False):
+        """
+        Compile a form's aliases into an inverted index.
+
+        Args:
+            name: Form name, used in debug output
+            record_cls: Record class whose FIELDS describe the form
+            strip_values: Strip surrounding whitespace from string values
+            prefer_non_empty: Let a lower-priority alias win when every higher-priority one is empty
+
+        Raises:
+            ValueError: If one alias is claimed by two fields
+        """
+        self.name = name
+        self.record_cls = record_cls
+        self.strip_values = strip_values
+        self.prefer_non_empty = prefer_non_empty
+        self._field_count = len(record_cls.FIELDS)
+        self._index: Dict[str, Tuple[int, int]] = {}
+        for position, spec in enumerate(record_cls.FIELDS):
+            for priority, alias in enumerate(spec.aliases):
+                if alias in self._index:
+                    other = record_cls.FIELDS[self._index[alias][0]]
+                    raise ValueError(f"Alias {alias!r} is mapped to both {other.key!r} and {spec.key!r}")
+                self._index[alias] = (position, priority)
+
+    def resolve(self, raw_data: Mapping[str, Any]) -> MappedRecord:
+        """
+        Map a raw submission onto the form's record in one pass over its keys.
+
+        For each field the highest-priority alias present wins. With
+        prefer_non_empty, a non-empty value beats an empty one regardless of
+        priority, which keeps the first non-empty value in alias order.
+
+        Args:
+            raw_data: Parsed JSON or form fields as sent by Webflow
+
+        Returns:
+            The mapped record; fields that were not sent are None
+        """
+        values: List[Any] = [None] * self._field_count
+        ranks: List[Optional[Tuple[int, int]]] = [None] * self._field_count
+        index = self._index
+        for name, value in raw_data.items():
+            hit = index.get(name)
+            if hit is None:
+                continue
+            position, priority = hit
+            rank = (int(_is_blank(value)) if self.prefer_non_empty else 0, priority)
+            current = ranks[position]
+            if current is not None and current <= rank:
+                continue
+            values[position] = value
+            ranks[position] = rank
+
+        if self.strip_values:
+            values = [value.strip() if isinstance(value, str) else value for value in values]
+        return self.record_cls(*values)
+
+    def aliases(self) -> Dict[str, str]:
+        """Return the alias -> canonical key index (for debugging)."""
+        return {alias: self.record_cls.FIELDS[position].key for alias, (position, _) in self._index.items()}
+
+    def __contains__(self, alias: str) -> bool:
+        return alias in self._index
+
+
+REFILL_FORM = FormMapping("refill", RefillOrder)
+# Deliberately not the old handler's first-alias-present rule; see the module docstring
+SIGNUP_FORM = FormMapping("signup", SignupRecord, strip_values=True, prefer_non_empty=True)
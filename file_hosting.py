@@ -4,8 +4,13 @@ File hosting utilities for making PDFs publicly accessible for Sinch fax API.
 import requests
 import os
 import tempfile
+import logging
 from typing import Dict, Any, Optional
 
+from metrics import FILE_HOSTING_UPLOADS
+
+logger = logging.getLogger(__name__)
+
 class FileHostingService:
     """Service to make PDFs publicly accessible for fax sending."""
     
@@ -88,12 +93,16 @@ class SimpleFileHost:
         ]
         
         for service in services:
+            service_name = service.__name__.replace("_try_", "")
             try:
                 result = service(pdf_path)
                 if result["success"]:
+                    FILE_HOSTING_UPLOADS.labels(service_name, "success").inc()
                     return result
+                FILE_HOSTING_UPLOADS.labels(service_name, "failure").inc()
             except Exception as e:
-                print(f"Service failed: {e}")
+                FILE_HOSTING_UPLOADS.labels(service_name, "error").inc()
+                logger.warning("File hosting service failed: %s", e)
                 continue
         
         return {
@@ -0,0 +1,157 @@
+"""
+Idempotency keys for fax submissions.
+
+Webflow and browsers retry slow requests and visitors double-click Submit;
+without this every retry rendered and faxed the order again. A submission
+is identified by its Idempotency-Key header or, without one, by a hash of
+its mapped fields. The first request claims the key and does the work. A
+concurrent duplicate waits for that result, and a later duplicate gets the
+stored ApiResponse back without rendering or faxing. Derived keys are kept
+for a short time only, since identical fields can also be a genuine repeat
+order.
+
+Keys are stored in SQLite under STATE_DIR, so duplicates are caught across
+uvicorn workers. Only successful responses are stored. If a submission
+fails, its key is released so a retry does the work again.
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+from config import IDEMPOTENCY_DB, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_WAIT_SECONDS
+
+# A pending claim expires after this, in case its worker died mid-request
+PENDING_STALE_SECONDS = 120.0
+
+# How often a waiting duplicate checks whether the first request has finished
+POLL_INTERVAL_SECONDS = 0.05
+
+# Longest Idempotency-Key header accepted
+MAX_KEY_LENGTH = 255
+
+CLAIMED = "claimed"
+PENDING = "pending"
+DONE = "done"
+
+
+class IdempotencyConflict(Exception):
+    """The key is in use by a request with different content, or is still being processed."""
+
+
+def request_fingerprint(form_name: str, data: Dict[str, Any]) -> str:
+    """Stable hash of a form's mapped fields."""
+    payload = orjson.dumps([form_name, data], option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+
+class IdempotencyStore:
+    """SQLite-backed table of idempotency keys with their stored responses."""
+
+    def __init__(self, path: str = IDEMPOTENCY_DB, ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS):
+        """
+        Args:
+            path: SQLite database file, shared by all workers on the node
+            ttl_seconds: How long a completed response is replayed for
+        """
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            " key TEXT PRIMARY KEY,"
+            " fingerprint TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " response BLOB,"
+            " created_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idempotency_expires_at ON idempotency (expires_at)")
+
+    def claim(self, key: str, fingerprint: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Try to claim a key.
+
+        Returns:
+            (CLAIMED, None) if the caller should do the work, (PENDING, None) if
+            another request holds the key, or (DONE, response) with the stored response
+
+        Raises:
+            IdempotencyConflict: If the key was used for different content
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM idempotency WHERE expires_at < ?", (now,))
+                row = self._db.execute(
+                    "SELECT fingerprint, state, response FROM idempotency WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute("COMMIT")
+                    stored_fingerprint, state, response = row
+                    if stored_fingerprint != fingerprint:
+                        raise IdempotencyConflict("Idempotency-Key was already used for a different submission")
+                    if state == DONE:
+                        return DONE, orjson.loads(response)
+                    return PENDING, None
+                self._db.execute(
+                    "INSERT OR REPLACE INTO idempotency (key, fingerprint, state, response, created_at, expires_at)"
+                    " VALUES (?, ?, ?, NULL, ?, ?)",
+                    (key, fingerprint, PENDING, now, now + PENDING_STALE_SECONDS),
+                )
+                self._db.execute("COMMIT")
+                return CLAIMED, None
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def complete(self, key: str, response: Dict[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store the response for a claimed key.
+
+        Args:
+            key: The claimed key
+            response: Response replayed to later duplicates
+            ttl_seconds: How long it is replayed for (defaults to the store's TTL)
+        """
+        now = time.time()
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._db.execute(
+                "UPDATE idempotency SET state = ?, response = ?, expires_at = ? WHERE key = ?",
+                (DONE, orjson.dumps(response), now + ttl_seconds, key),
+            )
+
+    def release(self, key: str) -> None:
+        """Give up a claimed key so that a retry does the work again."""
+        with self._lock:
+            self._db.execute("DELETE FROM idempotency WHERE key = ? AND state = ?", (key, PENDING))
+
+    async def wait(self, key: str, fingerprint: str,
+                   timeout: float = IDEMPOTENCY_WAIT_SECONDS) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Wait while another request holds the key.
+
+        Returns:
+            The first claim() result other than PENDING
+
+        Raises:
+            IdempotencyConflict: If the other request is still running after the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            state, response = self.claim(key, fingerprint)
+            if state != PENDING:
+                return state, response
+            if time.monotonic() >= deadline:
+                raise IdempotencyConflict("A request with this Idempotency-Key is still being processed")
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
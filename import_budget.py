@@ -0,0 +1,109 @@
+"""
+Measure import time of the app and check it against per-module budgets.
+
+Runs ``python -X importtime -c "import main"`` in a fresh interpreter (a few
+times, keeping the fastest run to reduce noise) and reports the cumulative
+import time of every module main.py imports directly.
+
+Usage:
+    python import_budget.py            # report and check budgets
+    python import_budget.py --runs 5 --top 15
+
+Exits with status 1 if the total or any budgeted module is over budget.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from fakes import DUMMY_ENV
+
+# Cumulative import-time budgets in milliseconds, set about a third above
+# current measurements. "main" is the whole app.
+BUDGETS_MS: Dict[str, float] = {
+    "main": 900.0,
+    "fastapi": 350.0,
+    "pdf_generator": 180.0,
+    "fax_sender": 120.0,
+    "logging_setup": 120.0,
+    "admin": 60.0,
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure() -> Dict[str, float]:
+    """
+    Import main in a fresh interpreter and return cumulative milliseconds per top-level import.
+
+    Returns:
+        Mapping of module name to cumulative import time; "main" is the total
+    """
+    env = dict(os.environ)
+    # Placeholder credentials so config.validate_config() passes in the child process
+    for key, value in DUMMY_ENV.items():
+        env.setdefault(key, value)
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=here, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing main failed:\n{result.stderr[-2000:]}")
+
+    timings: Dict[str, float] = {}
+    in_main: List[Tuple[str, float]] = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        # Children are printed before their parent, two spaces deeper per level
+        if indent == 3:
+            in_main.append((name, cumulative_us / 1000.0))
+        elif indent == 1 and name == "main":
+            for child, ms in in_main:
+                timings[child] = max(timings.get(child, 0.0), ms)
+            timings["main"] = cumulative_us / 1000.0
+            break
+        elif indent == 1:
+            in_main = []
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check import-time budgets for the app")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to run; the fastest is kept")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    best: Dict[str, float] = {}
+    for _ in range(max(args.runs, 1)):
+        for name, ms in measure().items():
+            best[name] = min(best.get(name, ms), ms)
+
+    print(f"{'module':<24}{'ms':>10}{'budget':>10}")
+    over = []
+    ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+    shown = {name for name, _ in ranked[:args.top + 1]} | set(BUDGETS_MS)
+    for name, ms in ranked:
+        if name not in shown:
+            continue
+        budget = BUDGETS_MS.get(name)
+        flag = ""
+        if budget is not None and ms > budget:
+            over.append(name)
+            flag = "  OVER"
+        budget_text = f"{budget:.0f}" if budget is not None else "-"
+        print(f"{name:<24}{ms:>10.1f}{budget_text:>10}{flag}")
+
+    if over:
+        print(f"\nOver budget: {', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Request body ingestion for Webflow form submissions.
+
+Bodies are read incrementally with a hard size cap, so oversized submissions
+are rejected before they are buffered. JSON is decoded with orjson and form
+bodies (urlencoded or multipart) are fed chunk by chunk to python-multipart's
+streaming parsers. Batch bodies (JSONL) are split into lines as they arrive.
+"""
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from urllib.parse import unquote_plus
+
+import orjson
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, QuerystringParser, parse_options_header
+
+from config import MAX_BODY_BYTES
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Request body too large. Maximum size is {max_bytes} bytes."
+    )
+
+
+class _UrlencodedSink:
+    """Collects fields from a streaming application/x-www-form-urlencoded parser."""
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self._name = bytearray()
+        self._value = bytearray()
+        self.parser = QuerystringParser({
+            "on_field_start": self._on_field_start,
+            "on_field_name": self._on_field_name,
+            "on_field_data": self._on_field_data,
+            "on_field_end": self._on_field_end,
+        })
+
+    def _on_field_start(self) -> None:
+        self._name.clear()
+        self._value.clear()
+
+    def _on_field_name(self, data: bytes, start: int, end: int) -> None:
+        self._name += data[start:end]
+
+    def _on_field_data(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+
+    def _on_field_end(self) -> None:
+        # Same decoding as Starlette's form parser; later duplicates win like dict(form)
+        name = unquote_plus(self._name.decode("latin-1"))
+        self.fields[name] = unquote_plus(self._value.decode("latin-1"))
+
+
+class _MultipartSink:
+    """Collects text fields from a streaming multipart/form-data parser; file parts are skipped."""
+
+    def __init__(self, boundary: bytes):
+        self.fields: Dict[str, str] = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._headers: List[Tuple[bytes, bytes]] = []
+        self._name = None
+        self._is_file = False
+        self._value = bytearray()
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self) -> None:
+        self._headers = []
+        self._name = None
+        self._is_file = False
+        self._value.clear()
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers.append((bytes(self._header_field).lower(), bytes(self._header_value)))
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        for field, value in self._headers:
+            if field == b"content-disposition":
+                _, options = parse_options_header(value)
+                name = options.get(b"name")
+                self._name = name.decode("utf-8") if name is not None else None
+                self._is_file = b"filename" in options
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._name is not None and not self._is_file:
+            self._value += data[start:end]
+
+    def _on_part_end(self) -> None:
+        if self._name is not None and not self._is_file:
+            self.fields[self._name] = self._value.decode("utf-8", errors="replace")
+
+
+async def read_submission(request: Request, max_bytes: int = MAX_BODY_BYTES) -> Tuple[Any, str]:
+    """
+    Read and parse a form submission with a size limit.
+
+    Args:
+        request: Incoming request
+        max_bytes: Largest body accepted
+
+    Returns:
+        Tuple of (parsed data, data source label); the data is whatever the
+        JSON body contained, or a dict of form fields
+
+    Raises:
+        HTTPException: 413 if the body exceeds max_bytes, 400 if it is malformed
+    """
+    # Reject on the declared length before reading anything
+    declared_length = request.headers.get("content-length")
+    if declared_length is not None:
+        try:
+            if int(declared_length) > max_bytes:
+                raise _too_large(max_bytes)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+
+    if content_type == b"application/json" or content_type.endswith(b"+json"):
+        body = bytearray()
+        async for chunk in request.stream():
+            body += chunk
+            if len(body) > max_bytes:
+                raise _too_large(max_bytes)
+        if not body:
+            return {}, "JSON"
+        try:
+            return orjson.loads(body), "JSON"
+        except orjson.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Malformed JSON body: {e}")
+
+    if content_type == b"multipart/form-data":
+        boundary = options.get(b"boundary")
+        if not boundary:
+            raise HTTPException(status_code=400, detail="Multipart body without a boundary")
+        sink = _MultipartSink(boundary)
+    else:
+        # Webflow posts application/x-www-form-urlencoded; treat anything else the same way
+        sink = _UrlencodedSink()
+
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:
+                raise _too_large(max_bytes)
+            if chunk:
+                sink.parser.write(chunk)
+        sink.parser.finalize()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Malformed form body: {e}")
+    return sink.fields, "Form Data"
+
+
+class LineError(Exception):
+    """A JSONL line that could not be used; the rest of the batch continues."""
+
+
+async def iter_jsonl(request: Request, max_line_bytes: int = MAX_BODY_BYTES,
+                     max_lines: int = 1000) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Parse a JSONL request body line by line as it is received.
+
+    Blank lines are skipped. Bad lines are yielded as LineError instances
+    instead of values so the caller can report them and carry on.
+
+    Args:
+        request: Incoming request with a JSONL body
+        max_line_bytes: Longest line accepted
+        max_lines: Most lines accepted in one body
+
+    Yields:
+        Tuples of (1-based line number, parsed value or LineError)
+
+    Raises:
+        HTTPException: 413 once the body has more than max_lines lines
+    """
+    buffer = bytearray()
+    line_no = 0
+    skipping = False  # Inside an over-long line, dropping bytes until its newline
+
+    def parse(line: bytes) -> Any:
+        # A long line can also arrive complete within one chunk
+        if len(line) > max_line_bytes:
+            return LineError(f"Line longer than {max_line_bytes} bytes")
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            return LineError(f"Malformed JSON: {e}")
+
+    async for chunk in request.stream():
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line = bytes(buffer[:newline]).strip()
+            del buffer[:newline + 1]
+            if skipping:
+                skipping = False
+                continue
+            line_no += 1
+            if not line:
+                continue
+            if line_no > max_lines:
+                raise HTTPException(status_code=413, detail=f"Batch too large. Maximum is {max_lines} lines.")
+            yield line_no, parse(line)
+        if len(buffer) > max_line_bytes and not skipping:
+            line_no += 1
+            yield line_no, LineError(f"Line longer than {max_line_bytes} bytes")
+            skipping = True
+        if skipping:
+            buffer.clear()
+
+    line = bytes(buffer).strip()
+    if line and not skipping:
+        line_no += 1
+        if line_no > max_lines:
+            raise HTTPException(status_code=413, detail=f"Batch too large. Maximum is {max_lines} lines.")
+        yield line_no, parse(line)
@@ -0,0 +1,177 @@
+"""
+Non-blocking structured logging.
+
+Log calls only enqueue the record; a QueueListener thread formats it as a
+JSON line and writes it to stdout. Patient fields in structured data are
+redacted before anything is written, and levels can be set per module.
+
+Usage:
+    logger = logging.getLogger(__name__)
+    logger.info("Fax sent", extra={"fields": {"fax_id": fax_id}})
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from typing import Any, Dict, Optional
+
+import orjson
+
+from config import LOG_LEVEL, LOG_LEVELS
+from request_context import get_request_id
+
+REDACTED = "[REDACTED]"
+
+# Field names (lower-cased, with "-" and " " folded to "_") that hold patient data.
+# Parts match by substring, so "OR-Phone-number" and "emergency_phone" are both caught;
+# "brith" is how the Webflow signup form spells its date-of-birth field.
+SENSITIVE_KEYS = {"name", "or_name", "fname", "lname"}
+SENSITIVE_KEY_PARTS = (
+    "first_name", "last_name", "firstname", "lastname", "surname", "phone", "telephone",
+    "mobile", "medication", "drug", "note", "comment", "address", "street", "transfer",
+    "birth", "brith", "dob", "email", "e_mail", "instruction", "additional_info", "emergency",
+    "area", "city", "town", "region",
+)
+
+# Third-party loggers that are too chatty at DEBUG (python-multipart logs every parser callback)
+DEFAULT_MODULE_LEVELS = {"multipart": "INFO"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _is_sensitive(key: str) -> bool:
+    folded = key.lower().replace("-", "_").replace(" ", "_")
+    return folded in SENSITIVE_KEYS or any(part in folded for part in SENSITIVE_KEY_PARTS)
+
+
+def redact(value: Any, key: str = "") -> Any:
+    """
+    Return a copy of a value with patient fields masked.
+
+    Args:
+        value: Dict, list or scalar to redact
+        key: Name of the field holding the value, if any
+
+    Returns:
+        The redacted value; dict keys are kept so field names stay visible
+    """
+    if isinstance(value, dict):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v, key) for v in value]
+    if key and _is_sensitive(key) and value not in (None, ""):
+        return REDACTED
+    return value
+
+
+class RedactingFilter(logging.Filter):
+    """Attach the request ID and redact structured fields before a record is queued."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = get_request_id()
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = redact(fields)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that defers all formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and exception text now (args may be mutated later),
+        # but leave JSON encoding to the background writer
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "module=LEVEL,other=LEVEL" into a dict."""
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: Optional[str] = None, module_levels: Optional[str] = None) -> None:
+    """
+    Install the queue handler on the root logger and start the background writer.
+
+    Safe to call more than once; later calls only update levels.
+
+    Args:
+        level: Root level (defaults to LOG_LEVEL, then INFO)
+        module_levels: Per-module levels as "fax_sender=DEBUG,uvicorn.access=WARNING"
+            (defaults to LOG_LEVELS)
+    """
+    global _listener
+
+    root = logging.getLogger()
+    root.setLevel((level or LOG_LEVEL).upper())
+    levels = dict(DEFAULT_MODULE_LEVELS)
+    levels.update(_parse_levels(module_levels or LOG_LEVELS))
+    for name, module_level in levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    if _listener is not None:
+        return
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(RedactingFilter())
+
+    writer = logging.StreamHandler(sys.stdout)
+    writer.setFormatter(JsonFormatter())
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    # Route uvicorn's loggers through the same queue instead of their own stream handlers
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(log_queue, writer, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background writer."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,125 @@
+"""
+Event-loop lag monitor.
+
+A probe task sleeps for LOOP_LAG_INTERVAL_SECONDS and records how late it
+woke up as a histogram, which shows how long requests wait for the loop.
+Each wake-up is also a heartbeat: a watchdog thread checks it, and when the
+loop has not run for LOOP_BLOCK_THRESHOLD_SECONDS it grabs the loop
+thread's stack. That stack is the synchronous call blocking every other
+request (a requests.post, a ReportLab build, file I/O). It is logged when
+the loop recovers, counted, and kept for GET /admin/event-loop.
+"""
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Deque, Dict, List, Optional
+
+from config import LOOP_LAG_INTERVAL_SECONDS, LOOP_BLOCK_THRESHOLD_SECONDS
+from metrics import EVENT_LOOP_LAG_SECONDS, EVENT_LOOP_BLOCKS
+
+logger = logging.getLogger(__name__)
+
+# Blocking episodes kept for the admin endpoint
+MAX_RECENT_BLOCKS = 50
+
+
+class LoopMonitor:
+    """Measures event-loop lag and captures the stack of calls that block the loop."""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_SECONDS,
+                 threshold: float = LOOP_BLOCK_THRESHOLD_SECONDS):
+        """
+        Args:
+            interval: Seconds between probes (0 disables the monitor)
+            threshold: Blocking time after which the loop thread's stack is captured
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.recent_blocks: Deque[Dict[str, Any]] = collections.deque(maxlen=MAX_RECENT_BLOCKS)
+        self._beat = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Start the probe on the running loop and the watchdog thread."""
+        if self.interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Stop the probe and the watchdog."""
+        self._stop.set()
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    async def _probe(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            EVENT_LOOP_LAG_SECONDS.observe(max(now - expected, 0.0))
+            self._beat = now
+
+    def _watch(self) -> None:
+        # A heartbeat is due every interval; anything beyond that is time the loop could not run
+        check_every = min(self.interval, self.threshold) / 2
+        blocked_since: Optional[float] = None
+        stack: List[traceback.FrameSummary] = []
+        while not self._stop.wait(check_every):
+            beat = self._beat
+            if blocked_since is not None:
+                if beat != blocked_since:
+                    self._report(beat - blocked_since - self.interval, stack)
+                    blocked_since = None
+                continue
+            if time.monotonic() - beat - self.interval > self.threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = traceback.extract_stack(frame) if frame is not None else []
+                del frame
+                blocked_since = beat
+
+    def _report(self, blocked_seconds: float, stack: List[traceback.FrameSummary]) -> None:
+        EVENT_LOOP_BLOCKS.inc()
+        self.recent_blocks.append({
+            "at": time.time(),
+            "blocked_ms": round(blocked_seconds * 1000.0, 1),
+            "stack": [
+                {"filename": f.filename, "lineno": f.lineno, "name": f.name, "line": f.line}
+                for f in stack
+            ],
+        })
+        logger.warning("Event loop was blocked", extra={"fields": {
+            "blocked_ms": round(blocked_seconds * 1000.0, 1),
+            "stack": "".join(traceback.format_list(stack)),
+        }})
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Settings and recent blocking episodes, newest first."""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "threshold_seconds": self.threshold,
+            "recent_blocks": list(reversed(self.recent_blocks)),
+        }
+
+
+loop_monitor = LoopMonitor()
@@ -2,14 +2,49 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from logging_setup import configure_logging
+configure_logging()
+
+import asyncio
+import logging
+import orjson
+from typing import Optional
+from fastapi import FastAPI, Request, HTTPException, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
 import os
-import tempfile
+import time
+import uuid
 from pdf_generator import generate_pdf, generate_signup_pdf
 from fax_sender import FaxSender
-from config import PHARMACY_FAX_NUMBER
+from pdf_store import create_pdf_store
+from pdf_response import PDFResponse
+from ingestion import LineError, iter_jsonl, read_submission
+from request_context import RequestContextMiddleware, get_request_id, get_stage_timings, stage
+from capture import CaptureBuffer
+from admin import require_admin_token, router as admin_router
+from profiling import ProfilingMiddleware
+from admission import AdmissionMiddleware, wait_until_idle
+from metrics import DUPLICATE_SUBMISSIONS, FULL_SLOT_ORDERS, MetricsMiddleware, registry as metrics_registry
+from pdf_store import SharedPDFStore
+from tracing import exporter as trace_exporter
+from sampler import stack_sampler
+from loop_monitor import loop_monitor
+from warmup import readiness
+import dedupe
+from dedupe import duplicate_index
+from orders import order_index
+from medications import medication_index
+from delivery_slots import SlotFull, UnknownSlot, is_delivery, slot_bookings
+from idempotency import DONE, IdempotencyConflict, IdempotencyStore, MAX_KEY_LENGTH, request_fingerprint
+from config import (PHARMACY_FAX_NUMBER, PUBLIC_BASE_URL, IDEMPOTENCY_DERIVE_KEYS, IDEMPOTENCY_DERIVED_TTL_SECONDS,
+                    SHUTDOWN_DRAIN_SECONDS)
+from config import BATCH_MAX_LINES, BATCH_RENDER_CONCURRENCY, BATCH_SEND_CONCURRENCY
+from config import MEDICATION_SEED_ORDERS
+from field_mapping import FormMapping, REFILL_FORM, SIGNUP_FORM
 from models import FormData, SignupData, SendFaxFromFileRequest, ApiResponse, HealthResponse
 
 app = FastAPI(
@@ -17,9 +52,18 @@ app = FastAPI(
     description="API to receive form data from Webflow and send it as fax via Sinch",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
+# Opt-in CPU profiling of submission requests. Added first, so it is the innermost middleware:
+# a profile covers routing, body ingestion and the handler, but not the time a request waited
+# for admission, CORS handling, or the metrics and request-context middlewares
+app.add_middleware(ProfilingMiddleware)
+
+# Bound concurrent submissions per endpoint; inside CORS so 503s still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
+
 # Add CORS middleware for Webflow integration
 app.add_middleware(
     CORSMiddleware,
@@ -31,28 +75,526 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Server-Timing", "Retry-After"],
 )
 
+# Record per-handler latency, then (outermost) assign each request an ID for structured logs
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestContextMiddleware)
+
+logger = logging.getLogger(__name__)
+
+# Diagnostic endpoints under /admin (require ADMIN_TOKEN)
+app.include_router(admin_router)
+
 # Initialize services
 fax_sender = FaxSender()
 
-# Store temporary PDFs for serving
-temp_pdfs = {}
-
-@app.get("/pdf/{pdf_id}")
-async def serve_pdf(pdf_id: str):
-    """Serve a PDF file by ID."""
-    if pdf_id in temp_pdfs:
-        pdf_path = temp_pdfs[pdf_id]
-        if os.path.exists(pdf_path):
-            return FileResponse(
-                pdf_path,
-                media_type="application/pdf",
-                filename=f"prescription_{pdf_id}.pdf"
-            )
-    
+# Sampled, redacted submissions for diagnosing field mapping (see GET /debug-form-data)
+submission_captures = CaptureBuffer()
+idempotency_store = IdempotencyStore()
+
+# Store temporary PDFs for serving (shared by all workers, expired by a reaper task)
+pdf_store = create_pdf_store()
+
+# The shared store already reports node-wide totals; the in-memory one is per worker
+_pdf_store_per_worker = not isinstance(pdf_store, SharedPDFStore)
+metrics_registry.gauge_func(
+    "webflow_stored_pdfs", "Temporary PDFs waiting to be fetched.",
+    lambda: pdf_store.stats()["count"], per_worker=_pdf_store_per_worker
+)
+metrics_registry.gauge_func(
+    "webflow_stored_pdf_bytes", "Total size of temporary PDFs waiting to be fetched.",
+    lambda: pdf_store.stats()["bytes"], per_worker=_pdf_store_per_worker
+)
+
+
+@app.on_event("startup")
+async def restore_pdfs():
+    """Take over PDFs that the previous in-memory store persisted at shutdown."""
+    if not _pdf_store_per_worker:
+        return  # The shared store's index already survives restarts
+    restored = pdf_store.restore(SharedPDFStore())
+    if restored:
+        logger.info("Restored persisted PDFs", extra={"fields": {"count": restored}})
+
+
+@app.on_event("startup")
+async def start_pdf_reaper():
+    """Start the background task that expires temporary PDFs."""
+    pdf_store.start_reaper()
+
+
+@app.on_event("startup")
+async def start_metrics_flusher():
+    """Start publishing this worker's metrics for the other workers' /metrics."""
+    metrics_registry.start_flusher()
+
+
+@app.on_event("startup")
+async def start_stack_sampler():
+    """Start the always-on stack sampler for this worker."""
+    stack_sampler.start()
+
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Start measuring event-loop lag and watching for blocking calls."""
+    loop_monitor.start()
+
+
+@app.on_event("startup")
+async def start_warmup():
+    """Warm up PDF rendering and the Sinch connection before reporting ready."""
+    readiness.start(fax_sender)
+
+
+@app.on_event("startup")
+async def load_medication_index():
+    """Seed the medication typeahead from the name list and recent orders."""
+    def load():
+        medication_index.load_list()
+        medication_index.observe_all(order_index.recent_medications(MEDICATION_SEED_ORDERS))
+        logger.info("Medication index loaded", extra={"fields": medication_index.stats()})
+    await asyncio.get_running_loop().run_in_executor(None, load)
+
+
+@app.on_event("shutdown")
+async def drain_submissions():
+    """Report not ready and wait for in-flight submissions to finish sending."""
+    readiness.begin_drain()
+    remaining = await wait_until_idle(SHUTDOWN_DRAIN_SECONDS)
+    if remaining:
+        logger.warning("Shutting down with submissions still in flight", extra={"fields": {"count": remaining}})
+
+
+@app.on_event("shutdown")
+async def stop_pdf_reaper():
+    """Stop the temporary PDF reaper."""
+    await pdf_store.stop_reaper()
+
+
+@app.on_event("shutdown")
+async def persist_pdfs():
+    """Keep unfetched PDFs from the in-memory store so the next process can still serve them."""
+    if not _pdf_store_per_worker:
+        return  # Shared-store PDFs already live in PDF_SPOOL_DIR
+    persisted = pdf_store.persist(SharedPDFStore())
+    logger.info("Persisted unfetched PDFs", extra={"fields": {"count": persisted}})
+
+
+@app.on_event("shutdown")
+async def stop_metrics_flusher():
+    """Stop publishing metrics and drop this worker's snapshot."""
+    await metrics_registry.stop_flusher()
+
+
+@app.on_event("shutdown")
+async def stop_trace_exporter():
+    """Flush finished traces to disk."""
+    trace_exporter.stop()
+
+
+@app.on_event("shutdown")
+async def stop_stack_sampler():
+    """Stop the stack sampler."""
+    stack_sampler.stop()
+
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    """Stop the event-loop lag monitor."""
+    await loop_monitor.stop()
+
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """Readiness check: 503 until the startup warm-up has finished."""
+    status = readiness.status()
+    return ORJSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_admin_token)])
+async def metrics():
+    """Prometheus metrics for all workers on this node."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.api_route("/pdf/{pdf_id}", methods=["GET", "HEAD"])
+async def serve_pdf(pdf_id: str, request: Request):
+    """
+    Serve a PDF file by ID.
+
+    Supports HEAD, ETag/If-None-Match (304) and single Range requests (206),
+    since Sinch and file hosts may fetch the same document more than once.
+    """
+    pdf_path = pdf_store.get(pdf_id)
+    if pdf_path is not None:
+        try:
+            return PDFResponse(request, pdf_path, filename=f"prescription_{pdf_id}.pdf")
+        except FileNotFoundError:
+            pass
+
     raise HTTPException(status_code=404, detail="PDF not found")
 
+@app.get("/medications/suggest")
+async def suggest_medications(response: Response, q: str = "", limit: int = 10):
+    """
+    Medication names starting with what the patient has typed, for the refill form's typeahead.
+
+    Args:
+        q: Text typed so far
+        limit: Maximum number of suggestions (up to 20)
+    """
+    # Private: unlisted names come from patients' submissions, so keep them out of shared caches
+    response.headers["Cache-Control"] = "private, max-age=60"
+    return {"query": q, "suggestions": medication_index.complete(q, limit)}
+
+
+@app.get("/delivery-slots")
+async def delivery_slots(response: Response, date: Optional[str] = None):
+    """
+    Capacity left in each delivery time slot, for the refill form to grey out full slots.
+
+    Args:
+        date: Delivery date (YYYY-MM-DD); defaults to tomorrow, the date new orders are delivered
+    """
+    try:
+        availability = slot_bookings.availability(date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
+    response.headers["Cache-Control"] = "no-cache"
+    return availability
+
+
+async def _process_submission(request: Request, form: FormMapping, render, fax_filename: str,
+                              label: str, message_prefix: str = "") -> ApiResponse:
+    """
+    Shared pipeline for form submissions: parse, map, render, store and fax.
+
+    A sampled fraction of submissions is recorded in the capture buffer,
+    including ones rejected for missing fields.
+
+    Args:
+        request: Incoming Webflow request
+        form: Compiled field mapping for the form
+        render: PDF generator taking (data, output_path)
+        fax_filename: Filename given to the fax
+        label: Description of the data used in log lines
+        message_prefix: Prefix for response messages (e.g. "Signup ")
+    """
+    sampled = submission_captures.should_sample()
+    seen = {}  # Filled in as the pipeline progresses, for the capture buffer
+    outcome = "exception"
+    try:
+        response = await _run_submission(request, form, render, fax_filename, label, message_prefix, seen)
+        outcome = "success" if response.status == "success" else "fax_error"
+        return response
+    except HTTPException as e:
+        outcome = f"http_{e.status_code}"
+        raise
+    finally:
+        if sampled:
+            submission_captures.record(
+                endpoint=request.url.path,
+                form=form.name,
+                content_type=request.headers.get("content-type", ""),
+                raw_data=seen.get("raw_data"),
+                mapped=seen.get("mapped"),
+                missing_required=seen.get("missing_required"),
+                outcome=outcome,
+                timings=get_stage_timings(),
+                request_id=get_request_id()
+            )
+
+
+async def _run_submission(request: Request, form: FormMapping, render, fax_filename: str,
+                          label: str, message_prefix: str, seen: dict) -> ApiResponse:
+    """Run the submission pipeline stages, recording intermediate results in ``seen``."""
+    with stage("parse"):
+        raw_data, data_source = await read_submission(request)
+    seen["raw_data"] = raw_data
+    logger.info("Received %s", label, extra={"fields": {
+        "form": form.name,
+        "content_type": request.headers.get("content-type", ""),
+        "data_source": data_source,
+        "keys": list(raw_data) if isinstance(raw_data, dict) else None,
+    }})
+
+    # Check if we have any data
+    if not isinstance(raw_data, dict) or not raw_data:
+        raise HTTPException(
+            status_code=400,
+            detail=f"No form data received. Please ensure you're sending the required {form.name} form fields."
+        )
+
+    # Map Webflow field variations to our expected format
+    with stage("map"):
+        record = form.resolve(raw_data)
+        data = record.to_dict()
+        # Validate required fields
+        missing_fields = record.missing_required()
+    seen["mapped"] = data
+    seen["missing_required"] = missing_fields
+
+    if missing_fields:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Missing required fields: {', '.join(missing_fields)}. Received data: {raw_data}"
+        )
+
+    logger.debug("Mapped %s", label, extra={"fields": {"form": form.name, "data": data}})
+
+    key, ttl_seconds = _idempotency_key(request, form, data)
+    if key is None:
+        return await _render_and_fax(form, record, data, render, fax_filename, message_prefix)
+
+    fingerprint = request_fingerprint(form.name, data)
+    with stage("idempotency"):
+        try:
+            state, stored = await idempotency_store.wait(key, fingerprint)
+        except IdempotencyConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    if state == DONE:
+        logger.info("Replaying stored response for duplicate %s", label, extra={"fields": {"form": form.name}})
+        return ApiResponse(**stored)
+
+    try:
+        response = await _render_and_fax(form, record, data, render, fax_filename, message_prefix)
+    except BaseException:
+        idempotency_store.release(key)
+        raise
+    if response.status == "success":
+        idempotency_store.complete(key, jsonable_encoder(response), ttl_seconds=ttl_seconds)
+    else:
+        # Let a retry try the fax again
+        idempotency_store.release(key)
+    return response
+
+
+def _idempotency_key(request: Request, form: FormMapping, data: dict):
+    """
+    Key identifying repeats of this submission, and how long its response is replayed.
+
+    The client's Idempotency-Key header is used when present, with the
+    store's TTL; otherwise the key is derived from the mapped fields (unless
+    IDEMPOTENCY_DERIVE_KEYS is off) and kept for IDEMPOTENCY_DERIVED_TTL_SECONDS.
+
+    Returns:
+        Tuple of (key, TTL in seconds or None for the store's default);
+        the key is None if the submission should not be deduplicated
+    """
+    header_key = request.headers.get("idempotency-key")
+    if header_key is not None:
+        if not header_key or len(header_key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"
+            )
+        return f"{form.name}:header:{header_key}", None
+    if IDEMPOTENCY_DERIVE_KEYS:
+        return f"{form.name}:derived:{request_fingerprint(form.name, data)}", IDEMPOTENCY_DERIVED_TTL_SECONDS
+    return None, None
+
+
+async def _render_and_fax(form: FormMapping, record, data: dict, render, fax_filename: str,
+                          message_prefix: str) -> ApiResponse:
+    """Render and fax a mapped submission, recording it and its outcome in the order index."""
+    try:
+        return await _indexed(form, record, lambda: _send_submission(
+            form, record, data, render, fax_filename, message_prefix
+        ))
+    except SlotFull as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except UnknownSlot as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def _indexed(form: FormMapping, record, send) -> ApiResponse:
+    """Add a mapped submission to the order index, await ``send()`` and record its outcome."""
+    with stage("index"):
+        order_id = order_index.add(form.name, record, get_request_id())
+    try:
+        response = await send()
+    except BaseException as e:
+        order_index.set_outcome(order_id, "error", error=str(e) or type(e).__name__)
+        raise
+    order_index.set_outcome(order_id, response.status, fax_id=response.fax_id, error=response.error)
+    if response.status == "success":
+        medication_index.observe(getattr(record, "medication", None), record.phone)
+    return response
+
+
+def _bounded_threadpool(slots: asyncio.Semaphore):
+    """Executor for _send_submission that runs each step in the thread pool while holding one of ``slots``."""
+    async def run(func, *args, **kwargs):
+        async with slots:
+            return await run_in_threadpool(func, *args, **kwargs)
+    return run
+
+
+async def _send_submission(form: FormMapping, record, data: dict, render, fax_filename: str,
+                           message_prefix: str, run_render=run_in_threadpool, run_send=run_in_threadpool) -> ApiResponse:
+    """
+    Check for a near-duplicate, book the delivery slot, then render the submission, publish it for Sinch and send the fax.
+
+    Shared by the single-submission endpoints and the batch endpoint, which
+    differ only in how the blocking render and Sinch steps are run: both go
+    to the thread pool, so the event loop keeps serving other requests, and
+    the batch additionally bounds how many of its lines run each step at once.
+
+    Args:
+        render: Callable rendering (data, output path) to a PDF and returning its path
+        run_render: Async executor ``run(func, *args, **kwargs)`` for the render step (the thread pool by default)
+        run_send: Async executor for the Sinch request
+
+    Raises:
+        SlotFull: Under DELIVERY_SLOT_POLICY "reject", if the delivery slot is full
+        UnknownSlot: Under DELIVERY_SLOT_POLICY "reject", if the delivery slot is not offered
+    """
+    duplicate_key, data, duplicate_response = _check_duplicate(form, record, data, message_prefix)
+    if duplicate_response is not None:
+        return duplicate_response
+
+    booking, data = _book_delivery_slot(record, data)
+    try:
+        # Step 1: Generate PDF from form data
+        pdf_id = str(uuid.uuid4())[:8]  # Short unique ID
+        with stage("render"), pdf_store.staged(pdf_id) as staging_path:
+            pdf_path = await run_render(render, data, staging_path)
+
+        # Store PDF for serving (removed by the store's reaper once it expires)
+        with stage("store"):
+            pdf_store.put(pdf_id, pdf_path)
+
+        # Step 2: Send PDF as fax using its public URL
+        with stage("fax_send"):
+            fax_result = await run_send(
+                fax_sender.send_pdf_with_url,
+                pdf_url=f"{PUBLIC_BASE_URL}/pdf/{pdf_id}",
+                fax_number=PHARMACY_FAX_NUMBER,
+                filename=fax_filename
+            )
+
+        with stage("respond"):
+            response = _fax_response(fax_result, duplicate_key, message_prefix)
+    except BaseException:
+        slot_bookings.release(booking)
+        raise
+    if response.status != "success":
+        slot_bookings.release(booking)
+    return response
+
+
+def _book_delivery_slot(record, data: dict):
+    """
+    Book a delivery order's time slot and apply DELIVERY_SLOT_POLICY if the slot is full or not offered.
+
+    Returns:
+        Tuple of (booking to release if no fax is sent, or None; data to render)
+
+    Raises:
+        SlotFull: Under the "reject" policy, if the slot is full
+        UnknownSlot: Under the "reject" policy, if the slot is not one of DELIVERY_SLOTS
+    """
+    time_slot = getattr(record, "time_slot", None)
+    if not slot_bookings.enabled or not time_slot or not is_delivery(record.delivery_option):
+        return None, data
+    with stage("slot"):
+        try:
+            booking = slot_bookings.book(time_slot)
+        except SlotFull:
+            FULL_SLOT_ORDERS.labels("reject").inc()
+            logger.info("Rejected order for a full delivery slot", extra={"fields": {"slot": time_slot}})
+            raise
+        except UnknownSlot:
+            logger.info("Order for a delivery slot that is not offered", extra={"fields": {
+                "policy": slot_bookings.policy, "slot": time_slot,
+            }})
+            if slot_bookings.policy == "reject":
+                raise
+            if slot_bookings.policy == "flag":
+                note = f"UNLISTED DELIVERY SLOT: {time_slot} is not an offered delivery time."
+                data = _prepend_note(record, data, note)
+            return None, data
+    if not booking.over_capacity:
+        return booking, data
+
+    FULL_SLOT_ORDERS.labels(slot_bookings.policy).inc()
+    logger.info("Order for a full delivery slot", extra={"fields": {
+        "policy": slot_bookings.policy, "slot": booking.label, "date": booking.date,
+    }})
+    if slot_bookings.policy == "flag":
+        note = f"SLOT OVERBOOKED: the {booking.label} delivery slot on {booking.date} was already full."
+        data = _prepend_note(record, data, note)
+    return booking, data
+
+
+def _prepend_note(record, data: dict, note: str) -> dict:
+    """Copy of ``data`` with ``note`` put in front of the form's note field."""
+    key = dedupe.note_key(record)
+    data = dict(data)
+    data[key] = f"{note} {data[key]}" if data.get(key) else note
+    return data
+
+
+def _check_duplicate(form: FormMapping, record, data: dict, message_prefix: str):
+    """
+    Apply DUPLICATE_POLICY to a mapped submission.
+
+    Returns:
+        Tuple of (fingerprint to record once faxed or None, data to render,
+        response to return instead of faxing or None)
+    """
+    if duplicate_index.policy == "allow":
+        return None, data, None
+    with stage("dedupe"):
+        duplicate_key = dedupe.fingerprint(form.name, record)
+        earlier = duplicate_index.find(duplicate_key)
+    if earlier is None:
+        return duplicate_key, data, None
+
+    DUPLICATE_SUBMISSIONS.labels(form.name, duplicate_index.policy).inc()
+    minutes_ago = round((time.time() - earlier["sent_at"]) / 60)
+    logger.info("Near-duplicate %s submission", form.name, extra={"fields": {
+        "policy": duplicate_index.policy,
+        "earlier_fax_id": earlier["fax_id"],
+        "minutes_ago": minutes_ago,
+        "repeats": earlier["repeats"],
+    }})
+    if duplicate_index.policy == "suppress":
+        duplicate_index.suppressed(duplicate_key)
+        return duplicate_key, data, ApiResponse(
+            status="duplicate",
+            message=f"{message_prefix}Same as a submission faxed {minutes_ago} min ago; no new fax was sent",
+            fax_id=earlier["fax_id"],
+            fax_number=PHARMACY_FAX_NUMBER
+        )
+    sent_at = time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(earlier["sent_at"]))
+    note = f"POSSIBLE DUPLICATE of a submission faxed at {sent_at} (fax ID {earlier['fax_id']})."
+    return duplicate_key, _prepend_note(record, data, note), None
+
+
+def _fax_response(fax_result: dict, duplicate_key, message_prefix: str) -> ApiResponse:
+    """Turn a FaxSender result into the API response, remembering successful sends for dedupe."""
+    if fax_result["success"]:
+        if duplicate_key is not None:
+            duplicate_index.record(duplicate_key, fax_result.get("fax_id"))
+        return ApiResponse(
+            status="success",
+            message=f"{message_prefix}PDF generated and fax sent successfully",
+            fax_id=fax_result.get("fax_id"),
+            fax_number=fax_result["fax_number"],
+            response_data=fax_result["response_data"]
+        )
+    else:
+        return ApiResponse(
+            status="error",
+            message=f"{message_prefix}PDF generated but fax failed",
+            error=fax_result["error"]
+        )
+
+
 @app.post("/send-signup-fax", response_model=ApiResponse)
 async def send_signup_fax(request: Request):
     """
@@ -62,131 +604,16 @@ async def send_signup_fax(request: Request):
     and sends it as a fax using the Sinch API.
     """
     try:
-        # Get content type to determine how to parse the data
-        content_type = request.headers.get("content-type", "")
-        
-        # Parse data based on content type
-        raw_data = {}
-        if "application/json" in content_type:
-            try:
-                raw_data = await request.json()
-                print(f"Received JSON signup data: {raw_data}")
-            except Exception as e:
-                print(f"Error parsing JSON: {e}")
-                raw_data = {}
-        else:
-            # Handle form-encoded data (application/x-www-form-urlencoded)
-            try:
-                form_data = await request.form()
-                raw_data = dict(form_data)
-                print(f"Received form signup data: {raw_data}")
-            except Exception as e:
-                print(f"Error parsing form data: {e}")
-                raw_data = {}
-        
-        # Log the incoming data for debugging
-        print(f"Content-Type: {content_type}")
-        print(f"Parsed signup data: {raw_data}")
-        print(f"Raw form data keys: {list(raw_data.keys()) if raw_data else 'No data'}")
-        
-        # Check if we have any data
-        if not raw_data:
-            raise HTTPException(
-                status_code=400, 
-                detail="No form data received. Please ensure you're sending the required signup form fields."
-            )
-        
-        # Map common Webflow field variations to our expected format
-        data = {}
-        
-        # Map field names (handle various formats Webflow might send)
-        field_mappings = {
-            'first_name': ['Form-first-name', 'Form first name', 'first_name', 'firstName', 'fname', 'first-name'],
-            'last_name': ['Form-last-name', 'Form last name', 'last_name', 'lastName', 'lname', 'last-name', 'surname'],
-            'phone': ['Form-phone-number', 'Form phone number', 'phone', 'phone_number', 'phoneNumber', 'telephone', 'mobile'],
-            'date_of_birth': ['Form-phone-number-2', 'Form-date-of-brith', 'Form Phone Number 2', 'date_of_birth', 'dateOfBirth', 'dob', 'birth_date', 'birthdate'],
-            'address': ['Form-transfer', 'address-input', 'Form transfer', 'address', 'street_address', 'streetAddress', 'street'],
-            'area': ['Form-area', 'Form area', 'area', 'city', 'town', 'region'],
-            'email': ['email', 'email_address', 'emailAddress', 'e-mail'],  # Keep as optional
-            'emergency_contact': ['emergency_contact', 'emergencyContact', 'emergency_name'],  # Keep as optional
-            'emergency_phone': ['emergency_phone', 'emergencyPhone', 'emergency_number'],  # Keep as optional
-            'notes': ['notes', 'comments', 'additional_info', 'special_instructions']  # Keep as optional
-        }
-        
-        # Try to map each expected field
-        for expected_field, possible_names in field_mappings.items():
-            for name in possible_names:
-                if name in raw_data:
-                    value = raw_data[name]
-                    # Only use the value if it's not empty, or if we don't have a value yet
-                    if value and value.strip() and (expected_field not in data or not data[expected_field].strip()):
-                        data[expected_field] = value.strip()
-                    elif expected_field not in data:
-                        data[expected_field] = value
-                    break
-        
-        # Validate required fields (based on actual Webflow form)
-        required_fields = ['first_name', 'last_name', 'phone']
-        missing_fields = []
-        for field in required_fields:
-            if field not in data or not data[field]:
-                missing_fields.append(field)
-        
-        if missing_fields:
-            raise HTTPException(
-                status_code=422, 
-                detail=f"Missing required fields: {', '.join(missing_fields)}. Received data: {raw_data}"
-            )
-        
-        print(f"Mapped signup form data: {data}")
-        
-        # Step 1: Generate PDF from signup form data
-        import uuid
-        pdf_id = str(uuid.uuid4())[:8]  # Short unique ID
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            pdf_path = generate_signup_pdf(data, temp_file.name)
-        
-        # Store PDF for serving
-        temp_pdfs[pdf_id] = pdf_path
-        
-        # Step 2: Create public URL for the PDF
-        base_url = "https://webflow-form.onrender.com"  # Your Render URL
-        pdf_url = f"{base_url}/pdf/{pdf_id}"
-        
-        # Step 3: Send PDF as fax using the public URL
-        fax_result = fax_sender.send_pdf_with_url(
-            pdf_url=pdf_url,
-            fax_number=PHARMACY_FAX_NUMBER,  # You can change this to a different fax number for signups
-            filename="patient_registration.pdf"
+        # You can change PHARMACY_FAX_NUMBER to a different fax number for signups
+        return await _process_submission(
+            request, SIGNUP_FORM, generate_signup_pdf,
+            fax_filename="patient_registration.pdf",
+            label="signup data",
+            message_prefix="Signup "
         )
-        
-        # Step 4: Clean up temporary file after some delay
-        import threading
-        def cleanup_later():
-            import time
-            time.sleep(300)  # Wait 5 minutes
-            if pdf_id in temp_pdfs:
-                fax_sender.cleanup_temp_file(temp_pdfs[pdf_id])
-                del temp_pdfs[pdf_id]
-        
-        threading.Thread(target=cleanup_later, daemon=True).start()
-        
-        if fax_result["success"]:
-            return ApiResponse(
-                status="success",
-                message="Signup PDF generated and fax sent successfully",
-                fax_id=fax_result.get("fax_id"),
-                fax_number=fax_result["fax_number"],
-                response_data=fax_result["response_data"]
-            )
-        else:
-            return ApiResponse(
-                status="error",
-                message="Signup PDF generated but fax failed",
-                error=fax_result["error"]
-            )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -208,130 +635,123 @@ async def send_fax(request: Request):
     and sends it as a fax using the Sinch API.
     """
     try:
-        # Get content type to determine how to parse the data
-        content_type = request.headers.get("content-type", "")
-        
-        # Parse data based on content type
-        raw_data = {}
-        if "application/json" in content_type:
-            try:
-                raw_data = await request.json()
-                print(f"Received JSON data: {raw_data}")
-            except Exception as e:
-                print(f"Error parsing JSON: {e}")
-                raw_data = {}
-        else:
-            # Handle form-encoded data (application/x-www-form-urlencoded)
-            try:
-                form_data = await request.form()
-                raw_data = dict(form_data)
-                print(f"Received form data: {raw_data}")
-            except Exception as e:
-                print(f"Error parsing form data: {e}")
-                raw_data = {}
-        
-        # Log the incoming data for debugging
-        print(f"Content-Type: {content_type}")
-        print(f"Parsed data: {raw_data}")
-        print(f"Raw data keys: {list(raw_data.keys()) if raw_data else 'No data'}")
-        
-        # Check if we have any data
-        if not raw_data:
-            raise HTTPException(
-                status_code=400, 
-                detail="No form data received. Please ensure you're sending the required form fields."
-            )
-        
-        # Map common Webflow field variations to our expected format
-        data = {}
-        
-        # Map field names (handle various formats Webflow might send)
-        field_mappings = {
-            'OR-Name': ['OR-Name', 'OR_Name', 'first_name', 'firstName', 'name'],
-            'OR-Last-name': ['OR-Last-name', 'OR_Last_name', 'last_name', 'lastName', 'surname'],
-            'OR-Phone-number': ['OR-Phone-number', 'OR_Phone_number', 'phone_number', 'phoneNumber', 'phone', 'telephone'],
-            'OR-Medication': ['OR-Medication', 'OR_Medication', 'medication', 'medications', 'drugs'],
-            'OR-note': ['OR-note', 'OR_note', 'note', 'notes', 'special_instructions', 'comments'],
-            'delivery_option': ['OR-Delivery-or-Pick-up', 'delivery_option', 'deliveryOption', 'delivery', 'pickup_option'],
-            'address': ['Form-transfer', 'address', 'delivery_address', 'deliveryAddress', 'street_address'],
-            'time_slot': ['OR-Tomorrow-delivery-time', 'time_slot', 'timeSlot', 'preferred_time', 'time_preference']
-        }
-        
-        # Try to map each expected field
-        for expected_field, possible_names in field_mappings.items():
-            for name in possible_names:
-                if name in raw_data:
-                    data[expected_field] = raw_data[name]
-                    break
-        
-        # Validate required fields
-        required_fields = ['OR-Name', 'OR-Last-name', 'OR-Phone-number', 'OR-Medication']
-        missing_fields = []
-        for field in required_fields:
-            if field not in data or not data[field]:
-                missing_fields.append(field)
-        
-        if missing_fields:
-            raise HTTPException(
-                status_code=422, 
-                detail=f"Missing required fields: {', '.join(missing_fields)}. Received data: {raw_data}"
-            )
-        
-        print(f"Mapped form data: {data}")
-        
-        # Step 1: Generate PDF from form data
-        import uuid
-        pdf_id = str(uuid.uuid4())[:8]  # Short unique ID
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            pdf_path = generate_pdf(data, temp_file.name)
-        
-        # Store PDF for serving
-        temp_pdfs[pdf_id] = pdf_path
-        
-        # Step 2: Create public URL for the PDF
-        # In production, this would be your actual domain
-        base_url = "https://webflow-form.onrender.com"  # Your Render URL
-        pdf_url = f"{base_url}/pdf/{pdf_id}"
-        
-        # Step 3: Send PDF as fax using the public URL
-        fax_result = fax_sender.send_pdf_with_url(
-            pdf_url=pdf_url,
-            fax_number=PHARMACY_FAX_NUMBER,
-            filename="refill_order.pdf"
+        return await _process_submission(
+            request, REFILL_FORM, generate_pdf,
+            fax_filename="refill_order.pdf",
+            label="form data"
         )
-        
-        # Step 4: Clean up temporary file after some delay
-        # (Give time for fax to be sent)
-        import threading
-        def cleanup_later():
-            import time
-            time.sleep(300)  # Wait 5 minutes
-            if pdf_id in temp_pdfs:
-                fax_sender.cleanup_temp_file(temp_pdfs[pdf_id])
-                del temp_pdfs[pdf_id]
-        
-        threading.Thread(target=cleanup_later, daemon=True).start()
-        
-        if fax_result["success"]:
-            return ApiResponse(
-                status="success",
-                message="PDF generated and fax sent successfully",
-                fax_id=fax_result.get("fax_id"),
-                fax_number=fax_result["fax_number"],
-                response_data=fax_result["response_data"]
-            )
-        else:
-            return ApiResponse(
-                status="error",
-                message="PDF generated but fax failed",
-                error=fax_result["error"]
-            )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class _JSONLinesResponse(StreamingResponse):
+    """
+    Streaming JSONL response that can be sent while the request body is still arriving.
+
+    StreamingResponse normally also waits for a disconnect on ``receive``,
+    which would swallow the batch body that the endpoint is still reading.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+
+@app.post("/send-fax/batch", dependencies=[Depends(require_admin_token)])
+async def send_fax_batch(request: Request):
+    """
+    Send many refill orders from one JSONL body, one Webflow-shaped JSON object per line.
+
+    Lines are parsed and mapped as they arrive. PDFs are rendered and faxes
+    sent with bounded concurrency, and each line's result is streamed back
+    as a JSON line as soon as it is ready (so results may be out of order),
+    followed by a summary line.
+    """
+    return _JSONLinesResponse(_run_batch(request))
+
+
+async def _run_batch(request: Request):
+    """Read, process and report the lines of a batch, yielding JSONL result lines."""
+    render_slots = asyncio.Semaphore(BATCH_RENDER_CONCURRENCY)
+    send_slots = asyncio.Semaphore(BATCH_SEND_CONCURRENCY)
+    # Bounds how many lines are held between parsing and their result, which also throttles reading
+    pending = asyncio.Semaphore(BATCH_RENDER_CONCURRENCY + BATCH_SEND_CONCURRENCY)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def process(line_no: int, item) -> None:
+        try:
+            result = await _batch_line(line_no, item, render_slots, send_slots)
+        except Exception as e:
+            logger.exception("Batch line %d failed", line_no)
+            result = {"line": line_no, "status": "error", "error": str(e)}
+        finally:
+            pending.release()
+        await results.put(result)
+
+    async def read() -> None:
+        tasks = []
+        try:
+            async for line_no, item in iter_jsonl(request, max_lines=BATCH_MAX_LINES):
+                await pending.acquire()
+                tasks.append(asyncio.create_task(process(line_no, item)))
+        except HTTPException as e:
+            await results.put({"status": "aborted", "error": e.detail})
+        except Exception as e:
+            await results.put({"status": "aborted", "error": f"Could not read batch: {e}"})
+        finally:
+            # Lines already started are finished, even if the client went away
+            await asyncio.gather(*tasks)
+            await results.put(None)
+
+    reader = asyncio.create_task(read())
+    counts = {}
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            yield orjson.dumps(result) + b"\n"
+        summary = {"lines": sum(n for status, n in counts.items() if status != "aborted"), **counts}
+        logger.info("Batch finished", extra={"fields": {"summary": summary}})
+        yield orjson.dumps({"summary": summary}) + b"\n"
+    finally:
+        await reader
+
+
+async def _batch_line(line_no: int, item, render_slots: asyncio.Semaphore,
+                      send_slots: asyncio.Semaphore) -> dict:
+    """Map, render and fax one batch line, returning its result entry."""
+    if isinstance(item, LineError):
+        return {"line": line_no, "status": "invalid", "error": str(item)}
+    if not isinstance(item, dict) or not item:
+        return {"line": line_no, "status": "invalid", "error": "Each line must be a non-empty JSON object"}
+
+    with stage("map"):
+        record = REFILL_FORM.resolve(item)
+        missing_fields = record.missing_required()
+    if missing_fields:
+        return {
+            "line": line_no,
+            "status": "invalid",
+            "error": f"Missing required fields: {', '.join(missing_fields)}",
+            "missing_required": missing_fields,
+        }
+
+    try:
+        response = await _indexed(REFILL_FORM, record, lambda: _send_submission(
+            REFILL_FORM, record, record.to_dict(), generate_pdf, "refill_order.pdf", "",
+            run_render=_bounded_threadpool(render_slots), run_send=_bounded_threadpool(send_slots)
+        ))
+    except (SlotFull, UnknownSlot) as e:
+        return {"line": line_no, "status": "rejected", "error": str(e)}
+    return {"line": line_no, **jsonable_encoder(response, exclude_none=True)}
+
+
 @app.post("/generate-pdf", response_model=ApiResponse)
 async def generate_pdf_only(form_data: FormData):
     """
@@ -436,19 +856,20 @@ async def debug_form_data(request: Request):
     Use this to troubleshoot form field mapping issues.
     """
     try:
-        # Get content type to determine how to parse the data
         content_type = request.headers.get("content-type", "")
-        
-        # Parse data based on content type
-        if "application/json" in content_type:
-            raw_data = await request.json()
-            data_source = "JSON"
-        else:
-            # Handle form-encoded data (application/x-www-form-urlencoded)
-            form_data = await request.form()
-            raw_data = dict(form_data)
-            data_source = "Form Data"
-        
+        raw_data, data_source = await read_submission(request)
+
+        # Show how each form's field mapping would resolve this submission
+        mapped = {}
+        if isinstance(raw_data, dict):
+            for form in (REFILL_FORM, SIGNUP_FORM):
+                record = form.resolve(raw_data)
+                mapped[form.name] = {
+                    "mapped_data": record.to_dict(),
+                    "missing_required": record.missing_required(),
+                    "unmapped_fields": [k for k in raw_data if k not in form]
+                }
+
         return {
             "status": "debug",
             "message": "Form data received successfully",
@@ -456,8 +877,15 @@ async def debug_form_data(request: Request):
             "data_source": data_source,
             "received_data": raw_data,
             "field_names": list(raw_data.keys()) if isinstance(raw_data, dict) else "Not a dictionary",
-            "data_types": {k: type(v).__name__ for k, v in raw_data.items()} if isinstance(raw_data, dict) else "Not a dictionary"
+            "data_types": {k: type(v).__name__ for k, v in raw_data.items()} if isinstance(raw_data, dict) else "Not a dictionary",
+            "mapped": mapped if mapped else "Not a dictionary"
         }
+    except HTTPException as e:
+        return ORJSONResponse(status_code=e.status_code, content={
+            "status": "error",
+            "message": f"Error processing request: {e.detail}",
+            "content_type": request.headers.get("content-type", "unknown")
+        })
     except Exception as e:
         return {
             "status": "error",
@@ -465,6 +893,21 @@ async def debug_form_data(request: Request):
             "content_type": request.headers.get("content-type", "unknown")
         }
 
+@app.get("/debug-form-data", dependencies=[Depends(require_admin_token)])
+async def get_captured_form_data(limit: int = 50):
+    """
+    Show recently captured real submissions to /send-fax and /send-signup-fax.
+
+    A sampled fraction (CAPTURE_SAMPLE_RATE) of submissions is kept in memory
+    with patient values redacted: raw field names, mapped result, content type,
+    outcome and stage timings. Requires the X-Admin-Token header.
+    """
+    return {
+        "status": "debug",
+        "capture": submission_captures.stats(),
+        "captures": submission_captures.snapshot(limit)
+    }
+
 @app.get("/", response_model=HealthResponse)
 async def root():
     """Health check endpoint"""
@@ -474,12 +917,17 @@ async def root():
         version="1.0.0",
         endpoints={
             "docs": "/docs",
+            "ready": "/ready",
             "send_fax": "/send-fax",
+            "send_fax_batch": "POST /send-fax/batch (admin, JSONL)",
+            "medication_suggestions": "GET /medications/suggest?q=",
+            "delivery_slots": "GET /delivery-slots?date=",
             "send_signup_fax": "/send-signup-fax",
             "send_signup_fax_alt": "/send_signup_fax",
             "generate_pdf": "/generate-pdf",
             "send_fax_from_file": "/send-fax-from-file",
             "fax_status": "/fax-status/{fax_id}",
-            "debug_form_data": "/debug-form-data"
+            "debug_form_data": "/debug-form-data",
+            "captured_form_data": "GET /debug-form-data (admin)"
         }
     )
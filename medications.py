@@ -0,0 +1,188 @@
+"""
+Medication name typeahead for the refill form.
+
+Patients type medications free-form, and misspelled names lead to callbacks
+from the pharmacy. GET /medications/suggest offers completions while they
+type. Names live in one sorted list of normalized keys: a prefix lookup is a
+bisect to the first key with that prefix plus a short scan, and matches are
+ranked by how often the name was submitted.
+
+The list is seeded from medications.txt and from the medications of recent
+orders in the order index, then grows as faxed refills come in. Submitted
+text comes from patients, so a name not on the list is only suggested once
+MEDICATION_MIN_SUBMITTERS different patients (told apart by a keyed hash of
+their phone number, never the number itself) have submitted it: one
+patient's typos or private notes are never offered to others, however often
+they resubmit. At most MAX_PENDING_NAMES such names are tracked, least
+recently submitted dropped first. Each worker keeps its own copy.
+"""
+import bisect
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import MEDICATION_LIST_PATH, MEDICATION_MIN_SUBMITTERS
+
+logger = logging.getLogger(__name__)
+
+MAX_SUGGESTIONS = 20
+
+# Keys looked at per lookup; bounds the cost of one- and two-letter prefixes
+MAX_SCAN = 1000
+
+# Names not on the list that have not reached MEDICATION_MIN_SUBMITTERS yet, tracked at most
+MAX_PENDING_NAMES = 10000
+
+_WHITESPACE = re.compile(r"\s+")
+_NON_DIGITS = re.compile(r"\D+")
+_SEPARATORS = re.compile(r"[,;\n]+")
+# A name ends at the first word that starts with a digit or bracket, e.g. "Vitamin D3" in "Vitamin D3 1000 IU (daily)"
+_NAME_END = re.compile(r"\s[\d(\[]")
+
+
+def normalize(name: str) -> str:
+    """Lookup key for a medication name or typed prefix."""
+    return _WHITESPACE.sub(" ", name).strip().casefold()
+
+
+def medication_names(text: Optional[str]) -> List[str]:
+    """Split a free-form medication field into names, dropping doses and instructions."""
+    names = []
+    for item in _SEPARATORS.split(text or ""):
+        item = " " + _WHITESPACE.sub(" ", item).strip()
+        end = _NAME_END.search(item)
+        name = item[:end.start() if end else None].strip(" -.")
+        if 2 <= len(name) <= 60:
+            names.append(name)
+    return names
+
+
+class MedicationIndex:
+    """Sorted medication names with submission counts, for ranked prefix completion."""
+
+    def __init__(self, min_submitters: int = MEDICATION_MIN_SUBMITTERS, max_pending: int = MAX_PENDING_NAMES):
+        """
+        Args:
+            min_submitters: Different patients who must submit a name not on the list before it is suggested
+            max_pending: Names not on the list tracked before they are suggested; the least recent are dropped
+        """
+        self.min_submitters = min_submitters
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._keys: List[str] = []  # Sorted keys of the names that are suggested
+        self._display: Dict[str, str] = {}
+        self._counts: Dict[str, int] = {}  # Submissions of each suggested name, for ranking
+        self._known: Set[str] = set()
+        # Names not suggested yet: first spelling seen and hashed patients who submitted them, least recent first
+        self._pending: "OrderedDict[str, Tuple[str, Set[bytes]]]" = OrderedDict()
+        # Per-process key, so the stored hashes cannot be matched against a list of phone numbers
+        self._salt = os.urandom(16)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def load_list(self, path: str = MEDICATION_LIST_PATH) -> int:
+        """
+        Add the names in a list file (one per line, # for comments).
+
+        Returns:
+            Number of names added
+        """
+        try:
+            with open(path, encoding="utf-8") as f:
+                names = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        except OSError as e:
+            logger.warning("Medication list not loaded", extra={"fields": {"path": path, "error": str(e)}})
+            return 0
+        added = 0
+        with self._lock:
+            for name in names:
+                key = normalize(name)
+                self._known.add(key)
+                self._display[key] = name
+                self._counts.setdefault(key, 0)
+                self._pending.pop(key, None)
+                added += self._add_key(key)
+        return added
+
+    def _submitter_id(self, phone: Optional[str]) -> Optional[bytes]:
+        digits = _NON_DIGITS.sub("", phone or "")
+        if len(digits) == 11 and digits.startswith("1"):
+            digits = digits[1:]
+        if not digits:
+            return None
+        return hashlib.blake2b(digits.encode("ascii"), key=self._salt, digest_size=8).digest()
+
+    def observe(self, medication_text: Optional[str], phone: Optional[str] = None) -> None:
+        """
+        Count the names in a submitted medication field, adding ones that enough patients have now submitted.
+
+        Args:
+            medication_text: The order's free-form medication field
+            phone: The patient's phone number; without one, names not on the list are not counted
+        """
+        submitter = self._submitter_id(phone)
+        for name in medication_names(medication_text):
+            key = normalize(name)
+            with self._lock:
+                if key in self._counts:
+                    self._counts[key] += 1
+                    continue
+                if submitter is None:
+                    continue
+                display, submitters = self._pending.pop(key, (name, set()))
+                submitters.add(submitter)
+                if len(submitters) >= self.min_submitters:
+                    self._counts[key] = len(submitters)
+                    self._display[key] = display
+                    self._add_key(key)
+                    continue
+                self._pending[key] = (display, submitters)
+                while len(self._pending) > self.max_pending:
+                    self._pending.popitem(last=False)
+
+    def observe_all(self, orders: Iterable[Tuple[Optional[str], Optional[str]]]) -> None:
+        """Observe (medication text, phone) pairs, e.g. from OrderIndex.recent_medications()."""
+        for medication_text, phone in orders:
+            self.observe(medication_text, phone)
+
+    def _add_key(self, key: str) -> int:
+        index = bisect.bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            return 0
+        self._keys.insert(index, key)
+        return 1
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Names starting with the prefix, most often submitted first, then list names, then shortest.
+
+        Args:
+            prefix: What the patient has typed so far
+            limit: Maximum number of names returned
+        """
+        key = normalize(prefix)
+        if not key:
+            return []
+        with self._lock:
+            start = bisect.bisect_left(self._keys, key)
+            # Every key with this prefix sorts before prefix + the highest code point
+            end = bisect.bisect_left(self._keys, key + "\U0010ffff", start, min(start + MAX_SCAN, len(self._keys)))
+            matches = self._keys[start:end]
+            ranked = sorted(matches, key=lambda k: (-self._counts.get(k, 0), k not in self._known, len(k), k))
+            return [self._display[k] for k in ranked[:max(1, min(limit, MAX_SUGGESTIONS))]]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "suggested_names": len(self._keys),
+                "listed_names": len(self._known),
+                "pending_names": len(self._pending),
+            }
+
+
+medication_index = MedicationIndex()
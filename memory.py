@@ -0,0 +1,288 @@
+"""
+Memory diagnostics for hunting leaks in a running worker.
+
+tracemalloc is off by default (it slows allocation down noticeably) and is
+switched on and off through the admin endpoints. While it runs, snapshots can
+be taken, compared by file and line, and listed by largest allocation sites.
+Live object counts for classes defined in this application come from the
+garbage collector and work without tracemalloc. Everything is per worker
+process: snapshot IDs carry the worker's pid ("<pid>-<n>"), every response
+says which worker answered, and an ID taken by another worker is rejected
+rather than looked up, since under several uvicorn workers consecutive admin
+requests can land on different processes.
+"""
+import gc
+import linecache
+import os
+import re
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Directory holding this application's modules
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Installed packages and the standard library; excluded from "app only" even when they live under
+# APP_DIR, as a virtualenv in the app directory (".venv/" on Render) does
+_LIBRARY_DIRS = tuple(sorted({
+    os.path.abspath(path) for name, path in sysconfig.get_paths().items()
+    if name in ("purelib", "platlib", "stdlib", "platstdlib") and path
+}))
+
+# Snapshots kept in memory; the oldest is dropped when another is taken
+MAX_SNAPSHOTS = 5
+
+KEY_TYPES = ("filename", "lineno", "traceback")
+
+# "Thread-3 (worker)" and "ThreadPoolExecutor-0_1" are counted as "Thread" and "ThreadPoolExecutor"
+_THREAD_SUFFIX = re.compile(r"-\d.*$")
+
+_NOISE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class OtherWorkerSnapshot(LookupError):
+    """A snapshot ID that was taken by a different worker process."""
+
+    def __init__(self, snapshot_id: str, pid: int):
+        super().__init__(
+            f"Snapshot {snapshot_id} belongs to worker {pid}, but this is worker {os.getpid()}; "
+            "retry the request until it reaches that worker, or run a single worker while diagnosing"
+        )
+        self.pid = pid
+
+
+def _is_app_file(filename: str) -> bool:
+    return (filename.startswith(APP_DIR + os.sep) and "site-packages" not in filename
+            and not filename.startswith(tuple(path + os.sep for path in _LIBRARY_DIRS)))
+
+
+def _app_filters() -> List[tracemalloc.Filter]:
+    """tracemalloc filters keeping allocations made from this application's own modules."""
+    return [tracemalloc.Filter(True, os.path.join(APP_DIR, "*"))] + [
+        tracemalloc.Filter(False, pattern)
+        for pattern in [os.path.join(path, "*") for path in _LIBRARY_DIRS] + ["*/site-packages/*"]
+    ]
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, if it can be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryDiagnostics:
+    """Controls tracemalloc and keeps a few numbered snapshots."""
+
+    def __init__(self, max_snapshots: int = MAX_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        self._lock = threading.Lock()
+        self._snapshots: "OrderedDict[int, tracemalloc.Snapshot]" = OrderedDict()
+        self._taken_at: Dict[int, float] = {}
+        self._next_id = 1
+
+    def start(self, frames: int = 1) -> None:
+        """Start tracing allocations, keeping `frames` frames per traceback."""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        """Stop tracing; previously taken snapshots are kept."""
+        tracemalloc.stop()
+
+    def take_snapshot(self) -> str:
+        """
+        Take a snapshot of traced allocations.
+
+        Returns:
+            Snapshot ID, "<pid>-<n>"
+
+        Raises:
+            RuntimeError: If tracemalloc is not running
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_NOISE_FILTERS)
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snapshot_id] = snapshot
+            self._taken_at[snapshot_id] = time.time()
+            while len(self._snapshots) > self.max_snapshots:
+                old_id, _ = self._snapshots.popitem(last=False)
+                self._taken_at.pop(old_id, None)
+        return _public_id(snapshot_id)
+
+    @staticmethod
+    def _number(snapshot_id: str) -> int:
+        """
+        Local number of a snapshot ID.
+
+        Raises:
+            KeyError: If the ID is malformed
+            OtherWorkerSnapshot: If the ID was taken by another worker
+        """
+        pid, _, number = snapshot_id.partition("-")
+        if not (pid.isdigit() and number.isdigit()):
+            raise KeyError(f"Snapshot {snapshot_id} not found")
+        if int(pid) != os.getpid():
+            raise OtherWorkerSnapshot(snapshot_id, int(pid))
+        return int(number)
+
+    def _get(self, snapshot_id: str) -> tracemalloc.Snapshot:
+        number = self._number(snapshot_id)
+        with self._lock:
+            try:
+                return self._snapshots[number]
+            except KeyError:
+                raise KeyError(f"Snapshot {snapshot_id} not found") from None
+
+    def discard(self, snapshot_id: str) -> bool:
+        """
+        Drop a snapshot; returns False if it did not exist.
+
+        Raises:
+            OtherWorkerSnapshot: If the ID was taken by another worker
+        """
+        try:
+            number = self._number(snapshot_id)
+        except KeyError:
+            return False
+        with self._lock:
+            self._taken_at.pop(number, None)
+            return self._snapshots.pop(number, None) is not None
+
+    def status(self) -> Dict[str, Any]:
+        """Tracing state, traced totals and the snapshots held."""
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            snapshots = [
+                {"snapshot_id": _public_id(number), "taken_at": self._taken_at[number]}
+                for number in self._snapshots
+            ]
+        return {
+            "pid": os.getpid(),
+            "rss_bytes": rss_bytes(),
+            "tracing": tracing,
+            "traceback_limit": tracemalloc.get_traceback_limit() if tracing else None,
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory() if tracing else 0,
+            "snapshots": snapshots,
+        }
+
+    def top(self, snapshot_id: str, key_type: str = "lineno", limit: int = 25,
+            app_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Largest allocation sites in a snapshot.
+
+        Args:
+            snapshot_id: Snapshot to inspect
+            key_type: "filename", "lineno" or "traceback"
+            limit: Number of sites returned
+            app_only: Only count allocations made from this application's modules
+
+        Raises:
+            KeyError: If the snapshot does not exist
+            OtherWorkerSnapshot: If the snapshot was taken by another worker
+        """
+        snapshot = self._get(snapshot_id)
+        if app_only:
+            snapshot = snapshot.filter_traces(_app_filters())
+        return [_stat_to_dict(stat) for stat in snapshot.statistics(key_type)[:limit]]
+
+    def diff(self, base_id: str, compare_id: str, key_type: str = "lineno", limit: int = 25,
+             app_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Compare two snapshots, largest growth first.
+
+        Args:
+            base_id: Earlier snapshot
+            compare_id: Later snapshot
+            key_type: "filename", "lineno" or "traceback"
+            limit: Number of sites returned
+            app_only: Only count allocations made from this application's modules
+
+        Raises:
+            KeyError: If a snapshot does not exist
+            OtherWorkerSnapshot: If a snapshot was taken by another worker
+        """
+        base = self._get(base_id)
+        compare = self._get(compare_id)
+        if app_only:
+            app_filter = _app_filters()
+            base = base.filter_traces(app_filter)
+            compare = compare.filter_traces(app_filter)
+        return [_stat_diff_to_dict(stat) for stat in compare.compare_to(base, key_type)[:limit]]
+
+
+def _public_id(number: int) -> str:
+    return f"{os.getpid()}-{number}"
+
+
+def _frames(traceback: tracemalloc.Traceback) -> List[Dict[str, Any]]:
+    return [
+        {
+            "filename": frame.filename,
+            "lineno": frame.lineno,
+            "line": linecache.getline(frame.filename, frame.lineno).strip(),
+        }
+        for frame in traceback
+    ]
+
+
+def _stat_to_dict(stat: tracemalloc.Statistic) -> Dict[str, Any]:
+    return {"size": stat.size, "count": stat.count, "traceback": _frames(stat.traceback)}
+
+
+def _stat_diff_to_dict(stat: tracemalloc.StatisticDiff) -> Dict[str, Any]:
+    return {
+        "size": stat.size,
+        "size_diff": stat.size_diff,
+        "count": stat.count,
+        "count_diff": stat.count_diff,
+        "traceback": _frames(stat.traceback),
+    }
+
+
+def app_object_counts(limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Count live objects whose class is defined in this application's modules.
+
+    Walks every object tracked by the garbage collector, so it takes a moment
+    on a large heap; call it from a worker thread.
+    """
+    app_modules = {
+        name for name, module in list(sys.modules.items())
+        if _is_app_file(getattr(module, "__file__", None) or "")
+    }
+    counts: Counter = Counter()
+    for obj in gc.get_objects():
+        cls = type(obj)
+        if cls.__module__ in app_modules:
+            counts[f"{cls.__module__}.{cls.__qualname__}"] += 1
+    return [{"type": name, "count": count} for name, count in counts.most_common(limit)]
+
+
+def thread_summary() -> Dict[str, int]:
+    """Live threads by name without their numeric suffix, to spot threads that pile up."""
+    counts: Counter = Counter()
+    for thread in threading.enumerate():
+        counts[_THREAD_SUFFIX.sub("", thread.name)] += 1
+    return dict(counts.most_common())
+
+
+memory_diagnostics = MemoryDiagnostics()
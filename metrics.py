@@ -0,0 +1,414 @@
+"""
+Prometheus-format metrics, served on /metrics.
+
+Metrics are kept in plain Python objects with one small lock per labelled
+series, so recording a value on the hot path is a dict lookup and a few
+arithmetic operations. Because the service runs several uvicorn workers,
+each worker periodically writes a snapshot of its series to
+METRICS_DIR, and a scrape merges the snapshots of all live workers.
+"""
+import abc
+import asyncio
+import bisect
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import orjson
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import METRICS_DIR, METRICS_FLUSH_SECONDS
+
+# Latency buckets in seconds: sub-millisecond mapping up to multi-second Sinch calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: Sequence[float]):
+        self._lock = threading.Lock()
+        self._upper_bounds = upper_bounds
+        # One slot per bucket plus +Inf; counts are per bucket, made cumulative on export
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric(abc.ABC):
+    """Base class for labelled metric families."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """Create the series object for one set of label values."""
+
+    @abc.abstractmethod
+    def export(self) -> Dict[LabelValues, object]:
+        """Return the current value of every series, in the form written to worker snapshots."""
+
+    def labels(self, *values: str):
+        """Return the series for the given label values, creating it on first use."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def snapshot(self) -> Dict[LabelValues, object]:
+        with self._lock:
+            return dict(self._children)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled series."""
+        self.labels().inc(amount)
+
+    def export(self) -> Dict[LabelValues, float]:
+        return {labels: child.value for labels, child in self.snapshot().items()}
+
+
+class Histogram(_Metric):
+    """Histogram with fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Record a value in the unlabelled series."""
+        self.labels().observe(value)
+
+    def export(self) -> Dict[LabelValues, List[float]]:
+        exported = {}
+        for labels, child in self.snapshot().items():
+            with child._lock:
+                exported[labels] = list(child.counts) + [child.sum]
+        return exported
+
+
+class GaugeFunc:
+    """Gauge whose value is computed when metrics are collected."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, func: Callable[[], float], per_worker: bool):
+        """
+        Args:
+            name: Metric name
+            documentation: HELP text
+            func: Returns the current value
+            per_worker: True if each worker reports its own value (summed across workers);
+                False if the value is already node-wide and only the scraping worker reports it
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = ()
+        self.func = func
+        self.per_worker = per_worker
+
+
+class Registry:
+    """Collection of metrics with Prometheus text exposition and cross-worker merging."""
+
+    def __init__(self, snapshot_dir: str = METRICS_DIR):
+        self._metrics: List[object] = []
+        self.snapshot_dir = snapshot_dir
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_func(self, name: str, documentation: str, func: Callable[[], float],
+                   per_worker: bool = True) -> GaugeFunc:
+        return self.register(GaugeFunc(name, documentation, func, per_worker))
+
+    # --- Cross-worker snapshots -------------------------------------------
+
+    def _local_snapshot(self) -> Dict[str, Dict[str, object]]:
+        """Export this worker's series as JSON-friendly data."""
+        snapshot: Dict[str, Dict[str, object]] = {}
+        for metric in self._metrics:
+            if isinstance(metric, GaugeFunc):
+                if metric.per_worker:
+                    snapshot[metric.name] = {"": _safe_call(metric.func)}
+                continue
+            snapshot[metric.name] = {"\x1f".join(labels): value for labels, value in metric.export().items()}
+        return snapshot
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.snapshot_dir, f"worker-{pid}.json")
+
+    def flush(self) -> None:
+        """Write this worker's snapshot atomically so other workers can merge it."""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self._snapshot_path(os.getpid())
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(orjson.dumps(self._local_snapshot()))
+        os.replace(temp_path, path)
+
+    def _other_worker_snapshots(self) -> Iterable[Dict[str, Dict[str, object]]]:
+        if not os.path.isdir(self.snapshot_dir):
+            return
+        own = os.getpid()
+        for entry in os.scandir(self.snapshot_dir):
+            if not (entry.name.startswith("worker-") and entry.name.endswith(".json")):
+                continue
+            try:
+                pid = int(entry.name[len("worker-"):-len(".json")])
+            except ValueError:
+                continue
+            if pid == own:
+                continue
+            if not pid_alive(pid):
+                # Worker exited; its counters go with it (Prometheus treats this as a reset)
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(entry.path, "rb") as f:
+                    yield orjson.loads(f.read())
+            except (OSError, orjson.JSONDecodeError):
+                continue
+
+    async def run_flusher(self) -> None:
+        """Write this worker's snapshot every METRICS_FLUSH_SECONDS."""
+        while True:
+            await asyncio.sleep(METRICS_FLUSH_SECONDS)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def start_flusher(self) -> None:
+        """Start the snapshot task on the running event loop."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self.run_flusher())
+
+    async def stop_flusher(self) -> None:
+        """Stop the snapshot task and remove this worker's snapshot."""
+        task, self._flush_task = self._flush_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        try:
+            os.remove(self._snapshot_path(os.getpid()))
+        except OSError:
+            pass
+
+    # --- Exposition --------------------------------------------------------
+
+    def render(self) -> str:
+        """Render all workers' metrics in the Prometheus text format."""
+        merged = self._local_snapshot()
+        for snapshot in self._other_worker_snapshots():
+            for name, series in snapshot.items():
+                target = merged.setdefault(name, {})
+                for key, value in series.items():
+                    if key not in target:
+                        target[key] = value
+                    elif isinstance(value, list):
+                        target[key] = [a + b for a, b in zip(target[key], value)]
+                    else:
+                        target[key] = target[key] + value
+
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, GaugeFunc) and not metric.per_worker:
+                lines.append(f"{metric.name} {_format_value(_safe_call(metric.func))}")
+                continue
+            for key, value in sorted(merged.get(metric.name, {}).items()):
+                labels = tuple(key.split("\x1f")) if key else ()
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (math.inf,), value[:-1]):
+                        cumulative += count
+                        le = 'le="' + _format_value(bound) + '"'
+                        lines.append(f"{metric.name}_bucket{_format_labels(metric.labelnames, labels, le)} {cumulative}")
+                    lines.append(f"{metric.name}_sum{_format_labels(metric.labelnames, labels)} {_format_value(value[-1])}")
+                    lines.append(f"{metric.name}_count{_format_labels(metric.labelnames, labels)} {cumulative}")
+                else:
+                    lines.append(f"{metric.name}{_format_labels(metric.labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _safe_call(func: Callable[[], float]) -> float:
+    try:
+        return float(func())
+    except Exception:
+        return math.nan
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this ID is still running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = Registry()
+
+# Pipeline metrics recorded throughout the service
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "webflow_http_request_duration_seconds",
+    "Time spent handling HTTP requests, by handler, method and status code.",
+    ("handler", "method", "status"),
+)
+STAGE_SECONDS = registry.histogram(
+    "webflow_stage_duration_seconds",
+    "Time spent in each submission pipeline stage (parse, map, render, store, fax_send, ...).",
+    ("stage",),
+)
+SINCH_RESPONSES = registry.counter(
+    "webflow_sinch_responses_total",
+    "Responses from the Sinch fax API by HTTP status code ('error' for network failures).",
+    ("status_code",),
+)
+FILE_HOSTING_UPLOADS = registry.counter(
+    "webflow_file_hosting_uploads_total",
+    "PDF uploads to public file hosting services by service and outcome.",
+    ("service", "outcome"),
+)
+ADMISSION_REJECTIONS = registry.counter(
+    "webflow_admission_rejections_total",
+    "Submission requests answered with 503 by admission control, by path and reason.",
+    ("path", "reason"),
+)
+FULL_SLOT_ORDERS = registry.counter(
+    "webflow_full_slot_orders_total",
+    "Delivery orders for a slot that was already full, by the policy applied (reject, flag or allow).",
+    ("policy",),
+)
+DUPLICATE_SUBMISSIONS = registry.counter(
+    "webflow_duplicate_submissions_total",
+    "Near-duplicate submissions detected, by form and the policy applied (suppress or annotate).",
+    ("form", "action"),
+)
+EVENT_LOOP_LAG_SECONDS = registry.histogram(
+    "webflow_event_loop_lag_seconds",
+    "How late the event loop ran a periodic timer callback.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EVENT_LOOP_BLOCKS = registry.counter(
+    "webflow_event_loop_blocks_total",
+    "Times the event loop was blocked for longer than LOOP_BLOCK_THRESHOLD_SECONDS.",
+)
+registry.gauge_func(
+    "webflow_threads",
+    "Live threads, summed over worker processes.",
+    threading.active_count,
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware that records request latency per handler, method and status code."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched endpoint in the scope; label by its name
+            # rather than the raw path so /pdf/{pdf_id} stays one series
+            endpoint = scope.get("endpoint")
+            handler = getattr(endpoint, "__name__", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(handler, scope["method"], status).observe(time.perf_counter() - start)
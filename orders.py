@@ -0,0 +1,303 @@
+"""
+Local index of submitted orders.
+
+Every mapped refill and signup submission is written to a SQLite database
+under STATE_DIR, together with the fax ID and the outcome once the fax has
+been sent. This lets pharmacy staff check whether a patient's order came
+through without searching Sinch or the logs.
+
+An FTS5 table indexes name, phone, medications, fax ID and status. Phone
+numbers are indexed as their full digits and their last 7 and last 4
+digits, so "555-0100", "7055550100" and "(705) 555" all find the same
+order, and name and medication words match by prefix.
+
+The database holds patient details: it stays on the instance's disk and is
+only searchable through the admin endpoints.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from config import ORDER_INDEX_ENABLED, ORDERS_DB
+from field_mapping import MappedRecord
+
+# Outcome recorded before the fax has been attempted
+PENDING = "pending"
+
+MAX_RESULTS = 200
+
+# Columns of an export row, in order; "data" is the full mapped submission
+EXPORT_COLUMNS = ("id", "form", "submitted_at", "completed_at", "status", "fax_id", "error",
+                  "name", "phone", "medications", "request_id", "data")
+
+_WORD = re.compile(r"\w+")
+_NON_DIGITS = re.compile(r"\D+")
+_PHONE_QUERY = re.compile(r"^[\d\s().+-]+$")
+
+
+def _digits(value: Optional[str]) -> str:
+    digits = _NON_DIGITS.sub("", str(value or ""))
+    # 1-705-555-0100 and 705-555-0100 are the same North American number
+    if len(digits) == 11 and digits.startswith("1"):
+        digits = digits[1:]
+    return digits
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp)) if timestamp is not None else None
+
+
+def phone_tokens(phone: Optional[str]) -> str:
+    """Full digits plus the last 7 and last 4 digits, for the FTS phone column."""
+    digits = _digits(phone)
+    tokens = [digits]
+    for size in (7, 4):
+        if len(digits) > size:
+            tokens.append(digits[-size:])
+    return " ".join(token for token in tokens if token)
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    Turn a free-text search into an FTS5 MATCH expression.
+
+    A query made of digits and phone punctuation is a phone prefix search;
+    anything else matches every word by prefix in any column. Single
+    characters are ignored unless they are the whole query ("Doe's" is
+    searched as "doe").
+
+    Returns:
+        The expression, or None if the query has nothing to search for
+    """
+    query = query.strip()
+    if _PHONE_QUERY.match(query):
+        digits = _digits(query)
+        if len(digits) >= 3:
+            return f'phone : "{digits}"*'
+    words = _WORD.findall(query.casefold())
+    if len(words) > 1:
+        words = [word for word in words if len(word) > 1] or words
+    if not words:
+        return None
+    # Words are quoted so FTS5 operators and column names in the query are taken literally
+    return " AND ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+class OrderIndex:
+    """SQLite table of submitted orders with a full-text index for lookup."""
+
+    def __init__(self, path: str = ORDERS_DB, enabled: bool = ORDER_INDEX_ENABLED):
+        """
+        Args:
+            path: SQLite database file, shared by all workers on the node
+            enabled: When False nothing is stored and searches return nothing
+        """
+        self.enabled = enabled
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if not enabled:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS orders ("
+            " id INTEGER PRIMARY KEY,"
+            " form TEXT NOT NULL,"
+            " submitted_at REAL NOT NULL,"
+            " request_id TEXT,"
+            " name TEXT NOT NULL,"
+            " phone TEXT,"
+            " medications TEXT,"
+            " fax_id TEXT,"
+            " status TEXT NOT NULL,"
+            " error TEXT,"
+            " completed_at REAL,"
+            " data BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS orders_submitted_at ON orders (submitted_at)")
+        self._db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS orders_fts USING fts5("
+            " name, phone, medications, fax_id, status,"
+            " tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+
+    def add(self, form_name: str, record: MappedRecord, request_id: Optional[str] = None) -> Optional[int]:
+        """
+        Store a mapped submission as pending.
+
+        Returns:
+            The order ID to pass to set_outcome(), or None if the index is disabled
+        """
+        if self._db is None:
+            return None
+        name = " ".join(part for part in (record.first_name, record.last_name) if part)
+        phone = record.phone
+        medications = getattr(record, "medication", None)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                order_id = self._db.execute(
+                    "INSERT INTO orders (form, submitted_at, request_id, name, phone, medications, status, data)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (form_name, time.time(), request_id, name, phone, medications, PENDING,
+                     orjson.dumps(record.to_dict())),
+                ).lastrowid
+                self._db.execute(
+                    "INSERT INTO orders_fts (rowid, name, phone, medications, fax_id, status) VALUES (?, ?, ?, ?, '', ?)",
+                    (order_id, name, phone_tokens(phone), medications or "", PENDING),
+                )
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+        return order_id
+
+    def set_outcome(self, order_id: Optional[int], status: str, fax_id: Optional[str] = None,
+                    error: Optional[str] = None) -> None:
+        """Record how a submission ended: the response status and, if one was sent, the fax ID."""
+        if self._db is None or order_id is None:
+            return
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "UPDATE orders SET status = ?, fax_id = ?, error = ?, completed_at = ? WHERE id = ?",
+                    (status, fax_id, error, time.time(), order_id),
+                )
+                self._db.execute(
+                    "UPDATE orders_fts SET status = ?, fax_id = ? WHERE rowid = ?",
+                    (status, fax_id or "", order_id),
+                )
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def search(self, query: str, form: Optional[str] = None, status: Optional[str] = None,
+               limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Find orders matching a name, phone, medication, fax ID or status query, newest first.
+
+        Args:
+            query: Free text, e.g. "jane doe", "555-0100" or "metformin"
+            form: Only orders of this form ("refill" or "signup")
+            status: Only orders with this outcome (e.g. "success", "error", "duplicate", "pending")
+            limit: Maximum number of orders returned
+        """
+        expression = match_expression(query)
+        if self._db is None or expression is None:
+            return []
+        sql = ("SELECT o.id, o.form, o.submitted_at, o.name, o.phone, o.medications, o.fax_id, o.status,"
+               " o.error, o.request_id FROM orders_fts JOIN orders o ON o.id = orders_fts.rowid"
+               " WHERE orders_fts MATCH ?")
+        params: List[Any] = [expression]
+        if form:
+            sql += " AND o.form = ?"
+            params.append(form)
+        if status:
+            sql += " AND o.status = ?"
+            params.append(status)
+        # IDs grow with submission time, and FTS5 can walk its matches in rowid order without sorting
+        sql += " ORDER BY orders_fts.rowid DESC LIMIT ?"
+        params.append(max(1, min(limit, MAX_RESULTS)))
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [
+            {
+                "id": row[0],
+                "form": row[1],
+                "submitted_at": _iso(row[2]),
+                "name": row[3],
+                "phone": row[4],
+                "medications": row[5],
+                "fax_id": row[6],
+                "status": row[7],
+                "error": row[8],
+                "request_id": row[9],
+            }
+            for row in rows
+        ]
+
+    def export(self, since: Optional[float] = None, until: Optional[float] = None, form: Optional[str] = None,
+               status: Optional[str] = None, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Yield stored orders in submission order, reading them in batches.
+
+        The rows come from a server-side cursor on a separate read-only
+        connection, so an export of any size holds only one batch in memory
+        and neither blocks nor is blocked by submissions being indexed.
+
+        Args:
+            since: Only orders submitted at or after this epoch time
+            until: Only orders submitted before this epoch time
+            form: Only orders of this form
+            status: Only orders with this outcome
+            batch_size: Rows fetched from SQLite at a time
+
+        Yields:
+            Dicts with the EXPORT_COLUMNS; "data" is the mapped submission as a dict
+        """
+        if not self.enabled or not os.path.exists(self.path):
+            return
+        conditions: List[str] = []
+        params: List[Any] = []
+        for clause, value in (("submitted_at >= ?", since), ("submitted_at < ?", until),
+                              ("form = ?", form), ("status = ?", status)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        sql = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM orders"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY submitted_at, id"
+
+        # StreamingResponse resumes the generator on whichever threadpool thread is free; only one
+        # thread uses the connection at a time, so SQLite's same-thread check is turned off
+        db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=10.0, check_same_thread=False)
+        try:
+            cursor = db.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    order = dict(zip(EXPORT_COLUMNS, row))
+                    order["submitted_at"] = _iso(order["submitted_at"])
+                    order["completed_at"] = _iso(order["completed_at"])
+                    order["data"] = orjson.loads(order["data"])
+                    yield order
+        finally:
+            db.close()
+
+    def recent_medications(self, limit: int) -> List[Tuple[Optional[str], Optional[str]]]:
+        """(medication field, phone) of the most recent successfully faxed refill orders."""
+        if self._db is None:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT medications, phone FROM orders WHERE form = 'refill' AND status = 'success'"
+                " ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [(medications, phone) for medications, phone in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of stored orders per form and status."""
+        if self._db is None:
+            return {"enabled": False}
+        with self._lock:
+            rows = self._db.execute("SELECT form, status, COUNT(*) FROM orders GROUP BY form, status").fetchall()
+        counts: Dict[str, Dict[str, int]] = {}
+        for form, status, count in rows:
+            counts.setdefault(form, {})[status] = count
+        return {"enabled": True, "orders": counts}
+
+
+order_index = OrderIndex()
@@ -5,7 +5,63 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 import os
+import logging
+from functools import lru_cache
 from datetime import datetime
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _text_styles():
+    """
+    Build the paragraph styles shared by all generated PDFs.
+
+    Creating the sample stylesheet is a noticeable part of the first render,
+    so it is done once per process; the styles are never modified afterwards.
+
+    Returns:
+        Tuple of (alert, label, value, instructions) styles
+    """
+    styles = getSampleStyleSheet()
+    
+    alert_style = ParagraphStyle(
+        'AlertStyle',
+        parent=styles['Normal'],
+        fontSize=14,
+        alignment=TA_CENTER,
+        spaceAfter=20,
+        fontName='Helvetica-Bold'
+    )
+    
+    label_style = ParagraphStyle(
+        'LabelStyle',
+        parent=styles['Normal'],
+        fontSize=11,
+        spaceAfter=6,
+        spaceBefore=12,
+        fontName='Helvetica-Bold'
+    )
+    
+    value_style = ParagraphStyle(
+        'ValueStyle',
+        parent=styles['Normal'],
+        fontSize=11,
+        leftIndent=20,
+        spaceAfter=6,
+        fontName='Helvetica'
+    )
+    
+    instructions_style = ParagraphStyle(
+        'InstructionsStyle',
+        parent=styles['Normal'],
+        fontSize=11,
+        spaceBefore=20,
+        fontName='Helvetica'
+    )
+    return alert_style, label_style, value_style, instructions_style
+
 
 def generate_pdf(form_data, output_filename="output.pdf"):
     """
@@ -19,43 +75,7 @@ def generate_pdf(form_data, output_filename="output.pdf"):
             topMargin=0.75*inch, bottomMargin=0.75*inch
         )
         
-        styles = getSampleStyleSheet()
-        
-        # Create custom styles for clean text format
-        alert_style = ParagraphStyle(
-            'AlertStyle',
-            parent=styles['Normal'],
-            fontSize=14,
-            alignment=TA_CENTER,
-            spaceAfter=20,
-            fontName='Helvetica-Bold'
-        )
-        
-        label_style = ParagraphStyle(
-            'LabelStyle',
-            parent=styles['Normal'],
-            fontSize=11,
-            spaceAfter=6,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        )
-        
-        value_style = ParagraphStyle(
-            'ValueStyle',
-            parent=styles['Normal'],
-            fontSize=11,
-            leftIndent=20,
-            spaceAfter=6,
-            fontName='Helvetica'
-        )
-        
-        instructions_style = ParagraphStyle(
-            'InstructionsStyle',
-            parent=styles['Normal'],
-            fontSize=11,
-            spaceBefore=20,
-            fontName='Helvetica'
-        )
+        alert_style, label_style, value_style, instructions_style = _text_styles()
         
         elements = []
 
@@ -130,12 +150,13 @@ def generate_pdf(form_data, output_filename="output.pdf"):
         elements.append(instructions_para)
 
         # Build the PDF
-        doc.build(elements)
-        print(f"✅ Clean prescription PDF generated: {os.path.abspath(output_filename)}")
+        with span("render.build", pdf="refill", elements=len(elements)):
+            doc.build(elements)
+        logger.debug("Prescription PDF generated: %s", os.path.abspath(output_filename))
         return output_filename
 
     except Exception as e:
-        print(f"❌ PDF generation failed: {e}")
+        logger.exception("PDF generation failed: %s", e)
         raise
 
 
@@ -158,43 +179,7 @@ def generate_signup_pdf(form_data, output_filename="signup.pdf"):
             topMargin=0.75*inch, bottomMargin=0.75*inch
         )
         
-        styles = getSampleStyleSheet()
-        
-        # Create custom styles for clean text format (same as prescription)
-        alert_style = ParagraphStyle(
-            'AlertStyle',
-            parent=styles['Normal'],
-            fontSize=14,
-            alignment=TA_CENTER,
-            spaceAfter=20,
-            fontName='Helvetica-Bold'
-        )
-        
-        label_style = ParagraphStyle(
-            'LabelStyle',
-            parent=styles['Normal'],
-            fontSize=11,
-            spaceAfter=6,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        )
-        
-        value_style = ParagraphStyle(
-            'ValueStyle',
-            parent=styles['Normal'],
-            fontSize=11,
-            leftIndent=20,
-            spaceAfter=6,
-            fontName='Helvetica'
-        )
-        
-        instructions_style = ParagraphStyle(
-            'InstructionsStyle',
-            parent=styles['Normal'],
-            fontSize=11,
-            spaceBefore=20,
-            fontName='Helvetica'
-        )
+        alert_style, label_style, value_style, instructions_style = _text_styles()
         
         elements = []
 
@@ -283,9 +268,10 @@ def generate_signup_pdf(form_data, output_filename="signup.pdf"):
         elements.append(instructions_para)
 
         # Build PDF
-        doc.build(elements)
-        print(f"✅ Clean registration PDF generated: {os.path.abspath(output_filename)}")
+        with span("render.build", pdf="signup", elements=len(elements)):
+            doc.build(elements)
+        logger.debug("Registration PDF generated: %s", os.path.abspath(output_filename))
         return output_filename
     except Exception as e:
-        print(f"❌ Registration PDF generation failed: {e}")
+        logger.exception("Registration PDF generation failed: %s", e)
         raise
@@ -0,0 +1,187 @@
+"""
+HTTP response for serving stored PDFs to Sinch and file hosts.
+
+Stored PDFs never change once published, so responses carry a strong ETag
+and an immutable Cache-Control header, answer conditional requests with 304,
+and honour single byte-range requests with 206. Bytes are handed to the
+server with the ASGI zero-copy send extension when it is available, or read
+with positioned reads straight from the file descriptor otherwise.
+"""
+import os
+import re
+from email.utils import formatdate
+from typing import Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from config import PDF_TTL_SECONDS
+
+# Largest chunk read into memory at once when zero-copy send is unavailable
+READ_CHUNK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Same body as the /pdf route's HTTPException for an unknown ID
+_NOT_FOUND = JSONResponse({"detail": "PDF not found"}, status_code=404)
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single byte range.
+
+    Args:
+        header: Value of the Range header
+        size: Size of the file in bytes
+
+    Returns:
+        Inclusive (start, end) offsets, or None if the header should be ignored
+
+    Raises:
+        ValueError: If the range is well-formed but cannot be satisfied
+    """
+    # Multiple ranges are legal to ignore; PDF fetchers only ask for one
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Check an If-None-Match / If-Range header against our ETag (weak comparison)."""
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag == etag or tag == f"W/{etag}" for tag in candidates)
+
+
+class PDFResponse(Response):
+    """Serve a PDF file with ETag, conditional, Range and HEAD support."""
+
+    media_type = "application/pdf"
+
+    def __init__(self, request: Request, pdf_path: str, filename: str, max_age: int = int(PDF_TTL_SECONDS)):
+        """
+        Prepare the response for a stored PDF.
+
+        Args:
+            request: Incoming request (method and conditional headers are read from it)
+            pdf_path: Path to the stored PDF
+            filename: Filename suggested to the client
+            max_age: Seconds the client may cache the document
+
+        Raises:
+            FileNotFoundError: If the PDF was removed before it could be looked at
+        """
+        self.pdf_path = pdf_path
+        self.send_body = request.method != "HEAD"
+        self.background = None
+
+        # Only stat here: the file is opened in __call__, so a response that is never sent leaks nothing
+        stat = os.stat(pdf_path)
+        self._identity = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        self.size = stat.st_size
+        etag = f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+        headers = {
+            "etag": etag,
+            "last-modified": formatdate(stat.st_mtime, usegmt=True),
+            # Private: these are patient documents and must not sit in shared caches
+            "cache-control": f"private, max-age={max_age}, immutable",
+            "accept-ranges": "bytes",
+            "content-disposition": f'attachment; filename="{filename}"',
+        }
+
+        self.offset, self.count = 0, self.size
+        status_code = 200
+        if_none_match = request.headers.get("if-none-match")
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+
+        if if_none_match is not None and _etag_matches(if_none_match, etag):
+            status_code = 304
+            self.count = 0
+        elif range_header is not None and (if_range is None or if_range.strip() == etag):
+            try:
+                byte_range = _parse_range(range_header, self.size)
+            except ValueError:
+                status_code = 416
+                self.count = 0
+                headers["content-range"] = f"bytes */{self.size}"
+            else:
+                if byte_range is not None:
+                    start, end = byte_range
+                    status_code = 206
+                    self.offset, self.count = start, end - start + 1
+                    headers["content-range"] = f"bytes {start}-{end}/{self.size}"
+
+        if status_code == 304:
+            # A 304 describes the stored representation but carries no body headers
+            self.media_type = None
+        else:
+            headers["content-length"] = str(self.count)
+            if status_code == 416:
+                self.media_type = None
+        self.status_code = status_code
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Keep the descriptor open while sending so a concurrent reap cannot pull the file away mid-response
+        try:
+            fd = os.open(self.pdf_path, os.O_RDONLY)
+        except FileNotFoundError:
+            await _NOT_FOUND(scope, receive, send)
+            return
+        try:
+            stat = os.fstat(fd)
+            if (stat.st_ino, stat.st_size, stat.st_mtime_ns) != self._identity:
+                # Reaped (or replaced) between the lookup and now; the headers no longer describe it
+                await _NOT_FOUND(scope, receive, send)
+                return
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            })
+            if not self.send_body or self.count == 0:
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": fd,
+                    "offset": self.offset,
+                    "count": self.count,
+                })
+                return
+
+            # Stored PDFs are small and were just written, so positioned reads hit the
+            # page cache; a single pread per chunk avoids file-object buffering copies
+            offset, remaining = self.offset, self.count
+            while remaining > 0:
+                chunk = os.pread(fd, min(remaining, READ_CHUNK_SIZE), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank underneath us; close the body so the client sees a short read
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            os.close(fd)
@@ -0,0 +1,511 @@
+"""
+TTL stores for generated PDFs that are waiting to be fetched by Sinch.
+
+Two backends share one interface:
+
+- ``PDFStore`` keeps its index in process memory (single worker only).
+- ``SharedPDFStore`` keeps its index in SQLite next to a spool directory, so
+  every uvicorn worker on the node can serve any PDF ID.
+
+Both use one reaper task per process instead of a sleeping thread per request.
+"""
+import abc
+import asyncio
+import heapq
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import PDF_TTL_SECONDS, PDF_STORE_MAX_BYTES, PDF_STORE_BACKEND, PDF_SPOOL_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    """A stored PDF and its bookkeeping."""
+
+    __slots__ = ("path", "size", "expires_at")
+
+    def __init__(self, path: str, size: int, expires_at: float):
+        self.path = path
+        self.size = size
+        self.expires_at = expires_at
+
+
+class _ReapingStore(abc.ABC):
+    """Staging and reaper task plumbing shared by the PDF store backends."""
+
+    # Clock used for expiry timestamps; overridden by backends shared across processes
+    _clock = staticmethod(time.monotonic)
+
+    def __init__(self, ttl_seconds: float, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._reaper_task: Optional[asyncio.Task] = None
+
+    @abc.abstractmethod
+    def staging_path(self, pdf_id: str) -> str:
+        """Return a fresh path to render a PDF into before it is stored."""
+
+    @abc.abstractmethod
+    def reap(self, now: Optional[float] = None) -> int:
+        """Remove every expired PDF and return how many were removed."""
+
+    @abc.abstractmethod
+    def next_expiry(self) -> Optional[float]:
+        """Return the time of the earliest pending expiry, on the store's clock, if any."""
+
+    @contextmanager
+    def staged(self, pdf_id: str) -> Iterator[str]:
+        """
+        Yield a staging path to render a PDF into, deleting the staging file if rendering fails.
+
+        Args:
+            pdf_id: ID the PDF will be stored under
+        """
+        path = self.staging_path(pdf_id)
+        try:
+            yield path
+        except BaseException:
+            self._remove_files([path])
+            raise
+
+    async def run_reaper(self) -> None:
+        """
+        Reap expired PDFs forever, sleeping until the next expiry is due.
+
+        A failed pass (a locked index, an unreadable spool file) is logged and
+        retried after the idle interval, so one error does not stop reaping.
+        """
+        idle_sleep = min(self.ttl_seconds, 30.0)
+        while True:
+            try:
+                self.reap()
+                next_expiry = self.next_expiry()
+            except Exception:
+                logger.exception("PDF reaper pass failed; retrying in %.0fs", idle_sleep)
+                next_expiry = None
+            if next_expiry is None:
+                delay = idle_sleep
+            else:
+                delay = min(max(next_expiry - self._clock(), 0.0), idle_sleep)
+            await asyncio.sleep(delay)
+
+    def start_reaper(self) -> None:
+        """Start the reaper task on the running event loop."""
+        if self._reaper_task is None or self._reaper_task.done():
+            self._reaper_task = asyncio.get_running_loop().create_task(self.run_reaper())
+
+    async def stop_reaper(self) -> None:
+        """Cancel the reaper task and wait for it to finish."""
+        task, self._reaper_task = self._reaper_task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    @staticmethod
+    def _remove_files(paths: List[str]) -> None:
+        """Delete files outside of any lock, ignoring ones that are already gone."""
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Could not delete temporary file %s: %s", path, e)
+
+
+class PDFStore(_ReapingStore):
+    """Thread-safe in-process TTL store for temporary PDF files with an LRU byte budget."""
+
+    def __init__(self, ttl_seconds: float = PDF_TTL_SECONDS, max_bytes: int = PDF_STORE_MAX_BYTES):
+        """
+        Initialize the store.
+
+        Args:
+            ttl_seconds: How long a PDF stays available after it is stored
+            max_bytes: Total size budget; least recently used PDFs are evicted beyond it
+        """
+        super().__init__(ttl_seconds, max_bytes)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._total_bytes = 0
+
+    def staging_path(self, pdf_id: str) -> str:
+        """
+        Return a fresh path to render a PDF into before it is stored.
+
+        Args:
+            pdf_id: ID the PDF will be stored under
+        """
+        fd, path = tempfile.mkstemp(prefix=f"pdf_{pdf_id}_", suffix=".pdf")
+        os.close(fd)
+        return path
+
+    def put(self, pdf_id: str, pdf_path: str, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Register a PDF file under an ID.
+
+        Args:
+            pdf_id: Public ID used in the /pdf/{pdf_id} URL
+            pdf_path: Path to the rendered PDF file
+            ttl_seconds: Lifetime of this PDF (defaults to the store's TTL)
+        """
+        size = os.path.getsize(pdf_path)
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            previous = self._entries.pop(pdf_id, None)
+            if previous is not None:
+                self._total_bytes -= previous.size
+            self._entries[pdf_id] = _Entry(pdf_path, size, expires_at)
+            self._total_bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, pdf_id))
+            evicted = self._evict_over_budget()
+        if previous is not None and previous.path != pdf_path:
+            evicted.append(previous.path)
+        self._remove_files(evicted)
+
+    def get(self, pdf_id: str) -> Optional[str]:
+        """
+        Look up the path of a stored PDF.
+
+        Args:
+            pdf_id: ID of the PDF
+
+        Returns:
+            Path to the PDF file, or None if unknown or expired
+        """
+        with self._lock:
+            entry = self._entries.get(pdf_id)
+            if entry is None or entry.expires_at <= time.monotonic():
+                return None
+            self._entries.move_to_end(pdf_id)
+            return entry.path
+
+    def discard(self, pdf_id: str) -> None:
+        """Remove a PDF from the store and delete its file."""
+        with self._lock:
+            entry = self._entries.pop(pdf_id, None)
+            if entry is not None:
+                self._total_bytes -= entry.size
+        if entry is not None:
+            self._remove_files([entry.path])
+
+    def reap(self, now: Optional[float] = None) -> int:
+        """
+        Remove every expired PDF.
+
+        Args:
+            now: Monotonic timestamp to compare against (defaults to the current time)
+
+        Returns:
+            Number of PDFs removed
+        """
+        now = time.monotonic() if now is None else now
+        expired = []
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                expires_at, pdf_id = heapq.heappop(self._expiry_heap)
+                entry = self._entries.get(pdf_id)
+                # Skip stale heap items left behind by re-puts or evictions
+                if entry is None or entry.expires_at != expires_at:
+                    continue
+                del self._entries[pdf_id]
+                self._total_bytes -= entry.size
+                expired.append(entry.path)
+        self._remove_files(expired)
+        return len(expired)
+
+    def next_expiry(self) -> Optional[float]:
+        """Return the monotonic time of the earliest pending expiry, if any."""
+        with self._lock:
+            return self._expiry_heap[0][0] if self._expiry_heap else None
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of stored PDFs and their total size in bytes."""
+        with self._lock:
+            return {"count": len(self._entries), "bytes": self._total_bytes}
+
+    def persist(self, spool: "SharedPDFStore") -> int:
+        """
+        Hand every unexpired PDF over to a spool store, keeping its remaining lifetime.
+
+        Used at shutdown so that PDFs Sinch has not fetched yet survive a restart.
+
+        Returns:
+            Number of PDFs handed over
+        """
+        now = time.monotonic()
+        with self._lock:
+            entries = [(pdf_id, entry) for pdf_id, entry in self._entries.items() if entry.expires_at > now]
+            self._entries.clear()
+            self._expiry_heap.clear()
+            self._total_bytes = 0
+        for pdf_id, entry in entries:
+            spool.put(pdf_id, entry.path, ttl_seconds=entry.expires_at - now)
+        return len(entries)
+
+    def restore(self, spool: "SharedPDFStore") -> int:
+        """
+        Take over the PDFs a previous process persisted into a spool store.
+
+        Returns:
+            Number of PDFs restored
+        """
+        restored = spool.take_all()
+        for pdf_id, path, remaining in restored:
+            self.put(pdf_id, path, ttl_seconds=remaining)
+        return len(restored)
+
+    def _evict_over_budget(self) -> List[str]:
+        """Evict least recently used PDFs until the byte budget is met. Caller holds the lock."""
+        evicted = []
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.size
+            evicted.append(entry.path)
+        return evicted
+
+
+class SharedPDFStore(_ReapingStore):
+    """
+    TTL store shared by all worker processes on a node.
+
+    PDF bytes live in a spool directory and the ID index lives in SQLite (WAL
+    mode). A PDF is published atomically: it is rendered to a staging file,
+    renamed to its final name, and only then inserted into the index, so other
+    workers never see a half-written document.
+    """
+
+    # Wall-clock time, because expiry timestamps are compared across processes
+    _clock = staticmethod(time.time)
+
+    def __init__(self, spool_dir: str = PDF_SPOOL_DIR, ttl_seconds: float = PDF_TTL_SECONDS,
+                 max_bytes: int = PDF_STORE_MAX_BYTES):
+        """
+        Initialize the store.
+
+        Args:
+            spool_dir: Directory holding the PDF files and the SQLite index
+            ttl_seconds: How long a PDF stays available after it is stored
+            max_bytes: Total size budget across all workers; least recently used PDFs are evicted beyond it
+        """
+        super().__init__(ttl_seconds, max_bytes)
+        self.spool_dir = spool_dir
+        os.makedirs(spool_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(spool_dir, "index.sqlite3"),
+            timeout=10.0,
+            isolation_level=None,  # Transactions are managed explicitly
+            check_same_thread=False,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pdfs ("
+            " pdf_id TEXT PRIMARY KEY,"
+            " path TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pdfs_expires_at ON pdfs (expires_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS pdfs_last_access ON pdfs (last_access)")
+
+    def staging_path(self, pdf_id: str) -> str:
+        """
+        Return a fresh path inside the spool directory to render a PDF into.
+
+        Staging files start with a dot so they are never mistaken for published PDFs.
+
+        Args:
+            pdf_id: ID the PDF will be stored under
+        """
+        fd, path = tempfile.mkstemp(prefix=f".{pdf_id}_", suffix=".tmp", dir=self.spool_dir)
+        os.close(fd)
+        return path
+
+    def put(self, pdf_id: str, pdf_path: str, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Publish a PDF file under an ID for every worker.
+
+        Args:
+            pdf_id: Public ID used in the /pdf/{pdf_id} URL
+            pdf_path: Path to the rendered PDF file (ideally from staging_path)
+            ttl_seconds: Lifetime of this PDF (defaults to the store's TTL)
+        """
+        final_path = os.path.join(self.spool_dir, f"{pdf_id}.pdf")
+        # os.replace is atomic within a filesystem; fall back to a copy otherwise
+        try:
+            os.replace(pdf_path, final_path)
+        except OSError:
+            shutil.copyfile(pdf_path, final_path)
+            self._remove_files([pdf_path])
+        size = os.path.getsize(final_path)
+        now = self._clock()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO pdfs (pdf_id, path, size, expires_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (pdf_id, final_path, size, now + (self.ttl_seconds if ttl_seconds is None else ttl_seconds), now),
+                )
+                evicted = self._evict_over_budget(keep=pdf_id)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self._remove_files(evicted)
+
+    def get(self, pdf_id: str) -> Optional[str]:
+        """
+        Look up the path of a stored PDF, whichever worker published it.
+
+        Args:
+            pdf_id: ID of the PDF
+
+        Returns:
+            Path to the PDF file, or None if unknown or expired
+        """
+        now = self._clock()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path FROM pdfs WHERE pdf_id = ? AND expires_at > ?", (pdf_id, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE pdfs SET last_access = ? WHERE pdf_id = ?", (now, pdf_id))
+        return row[0]
+
+    def discard(self, pdf_id: str) -> None:
+        """Remove a PDF from the store and delete its file."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT path FROM pdfs WHERE pdf_id = ?", (pdf_id,)).fetchone()
+                self._db.execute("DELETE FROM pdfs WHERE pdf_id = ?", (pdf_id,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is not None:
+            self._remove_files([row[0]])
+
+    def reap(self, now: Optional[float] = None) -> int:
+        """
+        Remove every expired PDF, plus staging files abandoned by crashed workers.
+
+        Args:
+            now: Unix timestamp to compare against (defaults to the current time)
+
+        Returns:
+            Number of PDFs removed
+        """
+        now = self._clock() if now is None else now
+        with self._lock:
+            # IMMEDIATE serializes reapers in different workers, so each row is removed once
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                expired = [row[0] for row in self._db.execute(
+                    "SELECT path FROM pdfs WHERE expires_at <= ?", (now,)
+                )]
+                self._db.execute("DELETE FROM pdfs WHERE expires_at <= ?", (now,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self._remove_files(expired)
+        self._remove_files(self._abandoned_staging_files(now))
+        return len(expired)
+
+    def take_all(self) -> List[Tuple[str, str, float]]:
+        """
+        Remove every unexpired PDF from the index without deleting its file.
+
+        Returns:
+            List of (pdf_id, path, remaining seconds) now owned by the caller
+        """
+        now = self._clock()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT pdf_id, path, expires_at FROM pdfs WHERE expires_at > ?", (now,)
+                ).fetchall()
+                self._db.execute("DELETE FROM pdfs WHERE expires_at > ?", (now,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return [(pdf_id, path, expires_at - now) for pdf_id, path, expires_at in rows]
+
+    def next_expiry(self) -> Optional[float]:
+        """Return the Unix time of the earliest pending expiry, if any."""
+        with self._lock:
+            return self._db.execute("SELECT MIN(expires_at) FROM pdfs").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of stored PDFs and their total size in bytes, across all workers."""
+        with self._lock:
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pdfs").fetchone()
+        return {"count": count, "bytes": total}
+
+    def _evict_over_budget(self, keep: str) -> List[str]:
+        """Evict least recently used PDFs until the byte budget is met. Caller holds a write transaction."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pdfs").fetchone()[0]
+        if total <= self.max_bytes:
+            return []
+        evicted = []
+        rows = self._db.execute(
+            "SELECT pdf_id, path, size FROM pdfs WHERE pdf_id != ? ORDER BY last_access", (keep,)
+        ).fetchall()
+        for pdf_id, path, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM pdfs WHERE pdf_id = ?", (pdf_id,))
+            total -= size
+            evicted.append(path)
+        return evicted
+
+    def _abandoned_staging_files(self, now: float) -> List[str]:
+        """Find staging files older than the TTL; their worker died before publishing them."""
+        abandoned = []
+        with os.scandir(self.spool_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") and entry.name.endswith(".tmp"):
+                    try:
+                        if entry.stat().st_mtime + self.ttl_seconds <= now:
+                            abandoned.append(entry.path)
+                    except FileNotFoundError:
+                        continue
+        return abandoned
+
+
+def create_pdf_store():
+    """
+    Create the PDF store selected by PDF_STORE_BACKEND.
+
+    Returns:
+        SharedPDFStore for "shared" (the default, safe with several workers),
+        or the in-process PDFStore for "memory"
+    """
+    if PDF_STORE_BACKEND == "memory":
+        return PDFStore()
+    if PDF_STORE_BACKEND != "shared":
+        raise ValueError(f"Unknown PDF_STORE_BACKEND: {PDF_STORE_BACKEND!r} (expected 'shared' or 'memory')")
+    return SharedPDFStore()
@@ -0,0 +1,213 @@
+"""
+Opt-in per-request CPU profiling.
+
+A request to one of the submission endpoints is run under cProfile when it
+carries an X-Profile-Token header matching PROFILE_TOKEN, or when it is
+picked by PROFILE_SAMPLE_RATE. The profile is saved as a pstats file plus a
+collapsed-stack file (for flamegraph.pl / speedscope) in PROFILE_DIR, old
+profiles are pruned, and the profile ID is returned in an X-Profile-Id
+response header.
+
+The middleware is the innermost one, so a profile covers routing, body
+ingestion and the handler; time spent waiting for admission and in the
+outer middlewares is not included.
+
+cProfile hooks the event-loop thread, so while a profiled request awaits,
+other requests' coroutine steps on the same loop are included too. Only one
+request per worker is profiled at a time.
+"""
+import asyncio
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import (
+    PROFILE_DIR,
+    PROFILE_TOKEN,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_MAX_FILES,
+    PROFILE_RETENTION_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+PROFILED_PATHS = frozenset({"/send-fax", "/send-signup-fax", "/send_signup_fax", "/generate-pdf"})
+
+# Longest caller chain followed when collapsing a stack
+MAX_STACK_DEPTH = 64
+
+FuncKey = Tuple[str, int, str]
+
+
+def _frame_label(func: FuncKey) -> str:
+    filename, lineno, name = func
+    if filename == "~":
+        # Built-ins are reported as ('~', 0, '<built-in method ...>')
+        return name
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+def collapse_stats(stats: pstats.Stats) -> List[str]:
+    """
+    Convert profile statistics into collapsed-stack lines.
+
+    cProfile only records caller -> callee edges, so each function's own time
+    is attributed to the chain built by repeatedly following its most
+    expensive caller. This is the usual approximation for deterministic
+    profiles and is good enough to see where time goes.
+
+    Args:
+        stats: Loaded profile statistics
+
+    Returns:
+        Lines of "frame;frame;frame <microseconds>"
+    """
+    raw: Dict[FuncKey, tuple] = stats.stats  # type: ignore[attr-defined]
+    lines: Dict[str, int] = {}
+    for func, (_, _, own_time, _, callers) in raw.items():
+        weight = int(own_time * 1_000_000)
+        if weight <= 0:
+            continue
+        stack = [_frame_label(func)]
+        seen = {func}
+        current = callers
+        while current and len(stack) < MAX_STACK_DEPTH:
+            # callers maps caller -> (cc, nc, tt, ct); follow the heaviest cumulative edge
+            caller = max(current.items(), key=lambda item: item[1][3])[0]
+            if caller in seen:
+                break
+            seen.add(caller)
+            stack.append(_frame_label(caller))
+            current = raw.get(caller, (0, 0, 0, 0, {}))[4]
+        key = ";".join(reversed(stack))
+        lines[key] = lines.get(key, 0) + weight
+    return [f"{stack} {weight}" for stack, weight in sorted(lines.items())]
+
+
+class ProfileStore:
+    """Directory of saved profiles with count and age based retention."""
+
+    def __init__(self, directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES,
+                 retention_seconds: float = PROFILE_RETENTION_SECONDS):
+        self.directory = directory
+        self.max_files = max_files
+        self.retention_seconds = retention_seconds
+
+    def path(self, profile_id: str, kind: str) -> str:
+        """Path of a saved profile; kind is "prof" (pstats) or "collapsed"."""
+        return os.path.join(self.directory, f"{profile_id}.{kind}")
+
+    def save(self, profile_id: str, profiler: cProfile.Profile, request_path: str) -> None:
+        """Write pstats and collapsed-stack files, then prune old profiles."""
+        os.makedirs(self.directory, exist_ok=True)
+        profiler.dump_stats(self.path(profile_id, "prof"))
+        stats = pstats.Stats(profiler)
+        with open(self.path(profile_id, "collapsed"), "w") as f:
+            f.write(f"# {request_path}\n")
+            f.write("\n".join(collapse_stats(stats)))
+            f.write("\n")
+        self.prune()
+
+    def list(self) -> List[Dict[str, object]]:
+        """Saved profiles, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".prof"):
+                stat = entry.stat()
+                profiles.append({
+                    "profile_id": entry.name[:-len(".prof")],
+                    "created_at": stat.st_mtime,
+                    "size": stat.st_size,
+                })
+        profiles.sort(key=lambda p: p["created_at"], reverse=True)
+        return profiles
+
+    def prune(self) -> None:
+        """Remove profiles beyond max_files or older than the retention period."""
+        cutoff = time.time() - self.retention_seconds
+        for index, profile in enumerate(self.list()):
+            if index >= self.max_files or profile["created_at"] < cutoff:
+                for kind in ("prof", "collapsed"):
+                    try:
+                        os.remove(self.path(profile["profile_id"], kind))
+                    except FileNotFoundError:
+                        pass
+
+    def summary(self, profile_id: str, limit: int = 40) -> str:
+        """Human-readable top functions by cumulative time."""
+        out = io.StringIO()
+        stats = pstats.Stats(self.path(profile_id, "prof"), stream=out)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that runs selected requests under cProfile."""
+
+    def __init__(self, app: ASGIApp, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+        self._active = False
+
+    def _requested(self, scope: Scope) -> Optional[str]:
+        """Return why this request should be profiled ("token" or "sampled"), or None."""
+        if scope["type"] != "http" or scope["path"] not in PROFILED_PATHS:
+            return None
+        if PROFILE_TOKEN:
+            for name, value in scope["headers"]:
+                if name == b"x-profile-token":
+                    if hmac.compare_digest(value, PROFILE_TOKEN.encode("utf-8")):
+                        return "token"
+                    break
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        reason = self._requested(scope)
+        if reason is None or self._active:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["x-profile-id"] = profile_id
+            await send(message)
+
+        self._active = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.disable()
+            self._active = False
+            # Writing files is slow; keep it off the event loop
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(None, self._save, profile_id, profiler, scope["path"], reason)
+
+    def _save(self, profile_id: str, profiler: cProfile.Profile, path: str, reason: str) -> None:
+        try:
+            self.store.save(profile_id, profiler, path)
+            logger.info("Saved request profile", extra={"fields": {
+                "profile_id": profile_id, "path": path, "reason": reason,
+            }})
+        except Exception:
+            logger.exception("Could not save request profile %s", profile_id)
@@ -0,0 +1,272 @@
+"""
+Replay a JSONL trace of form submissions against the app and report how it coped.
+
+Each trace line is one request::
+
+    {"ts": "2026-10-12T14:03:11.250Z", "path": "/send-fax", "json": {"OR-Name": "Jane", ...}}
+    {"ts": 1760277791.9, "path": "/send-signup-fax", "form": {"Form-first-name": "Jane", ...}}
+
+``ts`` is an ISO 8601 time or epoch seconds (lines without one are sent
+right after the previous line), ``method`` defaults to POST, and the body is
+given as ``json``, ``form`` (urlencoded) or ``body`` (raw string, with
+``headers``). Requests are sent open-loop at the original inter-arrival
+times divided by ``--speed``, so a slow build falls behind the trace the way
+production would, instead of quietly slowing the load down.
+
+By default the app is run in process through httpx's ASGI transport, with a
+fake FaxSender and a throwaway STATE_DIR, so nothing is faxed and earlier
+runs do not turn the trace into duplicates. ``--target`` replays over HTTP
+against a running server instead; that server sends real faxes unless it is
+configured not to.
+
+Usage:
+    python replay.py monday_peak.jsonl                  # in process, original pace
+    python replay.py monday_peak.jsonl --speed 4        # four times faster
+    python replay.py monday_peak.jsonl --speed 0        # as fast as possible
+    python replay.py trace.jsonl --target http://localhost:8000 --json
+
+Requires httpx (``pip install httpx``), which the app itself does not need.
+"""
+import argparse
+import asyncio
+import collections
+import math
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from fakes import load_app
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    # datetime.fromisoformat() only accepts a trailing "Z" from Python 3.11 on
+    text = str(value)
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    return datetime.fromisoformat(text).timestamp()
+
+
+def read_trace(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Load a trace, giving every entry an ``offset`` in seconds from the first request.
+
+    Raises:
+        ValueError: If a line is not a JSON object or has a malformed timestamp
+    """
+    entries: List[Dict[str, Any]] = []
+    first: Optional[float] = None
+    previous = 0.0
+    with open(path, "rb") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = orjson.loads(line)
+                if not isinstance(entry, dict) or "path" not in entry:
+                    raise ValueError("expected a JSON object with a path")
+                ts = _timestamp(entry.get("ts"))
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_no}: {e}") from None
+            if ts is None:
+                offset = previous
+            else:
+                first = ts if first is None else first
+                offset = max(ts - first, previous)
+            entry["offset"] = previous = offset
+            entries.append(entry)
+            if limit and len(entries) >= limit:
+                break
+    return entries
+
+
+def _request_kwargs(entry: Dict[str, Any], admin_token: Optional[str]) -> Dict[str, Any]:
+    headers = dict(entry.get("headers") or {})
+    if admin_token:
+        headers.setdefault("X-Admin-Token", admin_token)
+    kwargs: Dict[str, Any] = {"headers": headers}
+    if "json" in entry:
+        kwargs["json"] = entry["json"]
+    elif "form" in entry:
+        kwargs["data"] = entry["form"]
+    elif "body" in entry:
+        kwargs["content"] = entry["body"]
+    return kwargs
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def _error_detail(response) -> str:
+    try:
+        detail = response.json().get("detail")
+    except Exception:
+        detail = None
+    return str(detail or response.reason_phrase)[:80]
+
+
+class Recorder:
+    """Collects the outcome of every replayed request."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.by_path: Dict[str, List[float]] = collections.defaultdict(list)
+        self.statuses: "collections.Counter[str]" = collections.Counter()
+        self.errors: "collections.Counter[str]" = collections.Counter()
+        self.schedule_lag: List[float] = []
+
+    def record(self, path: str, seconds: float, status: str, error: Optional[str] = None) -> None:
+        self.latencies.append(seconds)
+        self.by_path[path].append(seconds)
+        self.statuses[status] += 1
+        if error:
+            self.errors[error] += 1
+
+    def report(self, wall_seconds: float, trace_seconds: float) -> Dict[str, Any]:
+        def summary(values: List[float]) -> Dict[str, float]:
+            ordered = sorted(values)
+            stats = {f"p{pct}_ms": round(percentile(ordered, pct) * 1000.0, 1) for pct in PERCENTILES}
+            stats["max_ms"] = round(ordered[-1] * 1000.0, 1) if ordered else 0.0
+            return stats
+
+        completed = len(self.latencies)
+        failed = sum(n for status, n in self.statuses.items() if not status.startswith("2"))
+        return {
+            "requests": completed,
+            "failed": failed,
+            "wall_seconds": round(wall_seconds, 3),
+            "trace_seconds": round(trace_seconds, 3),
+            "throughput_rps": round(completed / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+            "latency": summary(self.latencies),
+            "latency_by_path": {path: summary(values) for path, values in sorted(self.by_path.items())},
+            "status_codes": dict(sorted(self.statuses.items())),
+            "errors": dict(self.errors.most_common()),
+            "max_schedule_lag_ms": round(max(self.schedule_lag, default=0.0) * 1000.0, 1),
+        }
+
+
+async def replay(entries: List[Dict[str, Any]], client, speed: float = 1.0,
+                 max_outstanding: int = 256, admin_token: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Send the trace through an httpx.AsyncClient and summarize the results.
+
+    Args:
+        entries: Trace entries from read_trace()
+        client: httpx.AsyncClient pointed at the app
+        speed: Divides the original inter-arrival times; 0 sends everything at once
+        max_outstanding: Requests in flight before the replay waits (and starts to lag the trace)
+        admin_token: Sent as X-Admin-Token for admin-only endpoints
+    """
+    recorder = Recorder()
+    outstanding = asyncio.Semaphore(max_outstanding)
+
+    async def send(entry: Dict[str, Any]) -> None:
+        path = entry["path"]
+        started = time.perf_counter()
+        try:
+            response = await client.request(entry.get("method", "POST"), path,
+                                            **_request_kwargs(entry, admin_token))
+            status = str(response.status_code)
+            error = None if response.is_success else f"{status} {_error_detail(response)}"
+            recorder.record(path, time.perf_counter() - started, status, error)
+        except Exception as e:
+            recorder.record(path, time.perf_counter() - started, "exception", type(e).__name__)
+        finally:
+            outstanding.release()
+
+    tasks = []
+    started = time.perf_counter()
+    for entry in entries:
+        due = started + (entry["offset"] / speed if speed > 0 else 0.0)
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await outstanding.acquire()
+        recorder.schedule_lag.append(max(time.perf_counter() - due, 0.0))
+        tasks.append(asyncio.create_task(send(entry)))
+    await asyncio.gather(*tasks)
+
+    trace_seconds = entries[-1]["offset"] if entries else 0.0
+    return recorder.report(time.perf_counter() - started, trace_seconds)
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency"]
+    print(f"Requests:    {report['requests']} ({report['failed']} failed)")
+    print(f"Duration:    {report['wall_seconds']}s (trace spans {report['trace_seconds']}s)")
+    print(f"Throughput:  {report['throughput_rps']} req/s")
+    print("Latency:     " + "  ".join(f"{name[:-3]}={value}ms" for name, value in latency.items()))
+    print(f"Max lag behind trace: {report['max_schedule_lag_ms']}ms")
+    print("\nBy path:")
+    for path, stats in report["latency_by_path"].items():
+        print(f"  {path:<24} p50={stats['p50_ms']}ms  p99={stats['p99_ms']}ms  max={stats['max_ms']}ms")
+    print("\nStatus codes:")
+    for status, count in report["status_codes"].items():
+        print(f"  {status:<10} {count}")
+    if report["errors"]:
+        print("\nErrors:")
+        for error, count in report["errors"].items():
+            print(f"  {count:>6}  {error}")
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    entries = read_trace(args.trace, args.limit)
+    timeout = httpx.Timeout(args.timeout)
+    if args.target:
+        client = httpx.AsyncClient(base_url=args.target, timeout=timeout)
+    else:
+        app = load_app(args.fax_latency_ms / 1000.0, quiet=not args.verbose)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://replay", timeout=timeout)
+    async with client:
+        return await replay(entries, client, speed=args.speed, max_outstanding=args.max_outstanding,
+                            admin_token=args.admin_token)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("trace", help="JSONL trace file")
+    parser.add_argument("--target", help="Base URL of a running server; default runs the app in process")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed factor (2 = twice as fast, 0 = no delays)")
+    parser.add_argument("--limit", type=int, help="Replay only the first N requests")
+    parser.add_argument("--max-outstanding", type=int, default=256, help="Requests in flight at most")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--fax-latency-ms", type=float, default=300.0,
+                        help="Simulated Sinch round trip when running in process")
+    parser.add_argument("--admin-token", default=os.getenv("ADMIN_TOKEN"), help="X-Admin-Token for admin endpoints")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Keep the in-process app's info logs")
+    args = parser.parse_args(argv)
+
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        print("replay.py needs httpx: pip install httpx", file=sys.stderr)
+        return 2
+
+    report = asyncio.run(_run(args))
+    if args.json:
+        sys.stdout.write(orjson.dumps(report, option=orjson.OPT_INDENT_2).decode() + "\n")
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Per-request context shared by logging and diagnostics.
+
+A pure ASGI middleware assigns every HTTP request an ID (taken from an
+incoming X-Request-ID header when present), stores it in a context variable
+for log records, and echoes it back in the response headers. It also gives
+each request a dict of pipeline stage timings filled in by ``stage()`` and a
+trace whose spans are reported in a Server-Timing response header.
+"""
+import contextvars
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import tracing
+from metrics import STAGE_SECONDS
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+stage_timings_var: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "stage_timings", default=None
+)
+
+# Accept caller-supplied IDs only if they are short and safe to echo into logs and headers
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+def get_request_id() -> Optional[str]:
+    """Return the ID of the request being handled, if any."""
+    return request_id_var.get()
+
+
+def new_request_id() -> str:
+    """Generate a new request ID."""
+    return uuid.uuid4().hex[:16]
+
+
+def get_stage_timings() -> Dict[str, float]:
+    """Return the stage timings (milliseconds) recorded so far for the current request."""
+    return stage_timings_var.get() or {}
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time one pipeline stage of the current request.
+
+    Repeated stages with the same name are summed. Every stage is also
+    recorded in the webflow_stage_duration_seconds histogram and as a span
+    in the request's trace.
+
+    Args:
+        name: Stage name, e.g. "parse", "render" or "fax_send"
+    """
+    start = time.perf_counter()
+    try:
+        with tracing.span(name):
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        timings = stage_timings_var.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed * 1000.0
+
+
+class RequestContextMiddleware:
+    """ASGI middleware that sets up the per-request context."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _VALID_REQUEST_ID.match(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or new_request_id()
+        token = request_id_var.set(request_id)
+        timings_token = stage_timings_var.set({})
+        trace_token = tracing.start_trace(request_id, f"{scope['method']} {scope['path']}",
+                                          method=scope["method"], path=scope["path"])
+        trace = tracing.current_trace.get()
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["x-request-id"] = request_id
+                # Spans finished by now; browser devtools show these for Webflow requests
+                headers["server-timing"] = trace.server_timing()
+                headers["timing-allow-origin"] = "*"
+                trace.root.attributes["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            tracing.end_trace(trace_token)
+            stage_timings_var.reset(timings_token)
+            request_id_var.reset(token)
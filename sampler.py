@@ -0,0 +1,152 @@
+"""
+Always-on sampling profiler for the whole worker process.
+
+A daemon thread wakes SAMPLER_HZ times a second, reads the current stack of
+every other thread with sys._current_frames(), and counts collapsed stacks
+in per-minute windows. The last SAMPLER_WINDOWS windows are kept, so an
+hour of real traffic can be inspected as flamegraph input on
+/admin/sampler. Each worker process samples itself.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from config import SAMPLER_HZ, SAMPLER_WINDOW_SECONDS, SAMPLER_WINDOWS
+
+# Deepest stack recorded; deeper frames are dropped from the root end
+MAX_STACK_DEPTH = 128
+
+# Leaf frames of threads that are blocked rather than running Python code
+IDLE_LEAVES = frozenset({
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("handlers.py", "dequeue"),
+})
+
+
+class StackSampler:
+    """Background thread that aggregates collapsed stacks of all threads."""
+
+    def __init__(self, hz: float = SAMPLER_HZ, window_seconds: float = SAMPLER_WINDOW_SECONDS,
+                 windows: int = SAMPLER_WINDOWS):
+        """
+        Args:
+            hz: Samples per second (0 disables the sampler)
+            window_seconds: Length of one aggregation window
+            windows: Number of windows kept
+        """
+        self.hz = hz
+        self.window_seconds = window_seconds
+        self.windows = windows
+        self._lock = threading.Lock()
+        self._windows: Dict[int, Counter] = {}
+        self._labels: Dict[object, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._samples = 0
+        self._sampling_seconds = 0.0
+        self._started_at: Optional[float] = None
+
+    def start(self) -> None:
+        """Start sampling in a daemon thread (no-op if disabled or already running)."""
+        if self.hz <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the sampling thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _run(self) -> None:
+        interval = 1.0 / self.hz
+        own_id = threading.get_ident()
+        while not self._stop.wait(interval):
+            started = time.perf_counter()
+            window = int(time.time() // self.window_seconds)
+            stacks: List[Tuple[str, bool]] = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                idle = (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES
+                labels = []
+                while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                    labels.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                labels.reverse()
+                stacks.append((";".join(labels), idle))
+            del frame
+
+            with self._lock:
+                counts = self._windows.get(window)
+                if counts is None:
+                    counts = self._windows[window] = Counter()
+                    for old in [w for w in self._windows if w <= window - self.windows]:
+                        del self._windows[old]
+                for stack, idle in stacks:
+                    counts[(stack, idle)] += 1
+                self._samples += 1
+                self._sampling_seconds += time.perf_counter() - started
+
+    def collapsed(self, minutes: Optional[float] = None, include_idle: bool = False) -> List[str]:
+        """
+        Return aggregated stacks as collapsed-stack lines ("frame;frame count").
+
+        Args:
+            minutes: Only include the most recent windows covering this many minutes
+            include_idle: Include threads blocked in waits, selects and queue gets
+        """
+        now_window = int(time.time() // self.window_seconds)
+        first_window = None
+        if minutes is not None:
+            first_window = now_window - max(int(minutes * 60 // self.window_seconds), 1) + 1
+        totals: Counter = Counter()
+        with self._lock:
+            for window, counts in self._windows.items():
+                if first_window is not None and window < first_window:
+                    continue
+                for (stack, idle), count in counts.items():
+                    if include_idle or not idle:
+                        totals[stack] += count
+        return [f"{stack} {count}" for stack, count in totals.most_common()]
+
+    def stats(self) -> Dict[str, object]:
+        """Sampler settings and its own overhead."""
+        with self._lock:
+            samples = self._samples
+            sampling_seconds = self._sampling_seconds
+            windows = len(self._windows)
+        running_for = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "pid": os.getpid(),
+            "running": self._thread is not None and self._thread.is_alive(),
+            "hz": self.hz,
+            "window_seconds": self.window_seconds,
+            "windows_kept": windows,
+            "samples": samples,
+            "avg_sample_ms": round(sampling_seconds / samples * 1000.0, 4) if samples else None,
+            # Fraction of one core spent sampling
+            "overhead_ratio": round(sampling_seconds / running_for, 6) if running_for else None,
+        }
+
+
+stack_sampler = StackSampler()
@@ -0,0 +1,214 @@
+"""
+Tests for per-endpoint admission control: slots, the FIFO wait queue and Retry-After.
+"""
+import asyncio
+import time
+from typing import Dict, List
+
+import pytest
+
+from admission import (RETRY_AFTER_MAX_SECONDS, AdmissionLimiter, AdmissionMiddleware, Overloaded)
+
+
+def test_requests_beyond_the_slots_queue_in_order():
+    async def scenario():
+        limiter = AdmissionLimiter(max_in_flight=1, max_queue=2, queue_timeout=5)
+        order: List[str] = []
+        await limiter.acquire()
+
+        async def queued(name: str) -> None:
+            await limiter.acquire()
+            order.append(name)
+
+        first = asyncio.ensure_future(queued("first"))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(queued("second"))
+        await asyncio.sleep(0)
+        assert (limiter.in_flight, limiter.queued) == (1, 2)
+
+        limiter.release()
+        await first
+        assert order == ["first"] and limiter.in_flight == 1
+        limiter.release()
+        await second
+        assert order == ["first", "second"]
+        limiter.release()
+        assert (limiter.in_flight, limiter.queued) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_rejected_at_once():
+    async def scenario():
+        limiter = AdmissionLimiter(max_in_flight=1, max_queue=0, queue_timeout=5)
+        await limiter.acquire()
+        with pytest.raises(Overloaded) as e:
+            await limiter.acquire()
+        assert e.value.reason == "queue_full"
+
+    asyncio.run(scenario())
+
+
+def test_wait_times_out_and_leaves_the_queue():
+    async def scenario():
+        limiter = AdmissionLimiter(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+        await limiter.acquire()
+        with pytest.raises(Overloaded) as e:
+            await limiter.acquire()
+        assert e.value.reason == "queue_timeout"
+        assert (limiter.in_flight, limiter.queued) == (1, 0)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_take_a_slot():
+    async def scenario():
+        limiter = AdmissionLimiter(max_in_flight=1, max_queue=1, queue_timeout=5)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        assert (limiter.in_flight, limiter.queued) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_follows_the_drain_rate():
+    limiter = AdmissionLimiter(max_in_flight=2, max_queue=0)
+    # Nothing has completed yet: no estimate, so the longest wait
+    assert limiter.retry_after() == RETRY_AFTER_MAX_SECONDS
+
+    now = time.monotonic()
+    limiter._completions.extend([now] * 15)  # 0.5 requests per second over the window
+    limiter.in_flight = 2
+    assert limiter.retry_after() == 6  # (2 in flight + 0 queued + 1) / 0.5
+
+    limiter._completions.extend([now] * 3000)
+    assert limiter.retry_after() == 1
+
+
+def _asgi_call(app, path: str):
+    """Prepare an empty POST to an ASGI app; returns (status and headers once sent, coroutine to await)."""
+    result: Dict = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["headers"] = {k.decode(): v.decode() for k, v in message["headers"]}
+
+    scope = {"type": "http", "method": "POST", "path": path, "headers": [], "query_string": b""}
+    return result, app(scope, receive, send)
+
+
+def test_middleware_answers_503_with_retry_after_when_overloaded():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        limiter = AdmissionLimiter(max_in_flight=1, max_queue=0)
+        app = AdmissionMiddleware(slow_app, {"/send-fax": limiter})
+
+        busy, call = _asgi_call(app, "/send-fax")
+        task = asyncio.ensure_future(call)
+        await asyncio.sleep(0)
+
+        rejected, call = _asgi_call(app, "/send-fax")
+        await call
+        assert rejected["status"] == 503
+        assert rejected["headers"]["retry-after"] == str(RETRY_AFTER_MAX_SECONDS)
+
+        # Other paths are not limited
+        other, call = _asgi_call(app, "/delivery-slots")
+        release.set()
+        await call
+        await task
+        assert busy["status"] == other["status"] == 200
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_limiter_engages_on_the_app_while_other_paths_stay_responsive(app, monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    import admission
+    import main
+    from fakes import FakeFaxSender
+    monkeypatch.setattr(main, "fax_sender", FakeFaxSender(latency=0.5))
+    limiter = AdmissionLimiter(max_in_flight=2, max_queue=1, queue_timeout=5)
+    monkeypatch.setitem(admission.limiters, "/send-fax", limiter)
+
+    def order(n: int) -> Dict:
+        return {"OR-Name": f"Admit{n}", "OR-Last-name": "Patient", "OR-Phone-number": f"705-555-05{n:02d}",
+                "OR-Medication": "Aspirin", "delivery_option": "Pickup"}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            sends = [asyncio.ensure_future(client.post("/send-fax", json=order(n))) for n in range(5)]
+            # Let the requests reach the limiter and the first two reach Sinch
+            for _ in range(50):
+                await asyncio.sleep(0.01)
+                if limiter.in_flight == 2 and limiter.queued == 1:
+                    break
+            assert (limiter.in_flight, limiter.queued) == (2, 1)
+
+            # The event loop is free while the faxes are being sent
+            started = time.perf_counter()
+            health = await client.get("/")
+            assert health.status_code == 200
+            assert time.perf_counter() - started < 0.25
+
+            responses = await asyncio.gather(*sends)
+            return sorted(response.status_code for response in responses), responses
+
+    statuses, responses = asyncio.run(scenario())
+    assert statuses == [200, 200, 200, 503, 503]
+    rejected = [response for response in responses if response.status_code == 503]
+    assert all(response.headers["retry-after"] == str(RETRY_AFTER_MAX_SECONDS) for response in rejected)
+    # Three completions now give a drain-rate estimate
+    assert (limiter.in_flight, limiter.queued) == (0, 0)
+    assert limiter.retry_after() < RETRY_AFTER_MAX_SECONDS
+
+
+def test_wait_until_idle_returns_once_in_flight_submissions_finish(monkeypatch):
+    import admission
+    limiter = AdmissionLimiter(max_in_flight=2, max_queue=1, queue_timeout=5)
+    monkeypatch.setattr(admission, "limiters", {"/send-fax": limiter})
+
+    async def scenario():
+        await limiter.acquire()
+        asyncio.get_running_loop().call_later(0.1, limiter.release)
+        started = time.monotonic()
+        remaining = await admission.wait_until_idle(5, poll_interval=0.01)
+        return remaining, time.monotonic() - started
+
+    remaining, elapsed = asyncio.run(scenario())
+    assert remaining == 0
+    assert 0.08 <= elapsed < 1.0
+
+
+def test_wait_until_idle_gives_up_at_the_timeout_and_counts_what_is_left(monkeypatch):
+    import admission
+    limiter = AdmissionLimiter(max_in_flight=1, max_queue=1, queue_timeout=5)
+    monkeypatch.setattr(admission, "limiters", {"/send-fax": limiter})
+
+    async def scenario():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        remaining = await admission.wait_until_idle(0.05, poll_interval=0.01)
+        waiter.cancel()
+        return remaining
+
+    # One submission in flight and one queued behind it
+    assert asyncio.run(scenario()) == 2
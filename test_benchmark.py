@@ -0,0 +1,52 @@
+"""
+Tests for the in-process benchmark: one short run and the comparison against a baseline.
+"""
+import orjson
+import pytest
+
+import benchmark
+from benchmark import compare
+
+pytest.importorskip("httpx")
+
+RESULT = {"send_fax": {"4": {"requests": 100, "errors": 0, "rps": 20.0, "p50_ms": 150.0, "p99_ms": 300.0}}}
+
+
+def _with(rps: float, p99_ms: float) -> dict:
+    return {"send_fax": {"4": {**RESULT["send_fax"]["4"], "rps": rps, "p99_ms": p99_ms}}}
+
+
+def test_changes_within_the_tolerance_are_not_regressions():
+    assert compare(RESULT, _with(rps=24.0, p99_ms=260.0), tolerance=0.2) == []
+    assert compare(RESULT, {"pdf": RESULT["send_fax"]}, tolerance=0.2) == []
+
+
+def test_lower_throughput_or_higher_p99_is_a_regression():
+    regressions = compare(RESULT, _with(rps=30.0, p99_ms=200.0), tolerance=0.2)
+    assert regressions == [
+        "send_fax @ 4: 20.0 req/s vs 30.0 baseline",
+        "send_fax @ 4: p99 300.0ms vs 200.0ms baseline",
+    ]
+
+
+def test_short_run_is_saved_as_a_baseline_and_compared_against_it(tmp_path, app, fax, capsys):
+    baseline = tmp_path / "baseline.json"
+    args = ["--scenarios", "send_fax", "--concurrency", "1,2", "--duration", "0.5",
+            "--fax-latency-ms", "100", "--baseline", str(baseline)]
+
+    assert benchmark.main(args + ["--save-baseline"]) == 0
+    saved = orjson.loads(baseline.read_bytes())
+    assert set(saved["send_fax"]) == {"1", "2"}
+    assert all(level["requests"] > 0 and level["errors"] == 0 for level in saved["send_fax"].values())
+    # Sends run in the thread pool, so two workers get through about twice as many requests as one
+    assert saved["send_fax"]["2"]["rps"] > saved["send_fax"]["1"]["rps"] * 1.5
+
+    # Against itself (with a wide tolerance for a noisy test machine) nothing regressed
+    assert benchmark.main(args + ["--tolerance", "0.9"]) == 0
+
+    # A baseline ten times faster than anything this run can reach is a regression
+    for level in saved["send_fax"].values():
+        level["rps"] *= 10
+    baseline.write_bytes(orjson.dumps(saved))
+    assert benchmark.main(args) == 1
+    assert "Regressions:" in capsys.readouterr().out
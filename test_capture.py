@@ -0,0 +1,119 @@
+"""
+Tests for the submission capture buffer and the per-request context: stage timings, request IDs and Server-Timing.
+"""
+import asyncio
+
+import pytest
+
+from capture import CaptureBuffer
+from logging_setup import REDACTED
+from request_context import RequestContextMiddleware, get_stage_timings, stage
+
+
+def _record(buffer: CaptureBuffer, outcome: str, **overrides) -> None:
+    kwargs = dict(endpoint="/send-fax", form="refill", content_type="application/json",
+                  raw_data={"OR-Name": "Jane", "OR-Phone-number": "705-555-0100"},
+                  mapped={"OR-Name": "Jane", "delivery_option": "Pickup"}, outcome=outcome,
+                  timings={"parse": 1.23456})
+    kwargs.update(overrides)
+    buffer.record(**kwargs)
+
+
+def test_captures_keep_field_names_and_redacted_values_only():
+    buffer = CaptureBuffer(size=5, sample_rate=1.0)
+    _record(buffer, "success", missing_required=["OR-Medication"])
+    entry = buffer.snapshot()[0]
+    assert entry["raw_keys"] == ["OR-Name", "OR-Phone-number"]
+    assert entry["mapped"] == {"OR-Name": REDACTED, "delivery_option": "Pickup"}
+    assert entry["missing_required"] == ["OR-Medication"]
+    assert entry["timings_ms"] == {"parse": 1.235}
+    assert "705-555-0100" not in str(entry)
+
+
+def test_ring_buffer_keeps_the_newest_captures_first():
+    buffer = CaptureBuffer(size=3, sample_rate=1.0)
+    for n in range(5):
+        _record(buffer, f"outcome-{n}")
+    assert [entry["outcome"] for entry in buffer.snapshot()] == ["outcome-4", "outcome-3", "outcome-2"]
+    assert [entry["outcome"] for entry in buffer.snapshot(limit=1)] == ["outcome-4"]
+    assert buffer.stats()["stored"] == 3
+    buffer.clear()
+    assert buffer.snapshot() == []
+
+
+@pytest.mark.parametrize("rate, sampled", [(0.0, 0), (1.0, 20)])
+def test_sample_rate_bounds(rate, sampled):
+    buffer = CaptureBuffer(sample_rate=rate)
+    assert sum(buffer.should_sample() for _ in range(20)) == sampled
+    assert buffer.stats()["submissions_seen"] == 20
+
+
+def test_rejected_and_sent_submissions_are_captured(client, fax, admin_headers, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "submission_captures", CaptureBuffer(size=10, sample_rate=1.0))
+    assert client.post("/send-fax", json={"OR-Name": "Capture"}).status_code == 422
+    order = {"OR-Name": "Capture", "OR-Last-name": "Patient", "OR-Phone-number": "705-555-0701",
+             "OR-Medication": "Aspirin", "delivery_option": "Pickup"}
+    assert client.post("/send-fax", json=order).status_code == 200
+
+    captures = client.get("/debug-form-data", headers=admin_headers).json()["captures"]
+    sent, rejected = captures
+    assert rejected["outcome"] == "http_422"
+    assert "OR-Phone-number" in rejected["missing_required"]
+    assert sent["outcome"] == "success"
+    assert {"parse", "render", "fax_send"} <= set(sent["timings_ms"])
+    assert sent["mapped"]["OR-Name"] == REDACTED
+
+
+def test_repeated_stages_are_summed():
+    import request_context
+    token = request_context.stage_timings_var.set({})
+    try:
+        for _ in range(2):
+            with stage("render"):
+                pass
+        with stage("fax_send"):
+            pass
+        timings = get_stage_timings()
+    finally:
+        request_context.stage_timings_var.reset(token)
+    assert set(timings) == {"render", "fax_send"}
+    assert get_stage_timings() == {}
+
+
+def _call(headers):
+    """Run one request through RequestContextMiddleware around an app with one stage; return its headers."""
+    result = {}
+
+    async def app(scope, receive, send):
+        with stage("render"):
+            await asyncio.sleep(0.01)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result.update({k.decode(): v.decode() for k, v in message["headers"]})
+
+    scope = {"type": "http", "method": "POST", "path": "/send-fax", "headers": headers, "query_string": b""}
+    asyncio.run(RequestContextMiddleware(app)(scope, receive, send))
+    return result
+
+
+def test_response_carries_the_request_id_and_server_timing():
+    headers = _call([(b"x-request-id", b"webflow-123")])
+    assert headers["x-request-id"] == "webflow-123"
+    timings = dict(item.split(";dur=") for item in headers["server-timing"].split(", "))
+    assert set(timings) == {"render", "total"}
+    assert float(timings["render"]) >= 10.0
+    assert float(timings["total"]) >= float(timings["render"])
+
+
+@pytest.mark.parametrize("incoming", [b"bad id\r\nx", b"x" * 65])
+def test_unsafe_incoming_request_ids_are_replaced(incoming):
+    request_id = _call([(b"x-request-id", incoming)])["x-request-id"]
+    assert request_id != incoming.decode("latin-1")
+    assert len(request_id) == 16
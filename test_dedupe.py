@@ -0,0 +1,132 @@
+"""
+Tests for near-duplicate fingerprints and the time-windowed duplicate index.
+"""
+import time
+
+import pytest
+
+import dedupe
+from dedupe import DuplicateIndex, fingerprint
+from field_mapping import REFILL_FORM, SIGNUP_FORM
+
+REFILL = {
+    "OR-Name": "Jane",
+    "OR-Last-name": "Doe",
+    "OR-Phone-number": "705-555-0100",
+    "OR-Medication": "Metformin 500mg, Atorvastatin 20mg",
+}
+
+
+def _refill(**overrides) -> str:
+    return fingerprint("refill", REFILL_FORM.resolve({**REFILL, **overrides}))
+
+
+@pytest.mark.parametrize("overrides", [
+    {"OR-Name": "  JANE "},
+    {"OR-Last-name": "doe"},
+    {"OR-Phone-number": "(705) 555-0100"},
+    {"OR-Phone-number": "+1 705 555 0100"},
+    {"OR-Phone-number": "17055550100"},
+    {"OR-Medication": "atorvastatin  20MG; Metformin 500mg"},
+    {"OR-Medication": "Metformin 500mg\nAtorvastatin 20mg\nMetformin 500mg,"},
+    {"OR-note": "Please hurry", "address": "1 Other St"},
+])
+def test_formatting_differences_give_the_same_fingerprint(overrides):
+    assert _refill(**overrides) == _refill()
+
+
+@pytest.mark.parametrize("overrides", [
+    {"OR-Name": "John"},
+    {"OR-Phone-number": "705-555-0101"},
+    {"OR-Medication": "Metformin 500mg"},
+    {"OR-Medication": "Metformin 1000mg, Atorvastatin 20mg"},
+])
+def test_identity_differences_give_another_fingerprint(overrides):
+    assert _refill(**overrides) != _refill()
+
+
+def test_form_name_is_part_of_the_fingerprint():
+    record = REFILL_FORM.resolve(REFILL)
+    assert fingerprint("refill", record) != fingerprint("other", record)
+
+
+def test_signup_date_of_birth_compares_digits_only():
+    signup = {"Form-first-name": "Jane", "Form-last-name": "Doe", "Form-phone-number": "705-555-0100"}
+    a = SIGNUP_FORM.resolve({**signup, "Form-date-of-brith": "1980-01-02"})
+    b = SIGNUP_FORM.resolve({**signup, "Form-date-of-brith": "1980/01/02"})
+    c = SIGNUP_FORM.resolve({**signup, "Form-date-of-brith": "1980-01-03"})
+    assert fingerprint("signup", a) == fingerprint("signup", b) != fingerprint("signup", c)
+
+
+def test_index_counts_repeats_only_once_they_are_acted_on(tmp_path):
+    index = DuplicateIndex(str(tmp_path / "duplicates.sqlite3"), window_seconds=60, policy="annotate")
+    assert index.find("fp") is None
+    index.record("fp", "fax-1")
+    first = index.find("fp")
+    assert first["fax_id"] == "fax-1" and first["repeats"] == 0
+    # Looking up again (e.g. for a repeat whose fax then failed) counts nothing
+    assert index.find("fp")["repeats"] == 0
+
+    # A faxed repeat keeps the original's fax ID and time and is counted
+    index.record("fp", "fax-2")
+    repeat = index.find("fp")
+    assert (repeat["fax_id"], repeat["sent_at"], repeat["repeats"]) == ("fax-1", first["sent_at"], 1)
+    index.suppressed("fp")
+    assert index.find("fp")["repeats"] == 2
+
+
+def test_index_forgets_faxes_outside_the_window(tmp_path, monkeypatch):
+    index = DuplicateIndex(str(tmp_path / "duplicates.sqlite3"), window_seconds=60, policy="annotate")
+    index.record("fp", "fax-1")
+    later = time.time() + 61
+    monkeypatch.setattr(dedupe.time, "time", lambda: later)
+    assert index.find("fp") is None
+
+
+def test_unknown_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        DuplicateIndex(str(tmp_path / "duplicates.sqlite3"), policy="drop")
+
+
+def test_reformatted_resubmission_is_faxed_with_a_duplicate_note(client, fax, monkeypatch):
+    import main
+    monkeypatch.setattr(main.duplicate_index, "policy", "annotate")
+    rendered = []
+    real_generate_pdf = main.generate_pdf
+
+    def generate_pdf(data, path):
+        rendered.append(data)
+        return real_generate_pdf(data, path)
+
+    monkeypatch.setattr(main, "generate_pdf", generate_pdf)
+    body = {**REFILL, "OR-Name": "Dupe", "delivery_option": "Pickup"}
+    assert client.post("/send-fax", json=body).status_code == 200
+    again = {**body, "OR-Phone-number": "(705) 555 0100", "OR-Medication": "atorvastatin 20mg, metformin 500mg"}
+    assert client.post("/send-fax", json=again).status_code == 200
+
+    assert fax.sent == 2
+    assert "POSSIBLE DUPLICATE" not in (rendered[0].get("OR-note") or "")
+    assert rendered[1]["OR-note"].startswith("POSSIBLE DUPLICATE of a submission faxed at")
+
+
+def test_suppressed_resubmission_is_counted_once(client, fax, monkeypatch):
+    import main
+    monkeypatch.setattr(main.duplicate_index, "policy", "suppress")
+    body = {**REFILL, "OR-Name": "Suppressed", "delivery_option": "Pickup"}
+    assert client.post("/send-fax", json=body).status_code == 200
+    again = client.post("/send-fax", json={**body, "OR-Phone-number": "(705) 555 0100"})
+    assert again.json()["status"] == "duplicate"
+    assert fax.sent == 1
+    key = dedupe.fingerprint("refill", REFILL_FORM.resolve(body))
+    assert main.duplicate_index.find(key)["repeats"] == 1
+
+
+def test_repeat_whose_fax_fails_is_not_counted(client, fax, monkeypatch):
+    import main
+    monkeypatch.setattr(main.duplicate_index, "policy", "annotate")
+    body = {**REFILL, "OR-Name": "Failing", "delivery_option": "Pickup"}
+    assert client.post("/send-fax", json=body).status_code == 200
+    monkeypatch.setattr(fax, "send_pdf_with_url", lambda **kwargs: {"success": False, "error": "Sinch down"})
+    assert client.post("/send-fax", json={**body, "OR-Name": " failing "}).json()["status"] == "error"
+    key = dedupe.fingerprint("refill", REFILL_FORM.resolve(body))
+    assert main.duplicate_index.find(key)["repeats"] == 0
@@ -0,0 +1,134 @@
+"""
+Tests for delivery slot capacity: booking configured slots, policies and GET /delivery-slots.
+"""
+import pytest
+
+from delivery_slots import SlotBookings, SlotFull, UnknownSlot, is_delivery, parse_slots, slot_key
+
+SLOTS = "9:00 AM - 11:00 AM=2; 2:00 PM - 4:00 PM"
+DAY = "2030-01-02"
+
+
+def _bookings(tmp_path, policy: str = "reject", slots: str = SLOTS) -> SlotBookings:
+    return SlotBookings(str(tmp_path / "delivery_slots.sqlite3"), slots=slots, default_capacity=3,
+                        policy=policy, timezone="")
+
+
+def _slots(bookings: SlotBookings) -> dict:
+    return {slot["slot"]: slot for slot in bookings.availability(DAY)["slots"]}
+
+
+def test_parse_slots_keeps_order_and_default_capacity():
+    assert parse_slots(SLOTS, 3) == {
+        "9:00am-11:00am": ("9:00 AM - 11:00 AM", 2),
+        "2:00pm-4:00pm": ("2:00 PM - 4:00 PM", 3),
+    }
+    assert parse_slots("", 3) == {}
+    with pytest.raises(ValueError):
+        parse_slots("9-11=lots", 3)
+
+
+def test_slot_key_ignores_spacing_and_case():
+    assert slot_key("9:00 AM - 11:00 AM") == slot_key("9:00am-11:00AM")
+
+
+@pytest.mark.parametrize("option, delivered", [
+    ("Delivery", True),
+    ("home delivery", True),
+    ("Deliver to my address", True),
+    ("Pick-up", False),
+    ("Pickup in store", False),
+    ("", False),
+    (None, False),
+    ("yes", False),
+])
+def test_only_an_explicit_delivery_option_is_a_delivery(option, delivered):
+    assert is_delivery(option) is delivered
+
+
+def test_reject_policy_stops_at_capacity_and_release_frees_a_place(tmp_path):
+    bookings = _bookings(tmp_path)
+    first = bookings.book("9:00am-11:00am", DAY)
+    assert first.label == "9:00 AM - 11:00 AM" and not first.over_capacity
+    bookings.book("9:00 AM - 11:00 AM", DAY)
+    with pytest.raises(SlotFull):
+        bookings.book("9:00 AM - 11:00 AM", DAY)
+    assert _slots(bookings)["9:00 AM - 11:00 AM"]["booked"] == 2
+
+    bookings.release(first)
+    assert _slots(bookings)["9:00 AM - 11:00 AM"]["available"] == 1
+    bookings.book("9:00 AM - 11:00 AM", DAY)
+    assert _slots(bookings)["9:00 AM - 11:00 AM"]["full"]
+
+
+def test_flag_policy_books_beyond_capacity_and_says_so(tmp_path):
+    bookings = _bookings(tmp_path, policy="flag")
+    assert [bookings.book("9:00 AM - 11:00 AM", DAY).over_capacity for _ in range(3)] == [False, False, True]
+    slot = _slots(bookings)["9:00 AM - 11:00 AM"]
+    assert (slot["booked"], slot["available"], slot["full"]) == (3, 0, True)
+
+
+@pytest.mark.parametrize("policy", ["reject", "flag", "allow"])
+def test_unknown_slots_are_neither_booked_nor_listed(tmp_path, policy):
+    bookings = _bookings(tmp_path, policy=policy)
+    with pytest.raises(UnknownSlot):
+        bookings.book("Midnight", DAY)
+    assert list(_slots(bookings)) == ["9:00 AM - 11:00 AM", "2:00 PM - 4:00 PM"]
+    assert all(slot["booked"] == 0 for slot in _slots(bookings).values())
+
+
+def test_without_configured_slots_booking_is_off(tmp_path):
+    bookings = _bookings(tmp_path, slots="")
+    assert not bookings.enabled
+    assert bookings.availability(DAY) == {"date": DAY, "policy": "reject", "enabled": False, "slots": []}
+
+
+def test_unknown_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        _bookings(tmp_path, policy="drop")
+
+
+ORDER = {
+    "OR-Name": "Slot",
+    "OR-Last-name": "Patient",
+    "OR-Medication": "Aspirin",
+    "delivery_option": "Delivery",
+}
+
+
+@pytest.fixture
+def slots(tmp_path, monkeypatch):
+    import main
+    bookings = SlotBookings(str(tmp_path / "delivery_slots.sqlite3"), slots="9-11 AM=1", policy="reject")
+    monkeypatch.setattr(main, "slot_bookings", bookings)
+    return bookings
+
+
+def test_orders_for_full_or_unknown_slots_are_rejected(client, fax, slots):
+    order = {**ORDER, "time_slot": "9-11 AM"}
+    assert client.post("/send-fax", json={**order, "OR-Phone-number": "705-555-0301"}).status_code == 200
+    full = client.post("/send-fax", json={**order, "OR-Phone-number": "705-555-0302"})
+    assert full.status_code == 409
+    unknown = client.post("/send-fax", json={**order, "OR-Phone-number": "705-555-0303", "time_slot": "Noon"})
+    assert unknown.status_code == 422
+    assert fax.sent == 1
+
+    response = client.get("/delivery-slots")
+    assert response.status_code == 200
+    assert [(slot["slot"], slot["booked"]) for slot in response.json()["slots"]] == [("9-11 AM", 1)]
+
+
+def test_orders_without_a_delivery_option_book_nothing(client, fax, slots):
+    order = {**ORDER, "time_slot": "9-11 AM"}
+    del order["delivery_option"]
+    for n, option in enumerate([None, "Pick-up"]):
+        body = {**order, "OR-Phone-number": f"705-555-031{n}"}
+        if option:
+            body["delivery_option"] = option
+        assert client.post("/send-fax", json=body).status_code == 200
+    assert slots.availability()["slots"][0]["booked"] == 0
+    assert fax.sent == 2
+
+
+def test_delivery_slots_rejects_a_bad_date(client, slots):
+    assert client.get("/delivery-slots", params={"date": "tomorrow"}).status_code == 400
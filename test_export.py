@@ -0,0 +1,114 @@
+"""
+Tests for order exports: CSV and JSONL encoding, filters and GET /admin/orders/export.
+"""
+import asyncio
+import csv
+import io
+
+import orjson
+import pytest
+
+import export
+from export import CSV_COLUMNS, export_orders, iter_csv, parse_time
+from field_mapping import REFILL_FORM, SIGNUP_FORM
+from orders import OrderIndex
+
+SEPT = parse_time("2026-09-15")
+OCT = parse_time("2026-10-15")
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = OrderIndex(str(tmp_path / "orders.sqlite3"))
+    jane = REFILL_FORM.resolve({"OR-Name": "Jane", "OR-Last-name": "Doe", "OR-Phone-number": "705-555-0100",
+                                "OR-Medication": "Metformin 500mg"})
+    ann = SIGNUP_FORM.resolve({"Form-first-name": "Ann", "Form-last-name": "Lee",
+                               "Form-phone-number": "705-555-0177"})
+    for order_id, submitted_at in ((index.add("refill", jane), SEPT), (index.add("signup", ann), OCT)):
+        index._db.execute("UPDATE orders SET submitted_at = ? WHERE id = ?", (submitted_at, order_id))
+    monkeypatch.setattr(export, "order_index", index)
+    return index
+
+
+def _csv(chunks) -> list:
+    return list(csv.DictReader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+
+
+def _jsonl(chunks) -> list:
+    return [orjson.loads(line) for line in b"".join(chunks).splitlines()]
+
+
+def test_csv_has_a_header_and_one_row_per_order(index):
+    rows = _csv(export_orders("csv"))
+    assert tuple(rows[0]) == CSV_COLUMNS
+    assert [(row["form"], row["name"]) for row in rows] == [("refill", "Jane Doe"), ("signup", "Ann Lee")]
+    assert rows[0]["submitted_at"].startswith("2026-09-15")
+    assert rows[0]["fax_id"] == ""
+
+
+def test_jsonl_lines_carry_the_mapped_submission(index):
+    lines = _jsonl(export_orders("jsonl"))
+    assert [line["name"] for line in lines] == ["Jane Doe", "Ann Lee"]
+    assert lines[0]["data"]["OR-Medication"] == "Metformin 500mg"
+
+
+@pytest.mark.parametrize("filters, names", [
+    ({"since": "2026-10-01"}, ["Ann Lee"]),
+    ({"until": "2026-10-01"}, ["Jane Doe"]),
+    ({"since": "2026-09-15T00:00:00Z", "until": "2026-10-15"}, ["Jane Doe"]),
+    ({"form": "signup"}, ["Ann Lee"]),
+    ({"status": "pending", "form": "refill"}, ["Jane Doe"]),
+    ({"status": "success"}, []),
+])
+def test_filters(index, filters, names):
+    assert [line["name"] for line in _jsonl(export_orders("jsonl", **filters))] == names
+
+
+@pytest.mark.parametrize("fmt, since", [("xml", None), ("csv", "last week")])
+def test_bad_format_or_date_is_reported_before_reading(index, fmt, since):
+    with pytest.raises(ValueError):
+        export_orders(fmt, since=since)
+
+
+@pytest.mark.parametrize("value, cell", [
+    ("=HYPERLINK(\"http://x\")", "'=HYPERLINK(\"http://x\")"),
+    ("+1 705 555 0100", "'+1 705 555 0100"),
+    ("-2+3", "'-2+3"),
+    ("@SUM(A1)", "'@SUM(A1)"),
+    ("\t=1", "'\t=1"),
+    ("Jane Doe", "Jane Doe"),
+])
+def test_csv_cells_that_spreadsheets_would_evaluate_are_escaped(value, cell):
+    order = {column: None for column in CSV_COLUMNS}
+    order.update(id=1, name=value)
+    row = _csv(iter_csv([order]))[0]
+    assert row["name"] == cell
+    assert row["id"] == "1"
+
+
+def test_export_endpoint_streams_concurrent_downloads(index, app, admin_headers):
+    httpx = pytest.importorskip("httpx")
+    # Enough rows for several batches and chunks, so the stream is resumed on more than one thread
+    record = REFILL_FORM.resolve({"OR-Name": "Bulk", "OR-Last-name": "Patient", "OR-Medication": "x" * 200})
+    for _ in range(1500):
+        index.add("refill", record)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.get("/admin/orders/export", params={"format": fmt}, headers=admin_headers)
+                for fmt in ("csv", "jsonl") * 3
+            ))
+
+    for response in asyncio.run(scenario()):
+        assert response.status_code == 200
+        assert "attachment" in response.headers["content-disposition"]
+        if response.headers["content-type"].startswith("text/csv"):
+            assert len(_csv([response.content])) == 1502
+        else:
+            assert len(_jsonl([response.content])) == 1502
+
+
+def test_export_endpoint_rejects_a_bad_format(client, admin_headers):
+    assert client.get("/admin/orders/export", params={"format": "xml"}, headers=admin_headers).status_code == 400
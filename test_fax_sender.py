@@ -0,0 +1,56 @@
+"""
+Tests for FaxSender's Sinch requests, with the HTTP session stubbed out.
+"""
+from typing import Any, Dict, List
+
+import requests
+
+from config import SINCH_CONNECT_TIMEOUT_SECONDS, SINCH_READ_TIMEOUT_SECONDS
+from fax_sender import FaxSender
+
+
+class _Response:
+    status_code = 200
+    text = '{"id": "fax-1"}'
+
+    def json(self) -> Dict[str, Any]:
+        return {"id": "fax-1"}
+
+
+class _Session:
+    """Records the keyword arguments of each request; raises ``error`` instead of answering if set."""
+
+    def __init__(self, error: Exception = None):
+        self.calls: List[Dict[str, Any]] = []
+        self.error = error
+
+    def _request(self, url: str, **kwargs: Any) -> _Response:
+        self.calls.append(kwargs)
+        if self.error is not None:
+            raise self.error
+        return _Response()
+
+    post = get = _request
+
+
+def _sender(session: _Session) -> FaxSender:
+    sender = FaxSender("key", "secret", "project")
+    sender.session = session
+    return sender
+
+
+def test_every_sinch_request_has_a_connect_and_read_timeout():
+    session = _Session()
+    sender = _sender(session)
+    assert sender.send_pdf_with_url("https://example.com/pdf/1", "17055550100")["fax_id"] == "fax-1"
+    assert sender.get_fax_status("fax-1")["success"]
+    assert [call["timeout"] for call in session.calls] == [
+        (SINCH_CONNECT_TIMEOUT_SECONDS, SINCH_READ_TIMEOUT_SECONDS)
+    ] * 2
+
+
+def test_timed_out_request_fails_the_fax():
+    sender = _sender(_Session(requests.Timeout("read timed out")))
+    result = sender.send_pdf_with_url("https://example.com/pdf/1", "17055550100")
+    assert not result["success"]
+    assert result["error"].startswith("Network error")
@@ -0,0 +1,55 @@
+"""
+Tests for FormMapping.resolve: alias priority, empty versus missing values and stripping.
+"""
+import pytest
+
+from field_mapping import REFILL_FORM, SIGNUP_FORM, FieldSpec, FormMapping, MappedRecord
+
+
+def test_highest_priority_alias_wins_whatever_the_key_order():
+    raw = {"firstName": "Second", "OR-Name": "First", "name": "Last"}
+    assert REFILL_FORM.resolve(raw).first_name == "First"
+    assert REFILL_FORM.resolve(dict(reversed(list(raw.items())))).first_name == "First"
+
+
+def test_missing_fields_are_none_and_reported_when_required():
+    record = REFILL_FORM.resolve({"OR-Name": "Jane", "OR-Medication": "Aspirin"})
+    assert record.last_name is None and record.note is None
+    assert record.missing_required() == ["OR-Last-name", "OR-Phone-number"]
+
+
+def test_refill_form_keeps_the_first_alias_present_even_if_empty():
+    record = REFILL_FORM.resolve({"OR-Name": "", "first_name": "Jane", "OR-note": "  keep  "})
+    assert record.first_name == ""
+    assert "OR-Name" in record.missing_required()
+    # The refill form is not stripped
+    assert record.note == "  keep  "
+
+
+@pytest.mark.parametrize("raw, dob", [
+    # An empty higher-priority alias no longer hides a later one with a value
+    ({"Form-phone-number-2": "", "Form-date-of-brith": "1980-01-02"}, "1980-01-02"),
+    ({"Form-phone-number-2": "   ", "dob": "1980-01-02"}, "1980-01-02"),
+    # Among non-empty values the alias priority still decides
+    ({"dob": "1970-01-01", "Form-date-of-brith": "1980-01-02"}, "1980-01-02"),
+    # Only empty values: the field is empty rather than missing
+    ({"Form-phone-number-2": "  ", "dob": ""}, ""),
+    ({}, None),
+])
+def test_signup_form_prefers_the_first_non_empty_alias(raw, dob):
+    assert SIGNUP_FORM.resolve(raw).date_of_birth == dob
+
+
+def test_signup_values_are_stripped_so_blank_required_fields_count_as_missing():
+    record = SIGNUP_FORM.resolve({"Form-first-name": "  Jane ", "Form-last-name": "   ", "phone": "705-555-0100"})
+    assert record.first_name == "Jane"
+    assert record.missing_required() == ["last_name"]
+
+
+def test_alias_claimed_by_two_fields_is_rejected():
+    class Clash(MappedRecord):
+        __slots__ = ("a", "b")
+        FIELDS = (FieldSpec("a", "a", ["x"]), FieldSpec("b", "b", ["x"]))
+
+    with pytest.raises(ValueError):
+        FormMapping("clash", Clash)
@@ -0,0 +1,138 @@
+"""
+Tests for idempotency key claims and replayed responses.
+"""
+import asyncio
+import time
+
+import pytest
+
+import idempotency
+from idempotency import CLAIMED, DONE, PENDING, IdempotencyConflict, IdempotencyStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IdempotencyStore(str(tmp_path / "idempotency.sqlite3"), ttl_seconds=3600)
+
+
+def _expires_at(store: IdempotencyStore, key: str) -> float:
+    return store._db.execute("SELECT expires_at FROM idempotency WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_first_claim_does_the_work_and_duplicates_see_it_pending(store):
+    assert store.claim("k", "fp") == (CLAIMED, None)
+    assert store.claim("k", "fp") == (PENDING, None)
+
+
+def test_completed_key_replays_the_stored_response(store):
+    store.claim("k", "fp")
+    store.complete("k", {"status": "success", "fax_id": "f1"})
+    assert store.claim("k", "fp") == (DONE, {"status": "success", "fax_id": "f1"})
+
+
+def test_key_reused_for_other_content_conflicts(store):
+    store.claim("k", "fp")
+    with pytest.raises(IdempotencyConflict):
+        store.claim("k", "other")
+
+
+def test_released_key_can_be_claimed_again(store):
+    store.claim("k", "fp")
+    store.release("k")
+    assert store.claim("k", "fp") == (CLAIMED, None)
+
+
+def test_release_does_not_drop_a_completed_response(store):
+    store.claim("k", "fp")
+    store.complete("k", {"status": "success"})
+    store.release("k")
+    assert store.claim("k", "fp")[0] == DONE
+
+
+def test_complete_uses_the_store_ttl_unless_given_one(store):
+    store.claim("header", "fp")
+    store.complete("header", {"status": "success"})
+    store.claim("derived", "fp")
+    store.complete("derived", {"status": "success"}, ttl_seconds=60)
+    now = time.time()
+    assert _expires_at(store, "header") == pytest.approx(now + 3600, abs=5)
+    assert _expires_at(store, "derived") == pytest.approx(now + 60, abs=5)
+
+
+def test_expired_response_is_no_longer_replayed(store):
+    store.claim("k", "fp")
+    store.complete("k", {"status": "success"}, ttl_seconds=-1)
+    assert store.claim("k", "fp") == (CLAIMED, None)
+
+
+def test_stale_pending_claim_is_taken_over(store, monkeypatch):
+    monkeypatch.setattr(idempotency, "PENDING_STALE_SECONDS", -1)
+    store.claim("k", "fp")
+    assert store.claim("k", "fp") == (CLAIMED, None)
+
+
+def test_wait_returns_the_response_once_the_first_request_completes(store):
+    store.claim("k", "fp")
+
+    async def scenario():
+        waiter = asyncio.ensure_future(store.wait("k", "fp", timeout=5))
+        await asyncio.sleep(0.1)
+        assert not waiter.done()
+        store.complete("k", {"status": "success"})
+        return await waiter
+
+    assert asyncio.run(scenario()) == (DONE, {"status": "success"})
+
+
+def test_wait_claims_the_key_if_the_first_request_releases_it(store):
+    store.claim("k", "fp")
+
+    async def scenario():
+        waiter = asyncio.ensure_future(store.wait("k", "fp", timeout=5))
+        await asyncio.sleep(0.1)
+        store.release("k")
+        return await waiter
+
+    assert asyncio.run(scenario()) == (CLAIMED, None)
+
+
+def test_wait_gives_up_after_the_timeout(store):
+    store.claim("k", "fp")
+    with pytest.raises(IdempotencyConflict):
+        asyncio.run(store.wait("k", "fp", timeout=0.1))
+
+
+REFILL = {
+    "OR-Name": "Idem",
+    "OR-Last-name": "Potent",
+    "OR-Phone-number": "705-555-0140",
+    "OR-Medication": "Aspirin",
+    "delivery_option": "Pickup",
+}
+
+
+def test_header_key_replays_the_first_response(client, fax):
+    headers = {"Idempotency-Key": "order-123"}
+    first = client.post("/send-fax", json=REFILL, headers=headers)
+    second = client.post("/send-fax", json=REFILL, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert fax.sent == 1
+
+    conflict = client.post("/send-fax", json={**REFILL, "OR-Medication": "Metformin"}, headers=headers)
+    assert conflict.status_code == 409
+
+
+def test_derived_keys_are_kept_for_the_short_ttl_only(client, fax):
+    import main
+    from config import IDEMPOTENCY_DERIVED_TTL_SECONDS
+    body = {**REFILL, "OR-Name": "Derived"}
+    client.post("/send-fax", json=body)
+    client.post("/send-fax", json=body)
+    assert fax.sent == 1
+
+    expires = main.idempotency_store._db.execute(
+        "SELECT MAX(expires_at) FROM idempotency WHERE key LIKE 'refill:derived:%'"
+    ).fetchone()[0]
+    assert expires == pytest.approx(time.time() + IDEMPOTENCY_DERIVED_TTL_SECONDS, abs=5)
+    assert IDEMPOTENCY_DERIVED_TTL_SECONDS < main.idempotency_store.ttl_seconds
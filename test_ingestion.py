@@ -0,0 +1,183 @@
+"""
+Tests for size-limited request body ingestion.
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+import orjson
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from ingestion import LineError, iter_jsonl, read_submission
+
+
+def _request(chunks: List[bytes], content_type: str, content_length: Optional[int] = None,
+             received: Optional[List[bytes]] = None) -> Request:
+    """A request whose body arrives in the given chunks; ``received`` collects the chunks read."""
+    headers = [(b"content-type", content_type.encode())]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    pending = list(chunks)
+
+    async def receive() -> Dict:
+        chunk = pending.pop(0) if pending else b""
+        if received is not None:
+            received.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": bool(pending)}
+
+    scope = {"type": "http", "method": "POST", "path": "/send-fax", "headers": headers, "query_string": b""}
+    return Request(scope, receive)
+
+
+def _read(request: Request, max_bytes: int = 1024):
+    return asyncio.run(read_submission(request, max_bytes=max_bytes))
+
+
+def test_json_body_is_parsed():
+    request = _request([b'{"OR-Name": ', b'"Jane"}'], "application/json")
+    assert _read(request) == ({"OR-Name": "Jane"}, "JSON")
+
+
+def test_empty_json_body_is_an_empty_submission():
+    assert _read(_request([b""], "application/json")) == ({}, "JSON")
+
+
+def test_malformed_json_is_400():
+    with pytest.raises(HTTPException) as e:
+        _read(_request([b'{"OR-Name": '], "application/json"))
+    assert e.value.status_code == 400
+
+
+def test_declared_length_over_the_cap_is_rejected_before_reading():
+    received: List[bytes] = []
+    request = _request([b"x" * 2000], "application/json", content_length=2000, received=received)
+    with pytest.raises(HTTPException) as e:
+        _read(request)
+    assert e.value.status_code == 413
+    assert received == []
+
+
+def test_invalid_content_length_is_400():
+    request = _request([b"{}"], "application/json")
+    request.scope["headers"].append((b"content-length", b"lots"))
+    with pytest.raises(HTTPException) as e:
+        _read(request)
+    assert e.value.status_code == 400
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/x-www-form-urlencoded"])
+def test_streamed_body_over_the_cap_stops_reading(content_type):
+    # No Content-Length (chunked upload): the cap is enforced while reading
+    received: List[bytes] = []
+    request = _request([b"a" * 600, b"a" * 600, b"a" * 600], content_type, received=received)
+    with pytest.raises(HTTPException) as e:
+        _read(request)
+    assert e.value.status_code == 413
+    assert len(received) == 2
+
+
+def test_urlencoded_fields_split_across_chunks():
+    request = _request([b"OR-Name=Ja", b"ne+Doe&OR-Medication=Aspirin%2C", b"+Metformin"],
+                       "application/x-www-form-urlencoded")
+    assert _read(request) == ({"OR-Name": "Jane Doe", "OR-Medication": "Aspirin, Metformin"}, "Form Data")
+
+
+def test_multipart_text_fields_are_kept_and_files_skipped():
+    body = (
+        b"--XyZ\r\n"
+        b'Content-Disposition: form-data; name="OR-Name"\r\n\r\n'
+        b"Jane\r\n"
+        b"--XyZ\r\n"
+        b'Content-Disposition: form-data; name="upload"; filename="scan.pdf"\r\n'
+        b"Content-Type: application/pdf\r\n\r\n"
+        b"%PDF-1.4 binary\r\n"
+        b"--XyZ--\r\n"
+    )
+    request = _request([body[:40], body[40:]], "multipart/form-data; boundary=XyZ")
+    assert _read(request) == ({"OR-Name": "Jane"}, "Form Data")
+
+
+def test_multipart_without_boundary_is_400():
+    with pytest.raises(HTTPException) as e:
+        _read(_request([b""], "multipart/form-data"))
+    assert e.value.status_code == 400
+
+
+def test_oversized_submission_through_the_app_is_413(client):
+    response = client.post("/send-fax", json={"OR-Name": "x" * (2 * 1024 * 1024)})
+    assert response.status_code == 413
+
+
+def _lines(chunks: List[bytes], max_line_bytes: int = 64, max_lines: int = 1000) -> list:
+    async def collect():
+        request = _request(chunks, "application/x-ndjson")
+        return [(line_no, value) async for line_no, value in iter_jsonl(request, max_line_bytes, max_lines)]
+    return asyncio.run(collect())
+
+
+def _errors(lines: list) -> list:
+    return [line_no for line_no, value in lines if isinstance(value, LineError)]
+
+
+def test_jsonl_lines_split_across_chunks_are_reassembled():
+    lines = _lines([b'{"a": 1}\n{"b"', b': 2}\n\n', b'{"c": 3}'])
+    assert lines == [(1, {"a": 1}), (2, {"b": 2}), (4, {"c": 3})]
+
+
+def test_malformed_jsonl_line_is_reported_and_the_rest_continue():
+    lines = _lines([b'{"a": 1}\n{oops\n{"c": 3}\n'])
+    assert _errors(lines) == [2]
+    assert lines[2] == (3, {"c": 3})
+
+
+def test_long_line_streamed_over_several_chunks_is_dropped_without_buffering():
+    long_line = b'{"a": "' + b"x" * 200 + b'"}\n'
+    lines = _lines([b'{"a": 1}\n', long_line[:50], long_line[50:120], long_line[120:], b'{"c": 3}\n'])
+    assert lines[0] == (1, {"a": 1})
+    assert _errors(lines) == [2]
+    assert lines[2] == (3, {"c": 3})
+
+
+def test_long_line_arriving_in_one_chunk_is_rejected():
+    long_line = b'{"a": "' + b"x" * 200 + b'"}'
+    lines = _lines([b'{"a": 1}\n' + long_line + b'\n{"c": 3}\n'])
+    assert _errors(lines) == [2]
+    assert lines[2] == (3, {"c": 3})
+
+    # Also as the last line of the body, without a trailing newline
+    assert _errors(_lines([b'{"a": 1}\n' + long_line])) == [2]
+
+
+def test_too_many_lines_is_413():
+    with pytest.raises(HTTPException) as e:
+        _lines([b'{"a": 1}\n' * 3], max_lines=2)
+    assert e.value.status_code == 413
+
+
+BATCH_LINE = {
+    "OR-Name": "Batch",
+    "OR-Last-name": "Patient",
+    "OR-Medication": "Aspirin",
+    "delivery_option": "Pickup",
+}
+
+
+def test_batch_reports_each_line_and_a_summary(client, fax, admin_headers):
+    body = b"\n".join([
+        orjson.dumps({**BATCH_LINE, "OR-Phone-number": "705-555-0201"}),
+        b"{not json",
+        orjson.dumps({"OR-Name": "Missing"}),
+        orjson.dumps({**BATCH_LINE, "OR-Name": "Second", "OR-Phone-number": "705-555-0202"}),
+    ])
+    response = client.post("/send-fax/batch", content=body, headers=admin_headers)
+    assert response.status_code == 200
+    results = [orjson.loads(line) for line in response.content.splitlines()]
+
+    summary = results.pop()["summary"]
+    assert summary == {"lines": 4, "success": 2, "invalid": 2}
+    by_line = {result["line"]: result for result in results}
+    assert by_line[1]["status"] == by_line[4]["status"] == "success"
+    assert by_line[2]["status"] == "invalid"
+    assert by_line[3]["missing_required"]
+    assert fax.sent == 2
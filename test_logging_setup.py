@@ -0,0 +1,92 @@
+"""
+Tests for structured logging: redaction, JSON lines and the queue handler.
+"""
+import io
+import logging
+import logging.handlers
+import queue
+import sys
+
+import orjson
+import pytest
+
+from logging_setup import REDACTED, JsonFormatter, RedactingFilter, _parse_levels, _QueueHandler, redact
+from request_context import request_id_var
+
+
+@pytest.mark.parametrize("key", [
+    "OR-Name", "OR-Last-name", "OR-Phone-number", "Form phone number", "emergency_phone", "OR-Medication",
+    "OR-note", "Form-date-of-brith", "dob", "email", "address-input", "Form-transfer", "name",
+])
+def test_patient_fields_are_redacted(key):
+    assert redact({key: "Jane"}) == {key: REDACTED}
+
+
+@pytest.mark.parametrize("key", ["fax_id", "status_code", "content_type", "policy", "slot", "pdf_id"])
+def test_operational_fields_are_kept(key):
+    assert redact({key: "abc"}) == {key: "abc"}
+
+
+def test_redaction_recurses_and_keeps_empty_values():
+    fields = {
+        "raw": {"OR-Name": "Jane", "OR-note": "", "items": [{"phone": "705"}, {"fax_id": "f1"}]},
+        "medications": ["Aspirin", "Metformin"],
+        "email": None,
+    }
+    assert redact(fields) == {
+        "raw": {"OR-Name": REDACTED, "OR-note": "", "items": [{"phone": REDACTED}, {"fax_id": "f1"}]},
+        "medications": [REDACTED, REDACTED],
+        "email": None,
+    }
+
+
+def test_parse_levels_reads_module_level_pairs():
+    assert _parse_levels("fax_sender=debug, uvicorn.access=WARNING,junk") == {
+        "fax_sender": "DEBUG", "uvicorn.access": "WARNING",
+    }
+
+
+def _record(msg: str = "Sent %s", args=("fax",), fields=None, exc_info=None) -> logging.LogRecord:
+    record = logging.LogRecord("fax_sender", logging.INFO, __file__, 1, msg, args, exc_info)
+    if fields is not None:
+        record.fields = fields
+    return record
+
+
+def test_filter_attaches_the_request_id_and_redacts_fields():
+    token = request_id_var.set("req-1")
+    try:
+        record = _record(fields={"OR-Name": "Jane", "fax_id": "f1"})
+        assert RedactingFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+    assert record.request_id == "req-1"
+    assert record.fields == {"OR-Name": REDACTED, "fax_id": "f1"}
+
+
+def test_queued_records_are_written_as_redacted_json_lines():
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(RedactingFilter())
+    out = io.StringIO()
+    writer = logging.StreamHandler(out)
+    writer.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, writer)
+
+    args = ["first"]
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = _record("Sent %s", (args,), fields={"OR-Phone-number": "705-555-0100"}, exc_info=sys.exc_info())
+    handler.handle(record)
+    # The message was resolved when it was queued, not when it is written
+    args.append("later")
+    listener.start()
+    listener.stop()
+
+    entry = orjson.loads(out.getvalue())
+    assert entry["msg"] == "Sent ['first']"
+    assert entry["level"] == "INFO" and entry["logger"] == "fax_sender"
+    assert entry["OR-Phone-number"] == REDACTED
+    assert "ValueError: boom" in entry["exc"]
+    assert entry["ts"].endswith("Z")
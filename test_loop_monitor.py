@@ -0,0 +1,73 @@
+"""
+Tests for the event-loop monitor: lag probes, the blocking watchdog and the admin endpoint.
+"""
+import asyncio
+import time
+
+from loop_monitor import LoopMonitor
+from metrics import EVENT_LOOP_BLOCKS
+
+
+def _blocks_total() -> float:
+    return sum(EVENT_LOOP_BLOCKS.export().values())
+
+
+def _block_the_loop_for_monitor_test(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def _run(monitor: LoopMonitor, block_seconds: float) -> None:
+    monitor.start()
+    try:
+        await asyncio.sleep(0.1)
+        _block_the_loop_for_monitor_test(block_seconds)
+        # Let the probe beat again so the watchdog sees the loop recover
+        await asyncio.sleep(0.2)
+    finally:
+        await monitor.stop()
+
+
+def test_blocking_call_is_reported_with_its_stack():
+    monitor = LoopMonitor(interval=0.02, threshold=0.1)
+    before = _blocks_total()
+    asyncio.run(_run(monitor, 0.4))
+
+    assert _blocks_total() == before + 1
+    snapshot = monitor.snapshot()
+    assert not snapshot["running"]
+    (block,) = snapshot["recent_blocks"]
+    # The episode is measured from the missed heartbeat to the recovery
+    assert 250.0 <= block["blocked_ms"] <= 1000.0
+    names = [frame["name"] for frame in block["stack"]]
+    assert "_block_the_loop_for_monitor_test" in names
+    assert names.index("_run") < names.index("_block_the_loop_for_monitor_test")
+
+
+def test_short_stalls_under_the_threshold_are_not_reported():
+    monitor = LoopMonitor(interval=0.02, threshold=0.3)
+    asyncio.run(_run(monitor, 0.05))
+    assert monitor.snapshot()["recent_blocks"] == []
+
+
+def test_zero_interval_never_starts():
+    monitor = LoopMonitor(interval=0, threshold=0.1)
+
+    async def run():
+        monitor.start()
+        running = monitor.snapshot()["running"]
+        await monitor.stop()
+        return running
+
+    assert asyncio.run(run()) is False
+
+
+def test_event_loop_endpoint_returns_the_snapshot(client, admin_headers, monkeypatch):
+    import admin
+    monitor = LoopMonitor(interval=0.5, threshold=1.0)
+    monitor._report(1.5, [])
+    monkeypatch.setattr(admin, "loop_monitor", monitor)
+
+    body = client.get("/admin/event-loop", headers=admin_headers).json()
+    assert body["threshold_seconds"] == 1.0
+    assert [block["blocked_ms"] for block in body["recent_blocks"]] == [1500.0]
+    assert client.get("/admin/event-loop").status_code == 401
@@ -0,0 +1,35 @@
+"""
+Tests for the shared submission pipeline in main.py.
+"""
+import asyncio
+import time
+
+import pytest
+
+from fakes import FakeFaxSender
+
+
+def test_single_submissions_render_and_fax_off_the_event_loop(app, monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    import main
+    sender = FakeFaxSender(latency=0.3)
+    monkeypatch.setattr(main, "fax_sender", sender)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post("/send-fax", json={
+                    "OR-Name": f"Loop{n}", "OR-Last-name": "Patient", "OR-Phone-number": f"705-555-04{n:02d}",
+                    "OR-Medication": "Aspirin", "delivery_option": "Pickup",
+                })
+                for n in range(4)
+            ))
+            return responses, time.perf_counter() - started
+
+    responses, elapsed = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200] * 4
+    assert sender.sent == 4
+    # Four 0.3 s Sinch calls on the event loop would take 1.2 s one after another
+    assert elapsed < 0.9
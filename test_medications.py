@@ -0,0 +1,98 @@
+"""
+Tests for the medication typeahead: name parsing, prefix ranking and promotion of unlisted names.
+"""
+import pytest
+
+from medications import MAX_SUGGESTIONS, MedicationIndex, medication_names
+
+
+@pytest.mark.parametrize("text, names", [
+    ("Metformin 500mg, Atorvastatin 20 mg", ["Metformin", "Atorvastatin"]),
+    ("Vitamin D3 1000 IU (daily); Insulin glargine\nAspirin 81", ["Vitamin D3", "Insulin glargine", "Aspirin"]),
+    ("  Ramipril  -  10mg ", ["Ramipril"]),
+    ("x, 5mg", []),
+    (None, []),
+])
+def test_medication_names_drop_doses_and_instructions(text, names):
+    assert medication_names(text) == names
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "medications.txt"
+    path.write_text("# comment\nMetformin\nMethotrexate\nMethadone\nMetoprolol\nAspirin\n")
+    index = MedicationIndex(min_submitters=3)
+    assert index.load_list(str(path)) == 5
+    return index
+
+
+def test_prefix_matches_only_names_with_that_prefix(index):
+    assert sorted(index.complete("met")) == ["Metformin", "Methadone", "Methotrexate", "Metoprolol"]
+    assert index.complete("METH") == ["Methadone", "Methotrexate"]
+    assert index.complete("asp") == ["Aspirin"]
+    assert index.complete("metz") == []
+    assert index.complete("  ") == []
+
+
+def test_without_submissions_shorter_names_rank_first(index):
+    assert index.complete("met") == ["Metformin", "Methadone", "Metoprolol", "Methotrexate"]
+
+
+def test_more_often_submitted_names_rank_first(index):
+    for phone in ("705-555-0001", "705-555-0002"):
+        index.observe("Metoprolol 25mg", phone)
+    index.observe("Methotrexate 2.5mg", "705-555-0003")
+    assert index.complete("met")[:2] == ["Metoprolol", "Methotrexate"]
+
+
+def test_limit_is_clamped(index):
+    assert len(index.complete("met", limit=2)) == 2
+    assert len(index.complete("met", limit=0)) == 1
+    assert len(index.complete("met", limit=1000)) <= MAX_SUGGESTIONS
+
+
+def test_unlisted_name_is_suggested_once_enough_patients_submitted_it(index):
+    index.observe("Metforminn 500mg", "705-555-0001")
+    index.observe("Metforminn 500mg", "705-555-0002")
+    assert "Metforminn" not in index.complete("metf")
+    index.observe("metforminn", "(705) 555-0003")
+    assert sorted(index.complete("metf")) == ["Metformin", "Metforminn"]
+
+
+def test_one_patient_resubmitting_never_promotes_a_name(index):
+    for phone in ("705-555-0001", "7055550001", "+1 (705) 555-0001") * 5:
+        index.observe("My private note", phone)
+    assert index.complete("my") == []
+
+
+def test_names_without_a_phone_are_not_counted_towards_promotion(index):
+    for _ in range(5):
+        index.observe("Zopiclone", None)
+    assert index.complete("zop") == []
+
+
+def test_pending_names_are_capped_least_recent_first():
+    index = MedicationIndex(min_submitters=2, max_pending=2)
+    index.observe("Alpha", "705-555-0001")
+    index.observe("Bravo", "705-555-0001")
+    index.observe("Alpha", "705-555-0001")  # Alpha is now the most recent
+    index.observe("Charlie", "705-555-0001")
+    assert index.stats()["pending_names"] == 2
+
+    # Alpha kept its first submitter; Bravo was dropped, so its first submitter no longer counts
+    index.observe("Alpha", "705-555-0002")
+    index.observe("Bravo", "705-555-0002")
+    assert index.complete("alp") == ["Alpha"]
+    assert index.complete("bra") == []
+
+
+def test_observe_all_takes_medications_and_phones(index):
+    index.observe_all([("Zolpidem", f"705-555-000{n}") for n in range(3)])
+    assert index.complete("zol") == ["Zolpidem"]
+
+
+def test_suggestions_are_not_stored_in_shared_caches(client):
+    response = client.get("/medications/suggest", params={"q": "met"})
+    assert response.status_code == 200
+    assert response.headers["cache-control"].startswith("private")
+    assert "Metformin" in response.json()["suggestions"]
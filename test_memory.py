@@ -0,0 +1,91 @@
+"""
+Tests for the per-worker tracemalloc snapshot endpoints.
+"""
+import importlib.util
+import os
+import tracemalloc
+
+import pytest
+
+import memory
+
+
+@pytest.fixture
+def tracing(client, admin_headers):
+    assert client.post("/admin/memory/tracemalloc/start", headers=admin_headers).status_code == 200
+    yield
+    client.post("/admin/memory/tracemalloc/stop", headers=admin_headers)
+
+
+def test_snapshot_ids_and_responses_carry_the_worker_pid(client, admin_headers, tracing):
+    taken = client.post("/admin/memory/snapshots", headers=admin_headers).json()
+    assert taken["pid"] == os.getpid()
+    assert taken["snapshot_id"].startswith(f"{os.getpid()}-")
+
+    top = client.get(f"/admin/memory/snapshots/{taken['snapshot_id']}/top", headers=admin_headers)
+    assert top.status_code == 200
+    assert top.json()["pid"] == os.getpid()
+
+    other = client.post("/admin/memory/snapshots", headers=admin_headers).json()["snapshot_id"]
+    diff = client.get("/admin/memory/diff", params={"base": taken["snapshot_id"], "compare": other},
+                      headers=admin_headers)
+    assert diff.status_code == 200
+    assert diff.json()["pid"] == os.getpid()
+
+    status = client.get("/admin/memory", headers=admin_headers).json()
+    assert taken["snapshot_id"] in [snapshot["snapshot_id"] for snapshot in status["snapshots"]]
+
+    deleted = client.delete(f"/admin/memory/snapshots/{taken['snapshot_id']}", headers=admin_headers)
+    assert deleted.json() == {"pid": os.getpid(), "deleted": taken["snapshot_id"]}
+    assert client.get(f"/admin/memory/snapshots/{taken['snapshot_id']}/top",
+                      headers=admin_headers).status_code == 404
+
+
+def test_snapshot_ids_from_another_worker_are_rejected(client, admin_headers, tracing):
+    own = client.post("/admin/memory/snapshots", headers=admin_headers).json()["snapshot_id"]
+    foreign = f"{os.getpid() + 1}-{own.split('-')[1]}"
+
+    response = client.get(f"/admin/memory/snapshots/{foreign}/top", headers=admin_headers)
+    assert response.status_code == 409
+    assert str(os.getpid() + 1) in response.json()["detail"]
+    assert client.get("/admin/memory/diff", params={"base": own, "compare": foreign},
+                      headers=admin_headers).status_code == 409
+    assert client.delete(f"/admin/memory/snapshots/{foreign}", headers=admin_headers).status_code == 409
+
+
+def test_malformed_snapshot_id_is_404(client, admin_headers, tracing):
+    assert client.get("/admin/memory/snapshots/1/top", headers=admin_headers).status_code == 404
+
+
+def _load(path, name: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("def allocate():\n    return [bytearray(1000) for _ in range(200)]\n")
+    spec = importlib.util.spec_from_file_location(name, str(path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_app_only_excludes_a_virtualenv_inside_the_app_directory(tmp_path, monkeypatch):
+    app_dir = tmp_path / "app"
+    site_packages = app_dir / ".venv" / "lib" / "python3" / "site-packages"
+    app_module = _load(app_dir / "orders_mod.py", "memtest_app")
+    library = _load(site_packages / "somelib.py", "memtest_lib")
+    monkeypatch.setattr(memory, "APP_DIR", str(app_dir))
+    monkeypatch.setattr(memory, "_LIBRARY_DIRS", (str(site_packages),))
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        kept = (app_module.allocate(), library.allocate())
+        snapshot = tracemalloc.take_snapshot().filter_traces(memory._app_filters())
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    filenames = {stat.traceback[0].filename for stat in snapshot.statistics("filename")}
+    assert filenames == {str(app_dir / "orders_mod.py")}
+    assert kept
+
+    assert memory._is_app_file(str(app_dir / "orders_mod.py"))
+    assert not memory._is_app_file(str(site_packages / "somelib.py"))
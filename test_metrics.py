@@ -0,0 +1,36 @@
+"""
+Tests for the in-process metric families.
+"""
+import pytest
+
+from metrics import Counter, Histogram, _Metric
+
+
+def test_metric_families_must_implement_new_child():
+    with pytest.raises(TypeError):
+        _Metric("webflow_test_total", "Test")
+
+    class Incomplete(_Metric):
+        def export(self):
+            return {}
+
+    with pytest.raises(TypeError):
+        Incomplete("webflow_test_total", "Test")
+
+
+def test_counter_series_are_per_label_values():
+    counter = Counter("webflow_test_total", "Test", ["status"])
+    counter.labels("ok").inc()
+    counter.labels("ok").inc(2)
+    counter.labels("error").inc()
+    assert counter.export() == {("ok",): 3.0, ("error",): 1.0}
+
+
+def test_histogram_exports_bucket_counts_and_sum():
+    histogram = Histogram("webflow_test_seconds", "Test", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5.0)
+    counts = histogram.export()[()]
+    assert counts[-1] == pytest.approx(5.55)
+    assert sum(counts[:-1]) == 3
@@ -0,0 +1,92 @@
+"""
+Tests for the order index: FTS5 query building and search.
+"""
+import pytest
+
+from field_mapping import REFILL_FORM, SIGNUP_FORM
+from orders import OrderIndex, match_expression, phone_tokens
+
+
+@pytest.mark.parametrize("query, expression", [
+    ("jane", '"jane"*'),
+    ("Jane  Doe", '"jane"* AND "doe"*'),
+    ("Doe's", '"doe"*'),
+    ("j", '"j"*'),
+    ("555-0100", 'phone : "5550100"*'),
+    ("(705) 555", 'phone : "705555"*'),
+    ("+1 705 555 0100", 'phone : "7055550100"*'),
+    ("12", '"12"*'),
+])
+def test_queries_become_prefix_expressions(query, expression):
+    assert match_expression(query) == expression
+
+
+@pytest.mark.parametrize("query", [
+    'name : "x" OR status',
+    "metformin NOT aspirin",
+    "NEAR(a b)",
+    "jane*",
+    "^doe",
+    '"unbalanced',
+    "a-b",
+])
+def test_fts_syntax_in_queries_is_taken_literally(query):
+    expression = match_expression(query)
+    # Every term is a quoted prefix string: no bare operators, columns or parentheses
+    for term in expression.split(" AND "):
+        assert term.startswith('"') and term.endswith('"*')
+        assert '"' not in term[1:-2]
+
+
+@pytest.mark.parametrize("query", ["", "   ", "'", "-- ()"])
+def test_query_without_words_has_no_expression(query):
+    assert match_expression(query) is None
+
+
+def test_phone_tokens_index_the_full_number_and_its_tails():
+    assert phone_tokens("1 (705) 555-0100") == "7055550100 5550100 0100"
+    assert phone_tokens("0100") == "0100"
+    assert phone_tokens(None) == ""
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = OrderIndex(str(tmp_path / "orders.sqlite3"))
+    jane = REFILL_FORM.resolve({"OR-Name": "Jane", "OR-Last-name": "Doe", "OR-Phone-number": "705-555-0100",
+                                "OR-Medication": "Metformin 500mg"})
+    john = REFILL_FORM.resolve({"OR-Name": "John", "OR-Last-name": "Doe", "OR-Phone-number": "416-555-0199",
+                                "OR-Medication": "Aspirin"})
+    signup = SIGNUP_FORM.resolve({"Form-first-name": "Ann", "Form-last-name": "Lee",
+                                  "Form-phone-number": "705-555-0177"})
+    index.set_outcome(index.add("refill", jane), "success", fax_id="fax-jane")
+    index.set_outcome(index.add("refill", john), "error", error="Sinch timeout")
+    index.add("signup", signup)
+    return index
+
+
+@pytest.mark.parametrize("query, names", [
+    ("doe", ["John Doe", "Jane Doe"]),
+    ("jane doe", ["Jane Doe"]),
+    ("met", ["Jane Doe"]),
+    ("0100", ["Jane Doe"]),
+    ("555-019", ["John Doe"]),
+    ("(705) 555", ["Ann Lee", "Jane Doe"]),
+    ("fax-jane", ["Jane Doe"]),
+    ('doe" OR "ann', []),
+    ("name : ann", []),
+])
+def test_search_finds_orders_newest_first(index, query, names):
+    assert [order["name"] for order in index.search(query)] == names
+
+
+def test_search_filters_by_form_and_status(index):
+    assert [order["name"] for order in index.search("doe", status="error")] == ["John Doe"]
+    assert index.search("lee", form="refill") == []
+    assert index.search("lee", status="pending")[0]["form"] == "signup"
+
+
+def test_disabled_index_stores_and_finds_nothing(tmp_path):
+    index = OrderIndex(str(tmp_path / "orders.sqlite3"), enabled=False)
+    record = REFILL_FORM.resolve({"OR-Name": "Jane", "OR-Last-name": "Doe"})
+    assert index.add("refill", record) is None
+    assert index.search("jane") == []
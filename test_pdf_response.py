@@ -0,0 +1,140 @@
+"""
+Tests for serving stored PDFs: ETags, conditional requests and byte ranges.
+"""
+import asyncio
+import os
+
+import pytest
+from starlette.requests import Request
+
+from pdf_response import PDFResponse
+
+BODY = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def pdf_id(client, tmp_path):
+    import main
+    path = tmp_path / "stored.pdf"
+    path.write_bytes(BODY)
+    main.pdf_store.put("test-pdf", str(path))
+    yield "test-pdf"
+    main.pdf_store.discard("test-pdf")
+
+
+def test_full_response_carries_validators(client, pdf_id):
+    response = client.get(f"/pdf/{pdf_id}")
+    assert response.status_code == 200
+    assert response.content == BODY
+    assert response.headers["content-length"] == str(len(BODY))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["cache-control"].startswith("private")
+
+
+def test_head_has_headers_but_no_body(client, pdf_id):
+    response = client.head(f"/pdf/{pdf_id}")
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(len(BODY))
+    assert response.content == b""
+
+
+def test_matching_if_none_match_is_not_modified(client, pdf_id):
+    etag = client.get(f"/pdf/{pdf_id}").headers["etag"]
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get(f"/pdf/{pdf_id}", headers={"If-None-Match": header})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert "content-length" not in response.headers or response.headers["content-length"] == "0"
+
+
+def test_other_if_none_match_gets_the_document(client, pdf_id):
+    response = client.get(f"/pdf/{pdf_id}", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == BODY
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-9", 0, 9),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+    ("bytes=-5000", 0, 1023),
+])
+def test_single_range_is_partial_content(client, pdf_id, header, start, end):
+    response = client.get(f"/pdf/{pdf_id}", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.content == BODY[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(BODY)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=10-5", "bytes=-0"])
+def test_unsatisfiable_range_is_416(client, pdf_id, header):
+    response = client.get(f"/pdf/{pdf_id}", headers={"Range": header})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(BODY)}"
+    assert response.content == b""
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-9", "items=0-9", "bytes=abc"])
+def test_unsupported_range_is_ignored(client, pdf_id, header):
+    response = client.get(f"/pdf/{pdf_id}", headers={"Range": header})
+    assert response.status_code == 200
+    assert response.content == BODY
+
+
+def test_if_range_honours_the_range_only_for_the_current_etag(client, pdf_id):
+    etag = client.get(f"/pdf/{pdf_id}").headers["etag"]
+    partial = client.get(f"/pdf/{pdf_id}", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert partial.status_code == 206
+    assert partial.content == BODY[:10]
+
+    full = client.get(f"/pdf/{pdf_id}", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert full.status_code == 200
+    assert full.content == BODY
+
+
+def test_unknown_pdf_is_404(client):
+    assert client.get("/pdf/unknown").status_code == 404
+
+
+def _request(method: str = "GET") -> Request:
+    return Request({"type": "http", "method": method, "headers": [], "path": "/pdf/x", "query_string": b""})
+
+
+def _send(response: PDFResponse):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(response({"type": "http", "extensions": {}}, None, send))
+    return messages
+
+
+def test_file_is_only_opened_when_the_response_is_sent(tmp_path, monkeypatch):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(BODY)
+    opened = []
+    real_open = os.open
+    monkeypatch.setattr(os, "open", lambda *args: opened.append(args) or real_open(*args))
+
+    response = PDFResponse(_request(), str(path), filename="a.pdf")
+    assert opened == []
+
+    messages = _send(response)
+    assert len(opened) == 1
+    assert messages[0]["status"] == 200
+    assert b"".join(m.get("body", b"") for m in messages[1:]) == BODY
+
+
+def test_pdf_reaped_before_sending_is_404(tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(BODY)
+    response = PDFResponse(_request(), str(path), filename="a.pdf")
+    os.remove(path)
+
+    messages = _send(response)
+    assert messages[0]["status"] == 404
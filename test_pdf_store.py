@@ -0,0 +1,177 @@
+"""
+Tests for the TTL PDF stores.
+"""
+import asyncio
+import os
+import sqlite3
+import time
+
+import pytest
+
+from pdf_store import PDFStore, SharedPDFStore, _ReapingStore
+
+
+def _pdf(tmp_path, name: str, size: int = 100) -> str:
+    path = tmp_path / f"{name}.pdf"
+    path.write_bytes(b"%" * size)
+    return str(path)
+
+
+def test_get_returns_stored_path(tmp_path):
+    store = PDFStore(ttl_seconds=60, max_bytes=10_000)
+    path = _pdf(tmp_path, "a")
+    store.put("a", path)
+    assert store.get("a") == path
+    assert store.get("missing") is None
+    assert store.stats() == {"count": 1, "bytes": 100}
+
+
+def test_reap_removes_expired_pdfs_and_files(tmp_path):
+    store = PDFStore(ttl_seconds=60, max_bytes=10_000)
+    short, long = _pdf(tmp_path, "short"), _pdf(tmp_path, "long")
+    store.put("short", short, ttl_seconds=1)
+    store.put("long", long)
+    assert store.next_expiry() <= time.monotonic() + 1
+
+    assert store.reap(now=time.monotonic() + 2) == 1
+    assert store.get("short") is None
+    assert not os.path.exists(short)
+    assert store.get("long") == long
+    assert store.stats()["count"] == 1
+
+
+def test_expired_pdf_is_not_served_before_the_reaper_runs(tmp_path):
+    store = PDFStore(ttl_seconds=60, max_bytes=10_000)
+    store.put("a", _pdf(tmp_path, "a"), ttl_seconds=0)
+    assert store.get("a") is None
+
+
+def test_reput_keeps_only_the_new_expiry(tmp_path):
+    store = PDFStore(ttl_seconds=60, max_bytes=10_000)
+    first, second = _pdf(tmp_path, "first"), _pdf(tmp_path, "second")
+    store.put("a", first, ttl_seconds=1)
+    store.put("a", second, ttl_seconds=60)
+    assert not os.path.exists(first)
+
+    # The first put's heap entry is stale and must not expire the second one
+    assert store.reap(now=time.monotonic() + 2) == 0
+    assert store.get("a") == second
+
+
+def test_least_recently_used_pdf_is_evicted_over_budget(tmp_path):
+    store = PDFStore(ttl_seconds=60, max_bytes=250)
+    a, b, c = _pdf(tmp_path, "a"), _pdf(tmp_path, "b"), _pdf(tmp_path, "c")
+    store.put("a", a)
+    store.put("b", b)
+    store.get("a")
+    store.put("c", c)
+
+    assert store.get("b") is None
+    assert not os.path.exists(b)
+    assert store.get("a") == a and store.get("c") == c
+    assert store.stats() == {"count": 2, "bytes": 200}
+
+
+def test_newest_pdf_is_kept_even_if_it_alone_exceeds_the_budget(tmp_path):
+    store = PDFStore(ttl_seconds=60, max_bytes=50)
+    path = _pdf(tmp_path, "big")
+    store.put("big", path)
+    assert store.get("big") == path
+
+
+def test_discard_deletes_the_file(tmp_path):
+    store = PDFStore(ttl_seconds=60, max_bytes=10_000)
+    path = _pdf(tmp_path, "a")
+    store.put("a", path)
+    store.discard("a")
+    assert store.get("a") is None
+    assert not os.path.exists(path)
+    assert store.stats() == {"count": 0, "bytes": 0}
+
+
+def test_reaping_store_backends_must_implement_the_abstract_methods():
+    with pytest.raises(TypeError):
+        _ReapingStore(ttl_seconds=60, max_bytes=10_000)
+
+
+@pytest.mark.parametrize("backend", ["memory", "shared"])
+def test_staging_file_is_deleted_when_rendering_fails(tmp_path, backend):
+    if backend == "memory":
+        store = PDFStore(ttl_seconds=60, max_bytes=10_000)
+    else:
+        store = SharedPDFStore(str(tmp_path / "spool"), ttl_seconds=60, max_bytes=10_000)
+    with pytest.raises(RuntimeError):
+        with store.staged("a") as staging_path:
+            assert os.path.exists(staging_path)
+            raise RuntimeError("render failed")
+    assert not os.path.exists(staging_path)
+
+    with store.staged("b") as staging_path:
+        pass
+    assert os.path.exists(staging_path)
+    os.remove(staging_path)
+
+
+def test_shared_store_publishes_into_the_spool_and_reaps(tmp_path):
+    spool = str(tmp_path / "spool")
+    store = SharedPDFStore(spool, ttl_seconds=60, max_bytes=10_000)
+    with store.staged("a") as staging_path:
+        with open(staging_path, "wb") as f:
+            f.write(b"%PDF")
+    store.put("a", staging_path, ttl_seconds=1)
+
+    # Another worker opening the same spool sees the PDF under its final name
+    other = SharedPDFStore(spool, ttl_seconds=60, max_bytes=10_000)
+    path = other.get("a")
+    assert path == os.path.join(spool, "a.pdf")
+    assert not os.path.exists(staging_path)
+
+    assert other.reap(now=time.time() + 2) == 1
+    assert store.get("a") is None
+    assert not os.path.exists(path)
+
+
+def test_reaper_keeps_running_after_a_failed_pass(tmp_path, caplog):
+    store = PDFStore(ttl_seconds=0.05, max_bytes=10_000)
+    passes = []
+    real_reap = store.reap
+
+    def reap(now=None):
+        passes.append(now)
+        if len(passes) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return real_reap(now)
+
+    store.reap = reap
+    path = _pdf(tmp_path, "a")
+    store.put("a", path)
+
+    async def scenario():
+        store.start_reaper()
+        await asyncio.sleep(0.3)
+        await store.stop_reaper()
+
+    asyncio.run(scenario())
+    assert len(passes) > 1
+    assert not os.path.exists(path)
+    assert "PDF reaper pass failed" in caplog.text
+
+
+def test_unfetched_pdfs_survive_a_restart_through_the_spool(tmp_path):
+    spool = SharedPDFStore(str(tmp_path / "spool"), ttl_seconds=60, max_bytes=10_000)
+    store = PDFStore(ttl_seconds=60, max_bytes=10_000)
+    store.put("pending", _pdf(tmp_path, "pending"), ttl_seconds=30)
+    store.put("expired", _pdf(tmp_path, "expired"), ttl_seconds=-1)
+
+    # Shutdown: only the unexpired PDF is handed over, and the old store is emptied
+    assert store.persist(spool) == 1
+    assert store.stats() == {"count": 0, "bytes": 0}
+
+    # Next process: the PDF is served again with what was left of its lifetime
+    restarted = PDFStore(ttl_seconds=60, max_bytes=10_000)
+    assert restarted.restore(SharedPDFStore(str(tmp_path / "spool"))) == 1
+    path = restarted.get("pending")
+    assert path is not None and os.path.exists(path)
+    assert restarted.next_expiry() - time.monotonic() <= 30
+    # The spool no longer owns it
+    assert spool.get("pending") is None
@@ -0,0 +1,102 @@
+"""
+Tests for per-request profiling: which requests are profiled, where the middleware sits and saved profiles.
+"""
+import asyncio
+import cProfile
+import os
+import time
+
+import pytest
+
+import profiling
+from admission import AdmissionMiddleware
+from profiling import ProfileStore, ProfilingMiddleware
+
+
+def test_profiling_is_the_innermost_middleware(app):
+    # user_middleware lists the outermost middleware first
+    classes = [middleware.cls for middleware in app.user_middleware]
+    assert classes[-1] is ProfilingMiddleware
+    assert classes.index(AdmissionMiddleware) < classes.index(ProfilingMiddleware)
+
+
+def _call(middleware: ProfilingMiddleware, path: str = "/send-fax", headers=()):
+    """Run one request through the middleware around a trivial app; return its response headers."""
+    result = {}
+
+    async def app(scope, receive, send):
+        sum(range(1000))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware.app = app
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result.update({k.decode(): v.decode() for k, v in message.get("headers", [])})
+
+    scope = {"type": "http", "method": "POST", "path": path, "headers": list(headers), "query_string": b""}
+    asyncio.run(middleware(scope, receive, send))
+    return result
+
+
+@pytest.fixture
+def middleware(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret-token")
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0.0)
+    return ProfilingMiddleware(None, store=ProfileStore(str(tmp_path), max_files=10, retention_seconds=3600))
+
+
+def _wait_for(path: str) -> bool:
+    # The profile is written in a worker thread after the response
+    deadline = time.monotonic() + 2.0
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return os.path.exists(path)
+
+
+def test_matching_token_profiles_the_request(middleware):
+    headers = _call(middleware, headers=[(b"x-profile-token", b"secret-token")])
+    profile_id = headers["x-profile-id"]
+    assert _wait_for(middleware.store.path(profile_id, "collapsed"))
+    assert os.path.exists(middleware.store.path(profile_id, "prof"))
+    with open(middleware.store.path(profile_id, "collapsed")) as f:
+        assert f.readline() == "# /send-fax\n"
+    assert [p["profile_id"] for p in middleware.store.list()] == [profile_id]
+
+
+@pytest.mark.parametrize("token", [b"wrong-token", b""])
+def test_wrong_or_missing_token_is_not_profiled(middleware, token):
+    assert "x-profile-id" not in _call(middleware, headers=[(b"x-profile-token", token)])
+
+
+def test_token_header_is_ignored_when_no_token_is_configured(middleware, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "")
+    assert "x-profile-id" not in _call(middleware, headers=[(b"x-profile-token", b"")])
+
+
+def test_sample_rate_picks_requests_on_submission_paths_only(middleware, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    assert "x-profile-id" in _call(middleware)
+    assert "x-profile-id" not in _call(middleware, path="/health")
+
+
+def test_only_one_request_per_worker_is_profiled_at_a_time(middleware):
+    middleware._active = True
+    assert "x-profile-id" not in _call(middleware, headers=[(b"x-profile-token", b"secret-token")])
+
+
+def test_store_keeps_only_the_newest_profiles(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=2, retention_seconds=3600)
+    for n in range(3):
+        profiler = cProfile.Profile()
+        profiler.runcall(sum, range(10))
+        store.save(f"p{n}", profiler, "/send-fax")
+        # Space the modification times so the newest is unambiguous
+        os.utime(store.path(f"p{n}", "prof"), (time.time() + n, time.time() + n))
+    store.prune()
+    assert [p["profile_id"] for p in store.list()] == ["p2", "p1"]
+    assert not os.path.exists(store.path("p0", "collapsed"))
@@ -0,0 +1,64 @@
+"""
+Tests for trace replay: reading traces, percentiles and the replay CLI.
+"""
+import orjson
+import pytest
+
+import replay
+from replay import percentile, read_trace
+
+
+def _trace(tmp_path, *lines) -> str:
+    path = tmp_path / "trace.jsonl"
+    path.write_bytes(b"\n".join(line if isinstance(line, bytes) else orjson.dumps(line) for line in lines))
+    return str(path)
+
+
+def test_offsets_follow_timestamps_in_either_format(tmp_path):
+    path = _trace(
+        tmp_path,
+        {"ts": "2026-10-12T14:00:00Z", "path": "/send-fax"},
+        {"path": "/send-fax"},  # no timestamp: sent right after the previous line
+        b"",
+        {"ts": "2026-10-12T14:00:01.500+00:00", "path": "/send-signup-fax"},
+        {"ts": 1791295200.0, "path": "/send-fax"},  # epoch seconds, earlier than the line before
+    )
+    assert [entry["offset"] for entry in read_trace(path)] == [0.0, 0.0, 1.5, 1.5]
+
+
+def test_limit_stops_reading_early(tmp_path):
+    path = _trace(tmp_path, *({"path": "/"} for _ in range(5)))
+    assert len(read_trace(path, limit=2)) == 2
+
+
+@pytest.mark.parametrize("line", [b"{oops", b"[1, 2]", b'{"json": {}}', b'{"path": "/", "ts": "noon"}'])
+def test_malformed_line_names_the_file_and_line(tmp_path, line):
+    path = _trace(tmp_path, {"path": "/"}, line)
+    with pytest.raises(ValueError, match=r"trace\.jsonl:2: "):
+        read_trace(path)
+
+
+def test_percentile_uses_the_nearest_rank():
+    values = [float(n) for n in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 99.5) == 100.0
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_cli_replays_a_trace_in_process_and_reports_json(tmp_path, app, fax, capsys):
+    order = {"OR-Name": "Replay", "OR-Last-name": "Patient", "OR-Phone-number": "705-555-0601",
+             "OR-Medication": "Aspirin", "delivery_option": "Pickup"}
+    path = _trace(
+        tmp_path,
+        {"ts": 0, "path": "/send-fax", "json": order},
+        {"ts": 0.01, "path": "/send-fax", "json": {"OR-Name": "Missing"}},
+        {"ts": 0.02, "method": "GET", "path": "/"},
+    )
+    assert replay.main([path, "--speed", "0", "--fax-latency-ms", "0", "--json", "--verbose"]) == 0
+    report = orjson.loads(capsys.readouterr().out)
+    assert report["requests"] == 3
+    assert report["failed"] == 1
+    assert report["status_codes"] == {"200": 2, "422": 1}
+    assert set(report["latency_by_path"]) == {"/", "/send-fax"}
@@ -0,0 +1,86 @@
+"""
+Tests for the always-on stack sampler: collapsed stacks, idle threads and rolling windows.
+"""
+import threading
+import time
+from collections import Counter
+
+from sampler import StackSampler
+
+
+def _busy_for_sampler_test(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _sample_while(sampler: StackSampler, seconds: float) -> None:
+    stop = threading.Event()
+    busy = threading.Thread(target=_busy_for_sampler_test, args=(stop,))
+    idle = threading.Thread(target=stop.wait)
+    busy.start()
+    idle.start()
+    sampler.start()
+    try:
+        time.sleep(seconds)
+    finally:
+        sampler.stop()
+        stop.set()
+        busy.join()
+        idle.join()
+
+
+def test_running_threads_are_sampled_and_blocked_ones_only_on_request():
+    sampler = StackSampler(hz=200, window_seconds=60, windows=5)
+    _sample_while(sampler, 0.3)
+
+    busy = [line for line in sampler.collapsed() if "_busy_for_sampler_test" in line]
+    assert busy
+    stack, count = busy[0].rsplit(" ", 1)
+    assert int(count) > 0
+    # Collapsed stacks go from the root frame to the leaf
+    assert stack.index("_bootstrap") < stack.index("_busy_for_sampler_test")
+
+    def waiting(lines):
+        return [line for line in lines if line.rsplit(" ", 1)[0].rsplit(";", 1)[-1].startswith("wait (threading.py")]
+
+    assert waiting(sampler.collapsed()) == []
+    assert waiting(sampler.collapsed(include_idle=True))
+
+    stats = sampler.stats()
+    assert not stats["running"]
+    assert stats["samples"] > 0 and stats["avg_sample_ms"] is not None
+
+
+def test_only_the_last_windows_are_kept():
+    sampler = StackSampler(hz=200, window_seconds=0.05, windows=2)
+    _sample_while(sampler, 0.4)
+    assert 1 <= sampler.stats()["windows_kept"] <= 2
+
+
+def test_minutes_selects_the_most_recent_windows():
+    sampler = StackSampler(hz=0, window_seconds=60, windows=60)
+    now_window = int(time.time() // 60)
+    sampler._windows = {
+        now_window: Counter({("main;recent", False): 2}),
+        now_window - 10: Counter({("main;older", False): 3, ("main;waiting", True): 1}),
+    }
+    assert sampler.collapsed(minutes=5) == ["main;recent 2"]
+    assert sampler.collapsed() == ["main;older 3", "main;recent 2"]
+    assert "main;waiting 1" in sampler.collapsed(include_idle=True)
+
+
+def test_zero_hz_never_starts():
+    sampler = StackSampler(hz=0)
+    sampler.start()
+    assert not sampler.stats()["running"]
+    assert sampler.collapsed() == []
+
+
+def test_stacks_endpoint_serves_collapsed_lines(client, admin_headers, monkeypatch):
+    import admin
+    sampler = StackSampler(hz=0, window_seconds=60, windows=5)
+    sampler._windows = {int(time.time() // 60): Counter({("main;handler", False): 4})}
+    monkeypatch.setattr(admin, "stack_sampler", sampler)
+    response = client.get("/admin/sampler/stacks", headers=admin_headers)
+    assert response.text == "main;handler 4\n"
+    assert client.get("/admin/sampler/stacks", params={"minutes": 0}, headers=admin_headers).status_code == 400
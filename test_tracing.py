@@ -0,0 +1,55 @@
+"""
+Tests for trace export sampling, skipped paths and dead-worker cleanup.
+"""
+import os
+import subprocess
+import sys
+
+import orjson
+
+from tracing import Trace, TraceExporter
+
+
+def _trace(path: str) -> Trace:
+    trace = Trace("req-1", f"GET {path}", {"method": "GET", "path": path})
+    trace.finish()
+    return trace
+
+
+def _exported(exporter: TraceExporter, trace_dir) -> list:
+    exporter.stop()
+    path = trace_dir / f"traces-{os.getpid()}.jsonl"
+    if not path.exists():
+        return []
+    return [orjson.loads(line) for line in path.read_bytes().splitlines()]
+
+
+def test_probe_scrape_and_pdf_paths_are_not_exported(tmp_path):
+    exporter = TraceExporter(str(tmp_path), sample_rate=1.0, skip_paths=["/ready", "/metrics", "/pdf"])
+    for path in ("/ready", "/metrics", "/pdf/abc123", "/send-fax", "/pdfs-report"):
+        exporter.export(_trace(path))
+    names = [entry["name"] for entry in _exported(exporter, tmp_path)]
+    assert names == ["GET /send-fax", "GET /pdfs-report"]
+
+
+def test_zero_sample_rate_exports_nothing(tmp_path):
+    exporter = TraceExporter(str(tmp_path), sample_rate=0.0, skip_paths=[])
+    exporter.export(_trace("/send-fax"))
+    assert _exported(exporter, tmp_path) == []
+
+
+def test_trace_files_of_exited_workers_are_removed(tmp_path):
+    exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                            capture_output=True, text=True, check=True)
+    dead_pid = int(exited.stdout)
+    for name in (f"traces-{dead_pid}.jsonl", f"traces-{dead_pid}.jsonl.1", "notes.txt"):
+        (tmp_path / name).write_text("{}\n")
+    live = tmp_path / f"traces-{os.getppid()}.jsonl"
+    live.write_text("{}\n")
+
+    exporter = TraceExporter(str(tmp_path), sample_rate=1.0, skip_paths=[])
+    exporter.export(_trace("/send-fax"))
+    exporter.stop()
+
+    remaining = sorted(entry.name for entry in tmp_path.iterdir())
+    assert remaining == sorted(["notes.txt", live.name, f"traces-{os.getpid()}.jsonl"])
@@ -0,0 +1,88 @@
+"""
+Tests for the startup warm-up, the shutdown drain and the /ready check.
+"""
+import asyncio
+
+from admission import AdmissionLimiter
+from warmup import Readiness
+
+
+class _Sender:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.warmed = 0
+
+    def warm_up(self) -> None:
+        self.warmed += 1
+        if self.fail:
+            raise ConnectionError("sinch unreachable")
+
+
+def test_instance_is_ready_only_after_every_step_ran():
+    readiness = Readiness(enabled=True)
+    sender = _Sender()
+    assert not readiness.ready
+
+    asyncio.run(readiness.run(sender))
+    assert readiness.ready
+    assert sender.warmed == 1
+    assert set(readiness.steps) == {"render_refill", "render_signup", "sinch_connect"}
+    assert all(step["ok"] and step["ms"] >= 0 for step in readiness.steps.values())
+
+
+def test_failed_step_is_recorded_and_does_not_keep_the_instance_unready(caplog):
+    readiness = Readiness(enabled=True)
+    asyncio.run(readiness.run(_Sender(fail=True)))
+    assert readiness.ready
+    assert readiness.steps["sinch_connect"]["ok"] is False
+    assert readiness.steps["sinch_connect"]["error"] == "ConnectionError"
+    assert readiness.steps["render_refill"]["ok"]
+    assert "Warm-up step failed" in caplog.text
+
+
+def test_disabled_warmup_is_ready_at_once_and_never_starts():
+    readiness = Readiness(enabled=False)
+
+    async def start():
+        readiness.start(_Sender())
+        return readiness._task
+
+    assert asyncio.run(start()) is None
+    assert readiness.ready
+    assert readiness.status()["warmup_enabled"] is False
+
+
+def test_ready_endpoint_answers_503_until_warm(client, monkeypatch):
+    import main
+    readiness = Readiness(enabled=True)
+    monkeypatch.setattr(main, "readiness", readiness)
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["warm"] is False
+
+    asyncio.run(readiness.run(_Sender()))
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["steps"]["sinch_connect"]["ok"]
+
+
+def test_drain_reports_not_ready_and_waits_for_in_flight_submissions(client, monkeypatch):
+    import admission
+    import main
+    readiness = Readiness(enabled=False)
+    limiter = AdmissionLimiter(max_in_flight=1, max_queue=1, queue_timeout=5)
+    monkeypatch.setattr(main, "readiness", readiness)
+    monkeypatch.setattr(admission, "limiters", {"/send-fax": limiter})
+    assert client.get("/ready").status_code == 200
+
+    async def shutdown():
+        await limiter.acquire()
+        asyncio.get_running_loop().call_later(0.1, limiter.release)
+        await main.drain_submissions()
+        return limiter.in_flight
+
+    assert asyncio.run(shutdown()) == 0
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["draining"] is True
@@ -0,0 +1,238 @@
+"""
+Lightweight in-process request tracing.
+
+Each HTTP request gets a trace (its ID is the request ID). Code anywhere in
+the pipeline opens spans with ``span()``; the current span is carried in a
+context variable, so nesting works across main.py, pdf_generator.py and
+fax_sender.py without passing anything around. Finished traces are handed
+to a background writer that appends them to a rotating JSONL file per
+worker, and the request middleware turns the spans into a Server-Timing
+response header. Only a sample of traces is exported (TRACE_SAMPLE_RATE),
+and never those of health checks, metric scrapes or PDF fetches; trace
+files left by workers that have exited are deleted when a worker starts
+writing.
+"""
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import orjson
+
+from config import TRACE_DIR, TRACE_SAMPLE_RATE, TRACE_FILE_MAX_BYTES, TRACE_FILE_BACKUPS, TRACE_SKIP_PATHS
+from metrics import pid_alive
+
+
+# traces-<pid>.jsonl and its rotated backups traces-<pid>.jsonl.1, .2, ...
+_TRACE_FILE = re.compile(r"^traces-(\d+)\.jsonl(?:\.\d+)?$")
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "start_wall", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent_id
+        self.start_wall = time.time()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000.0
+
+    def to_dict(self, trace_start: float) -> Dict[str, Any]:
+        entry = {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "offset_ms": round((self.start - trace_start) * 1000.0, 3),
+            "duration_ms": round(self.duration_ms, 3),
+        }
+        if self.attributes:
+            entry["attributes"] = self.attributes
+        if self.error:
+            entry["error"] = self.error
+        return entry
+
+
+class Trace:
+    """All spans recorded while handling one request."""
+
+    __slots__ = ("trace_id", "root", "spans")
+
+    def __init__(self, trace_id: str, name: str, attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.root = Span(name, None, attributes)
+        self.spans: List[Span] = []
+
+    def finish(self) -> None:
+        self.root.end = time.perf_counter()
+
+    def server_timing(self) -> str:
+        """
+        Build a Server-Timing header value from the spans.
+
+        Spans with the same name are summed; the whole request is reported as "total".
+        """
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        metrics = [f"{_timing_token(name)};dur={duration:.3f}" for name, duration in totals.items()]
+        metrics.append(f"total;dur={self.root.duration_ms:.3f}")
+        return ", ".join(metrics)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "start": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self.root.start_wall))
+            + f".{int((self.root.start_wall % 1) * 1000):03d}Z",
+            "duration_ms": round(self.root.duration_ms, 3),
+            "attributes": self.root.attributes,
+            "pid": os.getpid(),
+            "spans": [span.to_dict(self.root.start) for span in sorted(self.spans, key=lambda s: s.start)],
+        }
+
+
+def _timing_token(name: str) -> str:
+    """Server-Timing metric names must be HTTP tokens."""
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)
+
+
+current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Record a span in the current trace.
+
+    Outside of a traced request this does nothing and yields None.
+
+    Args:
+        name: Span name, e.g. "render.build" or "sinch.post"
+        **attributes: Extra attributes stored with the span (no patient data)
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = current_span.get()
+    new_span = Span(name, parent.span_id if parent is not None else trace.root.span_id, attributes)
+    token = current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = type(e).__name__
+        raise
+    finally:
+        new_span.end = time.perf_counter()
+        current_span.reset(token)
+        trace.spans.append(new_span)
+
+
+def start_trace(trace_id: str, name: str, **attributes: Any) -> contextvars.Token:
+    """Begin a trace for the current request; returns a token for end_trace()."""
+    return current_trace.set(Trace(trace_id, name, attributes))
+
+
+def end_trace(token: contextvars.Token) -> Optional[Trace]:
+    """Finish the current trace, queue it for export if sampled, and return it."""
+    trace = current_trace.get()
+    current_trace.reset(token)
+    if trace is None:
+        return None
+    trace.finish()
+    exporter.export(trace)
+    return trace
+
+
+class TraceExporter:
+    """Writes finished traces to a rotating JSONL file from a background thread."""
+
+    def __init__(self, trace_dir: str = TRACE_DIR, sample_rate: float = TRACE_SAMPLE_RATE,
+                 max_bytes: int = TRACE_FILE_MAX_BYTES, backups: int = TRACE_FILE_BACKUPS,
+                 skip_paths: Sequence[str] = TRACE_SKIP_PATHS):
+        """
+        Args:
+            trace_dir: Directory for trace files (one file per worker process)
+            sample_rate: Fraction of traces exported (0.0 disables export)
+            max_bytes: Size at which a trace file is rotated
+            backups: Rotated files kept per worker
+            skip_paths: Request paths, and the paths below them, whose traces are never exported
+        """
+        self.trace_dir = trace_dir
+        self.sample_rate = sample_rate
+        self.skip_paths = tuple(path.rstrip("/") for path in skip_paths)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: "Optional[queue.SimpleQueue[logging.LogRecord]]" = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._pid: Optional[int] = None
+
+    def _ensure_started(self) -> None:
+        # Started lazily in each worker process, since workers are forked after import
+        if self._listener is not None and self._pid == os.getpid():
+            return
+        os.makedirs(self.trace_dir, exist_ok=True)
+        self._remove_dead_worker_files()
+        writer = logging.handlers.RotatingFileHandler(
+            os.path.join(self.trace_dir, f"traces-{os.getpid()}.jsonl"),
+            maxBytes=self.max_bytes,
+            backupCount=self.backups,
+            delay=True,
+        )
+        writer.setFormatter(logging.Formatter("%(message)s"))
+        self._queue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(self._queue, writer)
+        self._listener.start()
+        self._pid = os.getpid()
+
+    def _remove_dead_worker_files(self) -> None:
+        """Delete trace files (and their rotated backups) of worker processes that are no longer running."""
+        for entry in os.scandir(self.trace_dir):
+            match = _TRACE_FILE.match(entry.name)
+            if match is None or pid_alive(int(match.group(1))):
+                continue
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def skipped(self, path: str) -> bool:
+        """Whether traces of requests to this path are never exported."""
+        return any(path == skip or path.startswith(skip + "/") for skip in self.skip_paths)
+
+    def export(self, trace: Trace) -> None:
+        """Queue a finished trace for writing if it is sampled."""
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return
+        if self.skipped(trace.root.attributes.get("path", "")):
+            return
+        self._ensure_started()
+        line = orjson.dumps(trace.to_dict(), default=str).decode("utf-8")
+        self._queue.put(logging.makeLogRecord({"msg": line, "levelno": logging.INFO}))
+
+    def stop(self) -> None:
+        """Flush queued traces and stop the writer thread."""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+        self._listener = None
+
+
+exporter = TraceExporter()
@@ -0,0 +1,112 @@
+"""
+Startup warm-up and readiness.
+
+After a spin-down the first submission used to pay for ReportLab's font and
+stylesheet setup and for the TLS handshake with Sinch. The warm-up renders
+one throwaway PDF of each form and opens the Sinch connection pool in a
+worker thread right after startup. /ready answers 503 until it has finished,
+so a health check only routes traffic to a warm instance. A failed step is
+logged and does not keep the instance unready; it only means that step is
+still cold. During shutdown /ready answers 503 again.
+"""
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import STARTUP_WARMUP
+from pdf_generator import generate_pdf, generate_signup_pdf
+
+logger = logging.getLogger(__name__)
+
+# Sample data only; nothing here is patient data
+_SAMPLE_REFILL = {
+    "OR-Name": "Warm",
+    "OR-Last-name": "Up",
+    "OR-Phone-number": "000-000-0000",
+    "OR-Medication": "Sample A, Sample B",
+    "delivery_option": "Pickup",
+    "address": "1 Sample St",
+    "time_slot": "9:00 AM - 11:00 AM",
+    "OR-note": "Warm-up render",
+}
+_SAMPLE_SIGNUP = {
+    "first_name": "Warm",
+    "last_name": "Up",
+    "phone": "000-000-0000",
+    "date_of_birth": "2000-01-01",
+    "address": "1 Sample St",
+    "email": "warmup@example.com",
+}
+
+
+def _render_throwaway(render: Callable[[Dict[str, str], str], Any], data: Dict[str, str]) -> None:
+    fd, path = tempfile.mkstemp(prefix="warmup_", suffix=".pdf")
+    os.close(fd)
+    try:
+        render(data, path)
+    finally:
+        os.remove(path)
+
+
+class Readiness:
+    """Tracks the startup warm-up and shutdown drain, i.e. whether the instance should get traffic."""
+
+    def __init__(self, enabled: bool = STARTUP_WARMUP):
+        self.enabled = enabled
+        self.warm = not enabled
+        self.draining = False
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, fax_sender) -> None:
+        """Run the warm-up in the background on the running loop."""
+        if not self.enabled or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self.run(fax_sender))
+
+    async def run(self, fax_sender) -> None:
+        """Run every warm-up step in a worker thread, then mark the instance ready."""
+        steps: List[Tuple[str, Callable[[], Any]]] = [
+            ("render_refill", lambda: _render_throwaway(generate_pdf, _SAMPLE_REFILL)),
+            ("render_signup", lambda: _render_throwaway(generate_signup_pdf, _SAMPLE_SIGNUP)),
+            ("sinch_connect", fax_sender.warm_up),
+        ]
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        for name, step in steps:
+            step_started = time.perf_counter()
+            try:
+                await loop.run_in_executor(None, step)
+                self.steps[name] = {"ok": True}
+            except Exception as e:
+                logger.warning("Warm-up step failed", extra={"fields": {"step": name, "error": str(e)}})
+                self.steps[name] = {"ok": False, "error": type(e).__name__}
+            self.steps[name]["ms"] = round((time.perf_counter() - step_started) * 1000.0, 1)
+        self.warm = True
+        logger.info("Warm-up finished", extra={"fields": {
+            "duration_ms": round((time.perf_counter() - started) * 1000.0, 1),
+            "steps": self.steps,
+        }})
+
+    @property
+    def ready(self) -> bool:
+        return self.warm and not self.draining
+
+    def begin_drain(self) -> None:
+        """Report not ready from now on, so the load balancer stops sending traffic."""
+        self.draining = True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warm": self.warm,
+            "draining": self.draining,
+            "warmup_enabled": self.enabled,
+            "steps": self.steps,
+        }
+
+
+readiness = Readiness()